@@ -0,0 +1,283 @@
+#  Copyright 2008 Nokia Siemens Networks Oyj
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+"""Times loading, merging, filtering, marking and saving synthetic data.
+
+usage: hotpaths.py [options]
+
+Generates test data with given number of suites, tests, keywords and tags
+and an output file for it, and times the operations Mabot spends most of
+its time in. Every operation is run `--repeat` times and the fastest run
+is reported. Results are written as JSON to the standard output or to the
+file given with `--output`, and a summary to the standard error.
+
+If a baseline written earlier with `--output` is given, operations slower
+than the baseline by more than `--tolerance` are reported as regressions
+and the exit code is 1.
+
+options:
+  --suites n      Number of suite files (default 10).
+  --tests n       Number of tests in each suite (default 100).
+  --keywords n    Number of keywords in each test (default 5).
+  --depth n       Depth of the user keywords called by tests (default 3).
+  --tags n        Number of distinct tags (default 20). Every test has
+                  two of them.
+  --repeat n      Number of runs of each operation (default 3).
+  --output path   Write results to this file.
+  --baseline path Compare results to an earlier result file.
+  --tolerance x   Allowed slowdown as a fraction (default 0.25).
+"""
+
+import json
+import optparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from mabot import utils
+from mabot.settings import SETTINGS
+from mabot.model import model
+from mabot.model.io import IO
+from mabot.model.model import ManualSuite, DATA_MODIFIED
+from mabot.model.model import get_includes_and_excludes_from_pattern
+from mabot.model.merge import iter_tests
+from mabot.utils import robotapi
+from mabot.version import version
+
+SETTINGS_USED = {'always_load_old_data_from_xml': False,
+                 'check_simultaneous_save': False,
+                 'incremental_save': False,
+                 'cache_test_data': False,
+                 'lazy_keyword_loading': False,
+                 'journal_changes': False,
+                 'parallel_parsing': False,
+                 'cache_parsed_files': False,
+                 'sharded_output': False,
+                 'shard_depth': 1,
+                 'tags_added_to_modified_tests': [],
+                 'tags_allowed_only_once': [],
+                 'include': [],
+                 'exclude': []}
+
+
+def write_test_data(directory, suites, tests, keywords, depth, tags):
+    os.makedirs(directory)
+    for suite in range(suites):
+        data = open(os.path.join(directory, 'suite_%03d.txt' % suite), 'w')
+        try:
+            data.write('*** Test Cases ***\n')
+            for test in range(tests):
+                index = suite * tests + test
+                data.write('Test %d\n    [Tags]    tag-%d    tag-%d\n'
+                           % (test, index % tags, (index * 7 + 1) % tags))
+                for kw in range(keywords):
+                    data.write('    Level %d    argument %d\n' % (depth, kw))
+            data.write('\n*** Keywords ***\n')
+            for level in range(1, depth + 1):
+                data.write('Level %d\n    [Arguments]    ${arg}\n' % level)
+                if level > 1:
+                    data.write('    Level %d    ${arg}\n' % (level - 1))
+                data.write('    Log    Level %d ${arg}\n' % level)
+        finally:
+            data.close()
+
+
+def write_output(directory, output):
+    """Saves results for every test of `directory` to `output`."""
+    configure()
+    io = IO()
+    suite = io.load_data(directory)
+    for index, test in enumerate(iter_tests(suite)):
+        if index % 3:
+            test.set_all('PASS', '')
+        else:
+            test.set_all('FAIL', 'Failure %d' % index)
+    io.save_data(output, None)
+    DATA_MODIFIED.saved()
+
+
+def configure(**settings):
+    # Settings are changed only in memory, not in the settings file.
+    for name, value in SETTINGS_USED.items() + settings.items():
+        SETTINGS[name] = value
+
+
+class Benchmark(object):
+
+    def __init__(self, directory, output, repeat):
+        self._directory = directory
+        self._output = output
+        self._repeat = repeat
+        self.results = []
+
+    def run(self):
+        self._time('load_data (test data)', self._load, self._directory)
+        self._time('load_data (output)', self._load, self._output)
+        self._time('load_data (test data and output)', self._load,
+                   self._directory, always_load_old_data_from_xml=True)
+        self._time('add_results', self._add_results)
+        self._time('change_visibility', self._change_visibility)
+        self._time('set_all', self._set_all)
+        self._time('update_status_and_message (per test)',
+                   self._update_tests)
+        self._time('get_search_index', self._build_search_index)
+        self._time('find (per query)', self._find)
+        self._time('save_data (full)', self._save)
+        self._time('save_data (incremental)', self._save,
+                   incremental_save=True)
+        self._time('save_data (sharded)', self._save, sharded_output=True)
+        return self.results
+
+    def _time(self, name, function, *args, **settings):
+        runs = []
+        for _ in range(self._repeat):
+            configure(**settings)
+            DATA_MODIFIED.saved()
+            runs.append(function(*args))
+        self.results.append({'name': name, 'seconds': min(runs),
+                             'runs': runs})
+        sys.stderr.write('%-40s %12.6f s\n' % (name, min(runs)))
+
+    def _load(self, path):
+        start = time.time()
+        IO().load_data(path)
+        return time.time() - start
+
+    def _load_output(self):
+        return ManualSuite(robotapi.XmlTestSuite(self._output), None, True)
+
+    def _add_results(self):
+        data = ManualSuite(utils.load_data(self._directory, SETTINGS))
+        output = self._load_output()
+        start = time.time()
+        data.add_results(output, True)
+        return time.time() - start
+
+    def _change_visibility(self):
+        suite = self._load_output()
+        start = time.time()
+        for pattern in ['tag-1', 'tag-1ORtag-2', 'tag-*NOTtag-3', '']:
+            includes, excludes = get_includes_and_excludes_from_pattern(pattern)
+            suite.change_visibility(includes, excludes, model.ALL_TAGS_VISIBLE)
+        return time.time() - start
+
+    def _set_all(self):
+        suite = self._load_output()
+        start = time.time()
+        suite.set_all('PASS', 'Benchmark')
+        return time.time() - start
+
+    def _update_tests(self):
+        tests = list(iter_tests(self._load_output()))
+        start = time.time()
+        for index, test in enumerate(tests):
+            test.update_status_and_message(index % 2 and 'PASS' or 'FAIL',
+                                           'Update %d' % index)
+        return (time.time() - start) / len(tests)
+
+    def _build_search_index(self):
+        suite = self._load_output()
+        start = time.time()
+        suite.get_search_index()
+        return time.time() - start
+
+    def _find(self):
+        suite = self._load_output()
+        index = suite.get_search_index()
+        tests = list(iter_tests(suite))
+        for test in tests[::100]:
+            test.update_status_and_message('FAIL', 'Found')
+        queries = ['found', 'tag-1', 'tag-1*', 'test 5', 'suite 003.test*',
+                   'no such text']
+        start = time.time()
+        for query in queries:
+            index.find(query)
+        return (time.time() - start) / len(queries)
+
+    def _save(self):
+        output = os.path.join(os.path.dirname(self._output), 'saved.xml')
+        shutil.copy(self._output, output)
+        io = IO()
+        suite = io.load_data(output)
+        tests = list(iter_tests(suite))
+        tests[len(tests) / 2].update_status_and_message('PASS', 'Saved')
+        start = time.time()
+        io.save_data(None, None)
+        return time.time() - start
+
+
+def compare(results, baseline, tolerance):
+    """Returns operations slower than in `baseline` with their slowdowns."""
+    previous = dict((result['name'], result['seconds'])
+                    for result in baseline['results'])
+    regressions = []
+    for result in results:
+        old = previous.get(result['name'])
+        if old and result['seconds'] > old * (1 + tolerance):
+            regressions.append((result['name'], result['seconds'] / old))
+    return regressions
+
+
+def parse_options(args):
+    parser = optparse.OptionParser(usage=__doc__.split('\n\n')[1])
+    for name, default in [('suites', 10), ('tests', 100), ('keywords', 5),
+                          ('depth', 3), ('tags', 20), ('repeat', 3)]:
+        parser.add_option('--' + name, type='int', default=default)
+    parser.add_option('--tolerance', type='float', default=0.25)
+    parser.add_option('--output')
+    parser.add_option('--baseline')
+    options, _ = parser.parse_args(args)
+    return options
+
+
+def main(args):
+    options = parse_options(args)
+    model.show_warning = lambda title, message: sys.stderr.write(
+        '[ WARN ] %s: %s\n' % (title, message))
+    scale = dict((name, getattr(options, name))
+                 for name in ('suites', 'tests', 'keywords', 'depth', 'tags'))
+    tempdir = tempfile.mkdtemp()
+    try:
+        directory = os.path.join(tempdir, 'bench')
+        output = os.path.join(tempdir, 'bench.xml')
+        write_test_data(directory, **scale)
+        write_output(directory, output)
+        results = Benchmark(directory, output, options.repeat).run()
+    finally:
+        shutil.rmtree(tempdir)
+    report = {'scale': scale, 'repeat': options.repeat,
+              'python': sys.version.split()[0],
+              'robot': robotapi.ROBOT_VERSION, 'mabot': version,
+              'results': results}
+    if options.output:
+        json.dump(report, open(options.output, 'w'), indent=2)
+    else:
+        print json.dumps(report, indent=2)
+    if options.baseline:
+        regressions = compare(results, json.load(open(options.baseline)),
+                              options.tolerance)
+        for name, slowdown in regressions:
+            sys.stderr.write('REGRESSION %s: %.0f%% slower than baseline\n'
+                             % (name, (slowdown - 1) * 100))
+        return regressions and 1 or 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
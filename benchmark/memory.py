@@ -0,0 +1,118 @@
+#  Copyright 2008 Nokia Siemens Networks Oyj
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+"""Measures memory used by the model of an output file.
+
+usage: memory.py [tests] [keywords]
+
+Generates an output file with given number of tests, each having given
+number of keywords, loads it and prints the memory used by the model per
+keyword. Objects shared between keywords, such as interned strings, are
+counted only once.
+"""
+
+import gc
+import os
+import sys
+import tempfile
+import time
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from mabot.model.model import ManualSuite, ManualKeyword
+from mabot.utils import robotapi
+
+_NOT_COUNTED = (type, types.ClassType, types.ModuleType, types.FunctionType)
+
+
+def write_output(path, tests, keywords):
+    output = open(path, 'w')
+    try:
+        output.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                     '<robot generated="20120101 12:00:00.000" '
+                     'generator="Robot 2.7.7">\n'
+                     '<suite source="/tmp/memory.txt" name="Memory">\n')
+        for test in range(tests):
+            output.write('<test name="Test %d" timeout="">\n' % test)
+            for kw in range(keywords):
+                output.write('<kw type="kw" name="Keyword %d" timeout="">\n'
+                             '<doc>Logs a message.</doc>\n'
+                             '<arguments><arg>argument %d</arg></arguments>\n'
+                             '<msg timestamp="20120101 12:00:%02d.%03d" level="INFO">'
+                             'Message %d</msg>\n'
+                             '<status status="PASS" starttime="20120101 12:00:%02d.%03d" '
+                             'endtime="20120101 12:00:%02d.%03d"></status>\n'
+                             '</kw>\n' % (kw, kw, test % 60, kw % 1000, kw,
+                                          test % 60, kw % 1000,
+                                          test % 60, (kw+1) % 1000))
+            output.write('<doc></doc>\n<tags></tags>\n'
+                         '<status status="PASS" critical="yes" '
+                         'starttime="20120101 12:00:00.000" '
+                         'endtime="20120101 12:00:01.000"></status>\n'
+                         '</test>\n')
+        output.write('<doc></doc>\n<metadata></metadata>\n'
+                     '<status status="PASS" starttime="20120101 12:00:00.000" '
+                     'endtime="20120101 12:00:01.000"></status>\n'
+                     '</suite>\n<statistics></statistics>\n<errors></errors>\n'
+                     '</robot>\n')
+    finally:
+        output.close()
+
+
+def get_size(root):
+    """Returns the total size of objects reachable from `root`."""
+    seen = set()
+    size = 0
+    stack = [root]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, _NOT_COUNTED):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        stack.extend(gc.get_referents(obj))
+    return size
+
+
+def count_keywords(item):
+    count = 0
+    for child in item._get_items():
+        if isinstance(child, ManualKeyword):
+            count += 1
+        count += count_keywords(child)
+    return count
+
+
+def measure(tests, keywords):
+    handle, path = tempfile.mkstemp(suffix='.xml')
+    os.close(handle)
+    try:
+        write_output(path, tests, keywords)
+        start = time.time()
+        suite = ManualSuite(robotapi.XmlTestSuite(path), from_xml=True)
+        elapsed = time.time() - start
+    finally:
+        os.remove(path)
+    return count_keywords(suite), get_size(suite), elapsed
+
+
+if __name__ == '__main__':
+    tests, keywords = [int(arg) for arg in (sys.argv[1:] + ['1000', '20'])[:2]]
+    count, size, elapsed = measure(tests, keywords)
+    print 'Keywords:         %d' % count
+    print 'Model size:       %.1f MB' % (size / 1024.0 / 1024)
+    print 'Bytes per node:   %d' % (size / (count + tests))
+    print 'Creating model:   %.2f s' % elapsed
@@ -49,7 +49,8 @@ setup(name         = 'mabot',
       package_data = find_package_data(str(SOURCE_DIR)),
       # Always install everything, since we may be switching between versions
       options      = { 'install': { 'force' : True } },
-      scripts      = [ 'src/bin/mabot', 'src/bin/mabot.bat' ]
+      scripts      = [ 'src/bin/mabot', 'src/bin/mabot.bat',
+                       'src/bin/mabot-batch', 'src/bin/mabot-batch.bat' ]
       )
 
 @task
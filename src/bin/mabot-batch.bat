@@ -0,0 +1,2 @@
+@echo off
+python -m mabot.batch %*
\ No newline at end of file
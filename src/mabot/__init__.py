@@ -44,6 +44,8 @@ Options:
                           works the same way using '&' or 'AND'.
                           When this option is given, it overrides the exclude
                           setting. New value is also automatically saved.
+ --startuptime            Print how long starting up takes and exit when the
+                          data has been loaded and shown.
  -h -? --help             Print usage instructions.
  --version                Print version information.
 
@@ -58,20 +60,20 @@ $ mabot.py output.xml
 
 import sys
 import os
+import time
 
 # Insert bundled robot to path before anything else
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lib'))
 
-from mabot import settings
-from mabot.utils.robotapi import Information, DataError, ArgumentParser, ROBOT_VERSION
-from mabot import model
-from mabot import ui
-from mabot.ui.main import Mabot
 from mabot.version import version
 
+# This package is imported before any of its modules, so Robot, the settings
+# and the model are imported only when they are actually needed.
 
 
 def run(args):
+    started = time.time()
+    from mabot.utils.robotapi import Information, DataError, ArgumentParser
     aparser = ArgumentParser(__doc__, version=version, arg_limits=(0,1))
     try:
         opts, args = _get_opts_and_args(aparser, args)
@@ -79,9 +81,12 @@ def run(args):
         _exit(str(msg))
     except DataError, err:
         _exit(str(err), 1)
-    Mabot(args and args[0] or None, opts)
+    # Imported here so that using the model does not require Tkinter
+    from mabot.ui.main import Mabot
+    Mabot(args and args[0] or None, opts, started)
 
 def _get_opts_and_args(aparser, args):
+    from mabot.utils.robotapi import ROBOT_VERSION
     if ROBOT_VERSION < '2.7':
         return aparser.parse_args(args, help='help', version='version',
                                   check_args=True)
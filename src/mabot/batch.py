@@ -0,0 +1,263 @@
+#  Copyright 2008 Nokia Siemens Networks Oyj
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+"""Mabot Batch -- Marks test results without the user interface
+
+Version: <VERSION>
+
+Usage:  mabot-batch [options] datasource/output updates
+
+Loads data like Mabot, applies updates read from a CSV or JSON file and saves
+the results. Tkinter is not needed.
+
+Updates file contains one update per row or object with following fields.
+Either `test` or `tag` is required, other fields are optional.
+
+  test         Longname of the test to update. Can be a simple pattern with
+               '*' and '?', in which case all matching tests are updated.
+  tag          Tag pattern selecting tests like with the --include option
+               of Mabot, for example 'smoke' or 'tag1&tag2'.
+  status       New status, PASS or FAIL.
+  message      New message.
+  tags         Tags to add, separated with commas.
+  remove_tags  Tags to remove, separated with commas.
+
+Files with extension '.json' must contain a list of objects, other files are
+read as CSV files having the field names in the first row.
+
+Options:
+
+ -o --output path         Save results to this file instead of the output
+                          related to the loaded data.
+ -f --force               Remove the lock of the output if it exists.
+ -h -? --help             Print usage instructions.
+ --version                Print version information.
+
+Examples:
+
+$ mabot-batch tests.html results.csv
+
+$ mabot-batch --output manual.xml output.xml results.json
+"""
+
+import csv
+import os
+import sys
+from operator import attrgetter
+
+from mabot.utils.robotapi import (Information, DataError, ArgumentParser,
+                                  ROBOT_VERSION, matches)
+from mabot.utils.lock import LOCKED_TITLE, LockException
+from mabot.model import model
+from mabot.model.io import IO
+from mabot.model.merge import iter_tests
+from mabot.version import version
+
+STATUSES = ('PASS', 'FAIL')
+
+
+class BatchError(Exception):
+    """Used when updates cannot be read or applied."""
+
+
+class Batch(object):
+    """Applies updates to a suite selecting tests by longname or tag pattern.
+
+    Tests are indexed by their normalized longnames once, so updates selecting
+    a single test cost only a dictionary lookup and an incremental statistics
+    update. Like name patterns, longnames are matched ignoring case, spaces and
+    underscores. Tag patterns are resolved using the tag index of the model.
+    """
+
+    def __init__(self, suite):
+        self._suite = suite
+        self._tests = list(iter_tests(suite))
+        self._index = model.ItemIndex(self._tests, attrgetter('longname'))
+        self._selections = {}
+
+    def apply(self, updates):
+        """Applies updates and returns the number of updated tests.
+
+        Updates are applied in one model transaction so that statuses of
+        suites are recalculated only once.
+        """
+        count = 0
+        model.TRANSACTION.begin()
+        try:
+            for update in updates:
+                count += self.apply_update(update)
+        finally:
+            model.TRANSACTION.commit()
+        return count
+
+    def apply_update(self, update):
+        tests = self._select(update)
+        status = self._get_status(update)
+        message = update.get('message')
+        add_tags = self._get_tags(update, 'tags')
+        remove_tags = self._get_tags(update, 'remove_tags')
+        for test in tests:
+            if status or message is not None:
+                test.update_status_and_message(status or test.status, message)
+            if add_tags:
+                test.add_tags(add_tags)
+            if remove_tags:
+                test.remove_tags(remove_tags)
+        return len(tests)
+
+    def _select(self, update):
+        if update.get('test'):
+            return self._select_by_name(update['test'])
+        if update.get('tag'):
+            return self._select_by_tag(update['tag'])
+        raise BatchError("Update %s has no 'test' or 'tag'." % update)
+
+    def _select_by_name(self, pattern):
+        if pattern in self._index:
+            return [self._index.get(pattern)]
+        if '*' not in pattern and '?' not in pattern:
+            raise BatchError("Test '%s' not found." % pattern)
+        return self._get_selection(('test', pattern),
+            lambda test: matches(test.longname, pattern, ignore=['_']))
+
+    def _select_by_tag(self, pattern):
+        key = ('tag', pattern)
+        if key not in self._selections:
+            includes, excludes = model.get_includes_and_excludes_from_pattern(pattern)
+            tests = self._suite.get_tag_index().select(includes, excludes)
+            self._selections[key] = list(tests)
+        return self._selections[key]
+
+    def _get_selection(self, key, condition):
+        # Tags can change while applying updates, but selecting tests again
+        # for every update having the same pattern would make big batches slow.
+        if key not in self._selections:
+            self._selections[key] = [test for test in self._tests
+                                     if condition(test)]
+        return self._selections[key]
+
+    def _get_tags(self, update, name):
+        tags = update.get(name) or []
+        if isinstance(tags, basestring):
+            tags = tags.split(',')
+        return [tag.strip() for tag in tags if tag.strip()]
+
+    def _get_status(self, update):
+        status = (update.get('status') or '').strip().upper()
+        if status and status not in STATUSES:
+            raise BatchError("Invalid status '%s' for '%s'."
+                             % (update['status'], update.get('test') or update.get('tag')))
+        return status
+
+
+def read_updates(path):
+    """Reads updates from a JSON or CSV file as a list of dictionaries."""
+    try:
+        if os.path.splitext(path)[1].lower() == '.json':
+            return _read_json(path)
+        return _read_csv(path)
+    except (IOError, ValueError, csv.Error), error:
+        raise BatchError("Reading updates from '%s' failed: %s" % (path, error))
+
+
+def _read_json(path):
+    import json
+    source = open(path, 'rb')
+    try:
+        updates = json.load(source)
+    finally:
+        source.close()
+    if not isinstance(updates, list):
+        raise ValueError('Expected a list of updates.')
+    return updates
+
+
+def _read_csv(path):
+    source = open(path, 'rb')
+    try:
+        # Empty cells mean that the field is not updated
+        return [dict((name, value.decode('UTF-8'))
+                     for name, value in row.items() if value)
+                for row in csv.DictReader(source)]
+    finally:
+        source.close()
+
+
+def batch(datasource, updates, output=None, force=False):
+    """Loads the data, applies updates from a file and saves the results.
+
+    Returns the number of updated tests. Journals of unsaved changes made
+    in Mabot are neither replayed nor removed.
+    """
+    orig_show_warning = model.show_warning
+    model.show_warning = _print_warning
+    try:
+        io = IO(use_journal=False)
+        suite = io.load_data(datasource)
+        count = Batch(suite).apply(read_updates(updates))
+        io.save_data(output, _BatchQuestions(force))
+    finally:
+        model.show_warning = orig_show_warning
+    return count
+
+
+class _BatchQuestions(object):
+    """Answers questions asked when saving.
+
+    Existing locks are removed only when forced. In conflicts with results
+    saved by someone else, updates from the batch are kept.
+    """
+
+    def __init__(self, force):
+        self._force = force
+
+    def __call__(self, title, message):
+        if title == LOCKED_TITLE:
+            return self._force
+        return False
+
+
+def _print_warning(title, message):
+    sys.stderr.write('[ WARN ] %s: %s\n' % (title, message))
+
+
+def run(args):
+    aparser = ArgumentParser(__doc__, version=version, arg_limits=(2,2))
+    try:
+        opts, args = _get_opts_and_args(aparser, args)
+    except Information, msg:
+        _exit(str(msg))
+    except DataError, err:
+        _exit(str(err), 1)
+    try:
+        count = batch(args[0], args[1], opts['output'], opts['force'])
+    except (BatchError, IOError, LockException), err:
+        _exit(str(err), 1)
+    print 'Updated %d tests.' % count
+
+def _get_opts_and_args(aparser, args):
+    if ROBOT_VERSION < '2.7':
+        return aparser.parse_args(args, help='help', version='version',
+                                  check_args=True)
+    return aparser.parse_args(args)
+
+def _exit(message, rc=0):
+    print message
+    if rc != 0:
+        print '\nTry --help for usage information.'
+    sys.exit(rc)
+
+if __name__ == '__main__':
+    run(sys.argv[1:])
@@ -0,0 +1,242 @@
+#  Copyright 2008 Nokia Siemens Networks Oyj
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+import cPickle as pickle
+import os
+import sys
+from hashlib import sha1
+
+from model import ManualSuite, ItemIndex
+from utils import set_longnames
+from mabot import utils
+from mabot.settings.utils import SETTINGS_DIRECTORY
+from mabot.utils import robotapi
+from mabot.version import version
+
+CACHE_DIRECTORY = os.path.join(SETTINGS_DIRECTORY, 'mabot', 'cache')
+FORMAT = 6
+
+
+class TestDataCache(object):
+    """Persistent cache of models built from test data.
+
+    Models are stored as pickles keyed by the data source and the settings
+    affecting the model. When loading, only suites whose files or directories
+    have changed are parsed again. Suites inheriting settings from an
+    initialization file of a parent directory cannot be parsed separately
+    and changes in them cause parsing the whole data source.
+
+    Also files and directories Robot leaves out of the model, for example
+    because they contain no tests, are tracked. A change in them causes
+    parsing the directory containing them again.
+
+    Resource and variable files imported by the suites are tracked too, and
+    a change in them causes parsing the whole data source. If an imported
+    file cannot be located without running the tests, for example because
+    its path contains variables, the cache is not used at all.
+    """
+
+    def __init__(self, settings, directory=None):
+        self._settings = settings
+        self._directory = directory or CACHE_DIRECTORY
+        self._imports = set()
+
+    def load(self, source):
+        """Returns the model of `source`, parsing it only when needed."""
+        source = os.path.abspath(source)
+        path = self._get_cache_path(source)
+        suite, signatures, self._imports = self._read(path)
+        try:
+            if suite is None or _imports_changed(self._imports, signatures):
+                raise _ParsingNeeded
+            updated = self._update(suite, signatures)
+        except _ParsingNeeded:
+            self._imports = set()
+            suite = self._parse(source)
+            updated = True
+        if updated:
+            self._write(path, suite)
+        return suite
+
+    def _get_cache_path(self, source):
+        key = repr((source, self._settings['include'],
+                    self._settings['exclude'],
+                    self._settings['default_message'],
+                    robotapi.ROBOT_VERSION, version))
+        return os.path.join(self._directory, '%s.cache' % sha1(key).hexdigest())
+
+    def _read(self, path):
+        if not os.path.exists(path):
+            return None, None, set()
+        try:
+            cache = open(path, 'rb')
+            try:
+                format, signatures, imports, suite = pickle.load(cache)
+            finally:
+                cache.close()
+        except Exception:
+            # Corrupted or incompatible caches are just ignored
+            return None, None, set()
+        if format != FORMAT:
+            return None, None, set()
+        return suite, signatures, imports
+
+    def _write(self, path, suite):
+        if not os.path.exists(self._directory):
+            os.makedirs(self._directory)
+        temp = '%s.tmp' % path
+        cache = open(temp, 'wb')
+        signatures = _get_signatures(suite.source)
+        for imported in self._imports - set([None]):
+            signatures[imported] = _get_signature(imported)
+        try:
+            pickle.dump((FORMAT, signatures, self._imports, suite), cache,
+                        pickle.HIGHEST_PROTOCOL)
+        finally:
+            cache.close()
+        if os.name == 'nt' and os.path.exists(path):
+            os.remove(path)
+        os.rename(temp, path)
+
+    def _parse(self, source, parent=None):
+        data = utils.load_data(source, self._settings)
+        _get_imported_files(data, self._imports)
+        return ManualSuite(data, parent)
+
+    def _update(self, suite, signatures):
+        if _get_signature(suite.source) != signatures.get(suite.source) or \
+                _skipped_data_changed(suite, signatures):
+            if suite.parent is None or _has_init_file_in_parents(suite):
+                raise _ParsingNeeded
+            self._reparse(suite)
+            return True
+        updated = False
+        for sub_suite in suite.suites[:]:
+            if self._update(sub_suite, signatures):
+                updated = True
+        if updated:
+            suite._update_own_status()
+        return updated
+
+    def _reparse(self, suite):
+        parent = suite.parent
+        try:
+            new_suite = self._parse(suite.source, parent)
+        except Exception:
+            # For example, a file without tests matching include and exclude
+            # settings is silently left out only when parsing the whole data.
+            raise _ParsingNeeded
+        set_longnames(new_suite, parent.longname)
+        parent.suites[parent.suites.index(suite)] = new_suite
+        parent._suite_index = ItemIndex(parent.suites)
+        parent._reset_tag_indexes()
+        parent._execution_status_changed()
+
+
+class _ParsingNeeded(Exception):
+    pass
+
+
+def _get_signatures(source, signatures=None):
+    """Returns signatures of `source` and all data files and directories in it.
+
+    Files and directories Robot tries to parse are included whether they
+    ended up in the model or not.
+    """
+    if signatures is None:
+        signatures = {}
+    signatures[source] = _get_signature(source)
+    if os.path.isdir(source):
+        for path in robotapi.list_data_files(source):
+            _get_signatures(path, signatures)
+    return signatures
+
+
+def _skipped_data_changed(suite, signatures):
+    if not os.path.isdir(suite.source):
+        return False
+    sources = set(sub_suite.source for sub_suite in suite.suites)
+    for path in robotapi.list_data_files(suite.source):
+        if path not in sources:
+            for skipped, signature in _get_signatures(path).items():
+                if signatures.get(skipped) != signature:
+                    return True
+    return False
+
+
+def _imports_changed(imports, signatures):
+    return None in imports or \
+        any(_get_signature(path) != signatures.get(path) for path in imports)
+
+
+def _get_imported_files(suite, files):
+    """Adds resource and variable files imported by `suite` to `files`.
+
+    Also files imported by the imported resource files and by child suites
+    are added. None is added if a path contains variables.
+    """
+    for setting in suite.imports:
+        _add_imported_file(setting, files)
+    for sub_suite in suite.suites:
+        _get_imported_files(sub_suite, files)
+
+
+def _add_imported_file(setting, files):
+    if setting.type not in ('Resource', 'Variables'):
+        return
+    path = _find_imported_file(setting.name, setting.directory)
+    if path in files:
+        return
+    files.add(path)
+    if path is not None and setting.type == 'Resource':
+        for imported in robotapi.get_resource_imports(path):
+            _add_imported_file(imported, files)
+
+
+def _find_imported_file(name, directory):
+    # Like Robot, which looks for the file also from the module search path.
+    if '${' in name or '@{' in name:
+        return None
+    name = name.replace('/', os.sep)
+    for base in [directory] + sys.path:
+        if base and os.path.exists(os.path.join(base, name)):
+            return os.path.abspath(os.path.join(base, name))
+    # Not found files are tracked in case they are created later.
+    return os.path.abspath(os.path.join(directory or os.curdir, name))
+
+
+def _get_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    if os.path.isdir(path):
+        return stat.st_mtime, tuple(_get_signature(init)
+                                    for init in _get_init_files(path))
+    return stat.st_mtime, stat.st_size
+
+
+def _get_init_files(directory):
+    return [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+            if os.path.splitext(name)[0].lower() == '__init__']
+
+
+def _has_init_file_in_parents(suite):
+    parent = suite.parent
+    while parent is not None:
+        if os.path.isdir(parent.source) and _get_init_files(parent.source):
+            return True
+        parent = parent.parent
+    return False
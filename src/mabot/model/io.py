@@ -16,48 +16,85 @@
 import os.path
 import shutil
 import time
-try:
-    import xml.etree.cElementTree as ET
-except ImportError:
-    try:
-        import cElementTree as ET
-    except ImportError:
-        try:
-            import elementtree.ElementTree as ET
-        except ImportError:
-            raise ImportError('Could not import ElementTree module. '
-                              'Upgrade to Python 2.5+ or install ElementTree '
-                              'from http://effbot.org/zone/element-index.htm')
 
 from model import EmptySuite
 from model import ManualSuite
-from model import DATA_MODIFIED
+from model import DATA_MODIFIED, JOURNAL
+from outputlayout import OutputLayout, LayoutError
+from outputheader import OutputSignature, HeaderError, validate
+from merge import ResultSnapshot, ThreeWayMerge, iter_tests
+from cache import TestDataCache
+from shards import ShardedOutput
+from journal import get_journal_path, replay_journals
+from lazyoutput import load_lazily
 from mabot.settings import SETTINGS
 from mabot import utils
 from mabot.utils import robotapi
+from mabot.utils.progress import Progress, ProgressReader
+
+OTHER_SUITE_TITLE = 'Output Contains Another Suite!'
 
 
 class IO:
 
-    def __init__(self):
+    def __init__(self, use_journal=True):
         self.ask_method = None
         self.xml_generated = None
         self.output = None
         self.suite = EmptySuite()
+        self._layout = None
+        self._validated_output = None
+        self._base = ResultSnapshot()
+        self._shards = None
+        self.journal_replayed = 0
+        self._use_journal = use_journal
 
-    def load_data(self, path):
+    def load_data(self, path, progress=None):
+        """Loads test data and/or output reporting progress to `progress`.
+
+        If loading is cancelled, the state of this object is undefined.
+        """
         if not path:
             # In case empty suite is loaded
             return self.suite
+        progress = progress or Progress()
         datasource, xml = self._get_datasource_and_xml_from(path)
-        xml_suite, xml_error = self._load_xml_file(xml)
-        testdata_suite, data_error = self._load_datasource(datasource)
-        self._set_suite(testdata_suite, data_error, xml_suite, xml_error)
+        xml_suite, xml_error = self._load_xml_file(xml, not datasource, progress)
+        testdata_suite, data_error = self._load_datasource(datasource, progress)
+        self._set_suite(testdata_suite, data_error, xml_suite, xml_error,
+                        progress)
+        self._base = self._create_base(xml_suite and self.suite)
         self.output = xml or os.path.abspath('output.xml')
+        self._layout = self._create_layout()
+        self._open_journal(replay=True)
         return self.suite
 
-    def _set_suite(self, testdata_suite, data_error, xml_suite, xml_error):
+    def _create_base(self, suite):
+        # Results as they were in the output are needed only for merging.
+        if not SETTINGS["check_simultaneous_save"]:
+            suite = None
+        return ResultSnapshot(suite)
+
+    def _update_base(self, tests):
+        if SETTINGS["check_simultaneous_save"]:
+            self._base.update(tests)
+
+    def _open_journal(self, replay=False):
+        # The previous journal is kept until the new data is fully loaded so
+        # that it stays in use if loading fails or is cancelled.
+        if not self._use_journal:
+            return
+        JOURNAL.close()
+        if SETTINGS["journal_changes"]:
+            JOURNAL.open(get_journal_path(self.output))
+            if replay:
+                self.journal_replayed = replay_journals(self.output,
+                                                        self.suite, JOURNAL)
+
+    def _set_suite(self, testdata_suite, data_error, xml_suite, xml_error,
+                   progress):
         if testdata_suite and xml_suite:
+            progress.start('Combining results')
             testdata_suite.add_results(xml_suite)
             self.suite = testdata_suite
         elif xml_suite and not data_error:
@@ -76,25 +113,64 @@ class IO:
             error = xml_error[0]
         raise IOError("Could not load data!\n%s\n" % (error))
 
-    def _load_xml_file(self, xml):
+    def _load_xml_file(self, xml, lazy, progress):
         if xml and os.path.exists(xml):
             try:
-                suite = ManualSuite(robotapi.XmlTestSuite(xml), None, True)
-                self.xml_generated = self._get_xml_generation_time(xml)
+                suite = self._read_xml_file(xml, lazy, progress)
+                suite = self._build_suite(suite, True, progress)
+                self._shards = self._create_shards(xml)
+                if self._shards is not None:
+                    progress.start('Reading shards')
+                    self._shards.apply(suite)
+                self._validated_output = self._get_signature(xml)
+                self.xml_generated = self._validated_output.generated
                 return suite, None
             except Exception, error:
+                # Robot reports all errors, also cancelling, as DataErrors.
+                progress.check_cancelled()
                 return None, error
         return None, None
 
-    def _load_datasource(self, source):
+    def _read_xml_file(self, xml, lazy, progress):
+        progress.start("Reading '%s'" % os.path.basename(xml),
+                       os.path.getsize(xml), 'bytes')
+        if robotapi.ROBOT_VERSION < '2.7':
+            return robotapi.XmlTestSuite(xml)
+        # Keywords can be read lazily only when results are not combined
+        # with test data and tests are serialized by Mabot itself.
+        if lazy and SETTINGS["lazy_keyword_loading"]:
+            return load_lazily(xml, progress)
+        reader = ProgressReader(xml, progress)
+        try:
+            return robotapi.XmlTestSuite(reader)
+        finally:
+            reader.close()
+
+    def _build_suite(self, suite, from_xml, progress):
+        progress.start('Building model', _count_tests(suite), 'tests')
+        return ManualSuite(suite, None, from_xml, progress)
+
+    def _load_datasource(self, source, progress):
         if source:
             try:
-                suite = ManualSuite(utils.load_data(source, SETTINGS))
-                return suite, None
+                return self._parse_datasource(source, progress), None
             except Exception, error:
+                progress.check_cancelled()
                 return None, error
         return None, None
 
+    def _parse_datasource(self, source, progress):
+        progress.start('Parsing test data', unit='files')
+        parsing = utils.ParsingProgress(progress)
+        parsing.register()
+        try:
+            if SETTINGS["cache_test_data"]:
+                return TestDataCache(SETTINGS).load(source)
+            data = utils.load_data(source, SETTINGS)
+        finally:
+            parsing.unregister()
+        return self._build_suite(data, False, progress)
+
     def _get_datasource_and_xml_from(self, path):
         path = os.path.normcase(os.path.abspath(path))
         root, extension = os.path.splitext(path)
@@ -108,56 +184,277 @@ class IO:
             return path, None
         return path, '%s.xml' % (root)
 
-    def save_data(self, output, ask_method):
+    def save_data(self, output, ask_method, progress=None):
+        """Saves the model reporting progress to `progress`.
+
+        If saving is cancelled, the output is left as it was.
+        """
         if output:
             self.output = output
+        progress = progress or Progress()
+        merged = False
+        if not output and self.is_sharded():
+            shards = self._shards.get_modified_shards(self.suite)
+            merged = self._save_shards(shards, ask_method, progress)
+            if shards and \
+                    not self._shards.is_modified_outside_shards(self.suite):
+                DATA_MODIFIED.saved()
+                self._data_saved()
+                return True, merged
         lock = utils.LockFile(self.output)
         lock.create_lock(ask_method)
         try:
-            self._make_backup()
-            changes = self._reload_data_from_xml(ask_method)
+            self._validate_output()
+            changes = self._reload_data_from_xml(ask_method, progress)
             if DATA_MODIFIED.is_modified() or output:
-                self._save_data()
-                return True, changes
-            return False, changes
+                self._save_data(progress)
+                if not self.is_sharded():
+                    self._shards = self._create_shards(self.output)
+                self._data_saved()
+                return True, changes or merged
+            return False, changes or merged
         finally:
             lock.release_lock()
 
-    def _reload_data_from_xml(self, ask_method):
+    def _data_saved(self):
+        # Changes in the journal of this process are now in the output.
+        if not self._use_journal:
+            return
+        JOURNAL.clear()
+        self._open_journal()
+
+    def _create_shards(self, output):
+        if not SETTINGS["sharded_output"] or robotapi.ROBOT_VERSION < '2.7':
+            return None
+        return ShardedOutput(output, SETTINGS["shard_depth"])
+
+    def is_sharded(self):
+        return self._shards is not None and \
+               self._shards.output == self.output and \
+               os.path.exists(self.output)
+
+    def _save_shards(self, shards, ask_method, progress):
+        """Saves modified shards and returns True if others' results were merged.
+
+        Every shard is locked separately, so that others can save other
+        shards at the same time.
+        """
+        merged = False
+        for shard in shards:
+            path = self._shards.get_path(shard)
+            lock = self._shards.lock(shard, ask_method)
+            try:
+                if self._merge_shard(shard, path, ask_method, progress):
+                    merged = True
+                progress.start("Writing '%s'" % os.path.basename(path),
+                               _count_tests(shard), 'tests')
+                self._shards.write(shard, progress)
+            finally:
+                lock.release_lock()
+            self._update_base(iter_tests(shard))
+        return merged
+
+    def _merge_shard(self, shard, path, ask_method, progress):
+        if not SETTINGS["check_simultaneous_save"] or \
+                not os.path.exists(path) or not self._shards.is_changed(path):
+            return False
+        progress.start('Merging results saved by others')
+        result = ThreeWayMerge(self._base).merge(shard, self._shards.read(path))
+        self._resolve_conflicts(result, ask_method)
+        return True
+
+    def combine_shards(self, ask_method, progress=None):
+        """Writes results of all shards saved by anyone to the output.
+
+        Results saved to the output by others are merged to the model first,
+        and True is returned if there were any. The output must be sharded.
+        """
+        progress = progress or Progress()
+        lock = utils.LockFile(self.output)
+        lock.create_lock(ask_method)
+        try:
+            self._validate_output()
+            changes = self._reload_data_from_xml(ask_method, progress)
+            progress.start("Combining '%s'" % os.path.basename(self.output),
+                           unit='tests')
+            self._make_backup()
+            try:
+                # Shards are read separately so that changes in them are
+                # still merged when saving them.
+                generated = self._create_shards(self.output).combine(
+                                                            progress=progress)
+            except:
+                self._copy_linked_backup()
+                raise
+        finally:
+            lock.release_lock()
+        self._validated_output = self._get_signature(self.output)
+        self.xml_generated = generated or self._validated_output.generated
+        self._layout = self._create_layout()
+        return changes
+
+    def _reload_data_from_xml(self, ask_method, progress):
         if SETTINGS["always_load_old_data_from_xml"] and \
             SETTINGS["check_simultaneous_save"] and \
             os.path.exists(self.output) and \
             self.xml_generated != self._get_xml_generation_time():
-            xml_suite = ManualSuite(robotapi.XmlTestSuite(self.output), None, True)
-            if xml_suite:
-                self.suite.add_results(xml_suite, True, ask_method)
-                return True
+            progress.start('Merging results saved by others')
+            other_suite = robotapi.XmlTestSuite(self.output)
+            if not robotapi.eq(self.suite.name, other_suite.name, ignore=['_']):
+                self._confirm_overwriting(other_suite, ask_method)
+                return False
+            result = ThreeWayMerge(self._base).merge(self.suite, other_suite)
+            self._resolve_conflicts(result, ask_method)
+            return True
         return False
 
-    def _save_data(self):
+    def _confirm_overwriting(self, other_suite, ask_method):
+        message = ("Output '%s' has been saved by someone else with results "
+                   "of suite '%s'.\nDo you want to overwrite it with suite "
+                   "'%s'?" % (self.output, other_suite.name, self.suite.name))
+        if ask_method is None or not ask_method(OTHER_SUITE_TITLE, message):
+            raise IOError("Results of suite '%s' in '%s' were not overwritten."
+                          % (other_suite.name, self.output))
+
+    def _resolve_conflicts(self, result, ask_method):
+        if result.conflicts:
+            use_theirs = ask_method is not None and \
+                         ask_method(*result.get_conflict_message())
+            result.resolve(use_theirs)
+        if result.added:
+            DATA_MODIFIED.modified()
+
+    def _save_data(self, progress):
+        modified_tests = self._get_modified_tests()
         self.suite.save()
-        self._make_backup()
-        testoutput = robotapi.RobotTestOutput(self.suite)
-        testoutput.serialize_output(self.output, self.suite)
-        self.suite.saved()
+        try:
+            self._make_backup()
+            if modified_tests is None:
+                generated = self._write_output(progress)
+            else:
+                generated = self._write_modified_tests(modified_tests, progress)
+        except:
+            # Items are already marked saved and only saving everything
+            # is reliable after a failed or cancelled save.
+            self._layout = None
+            if os.path.exists(self._temp_path):
+                os.remove(self._temp_path)
+            self._copy_linked_backup()
+            raise
+        finally:
+            self.suite.saved()
         DATA_MODIFIED.saved()
-        self.xml_generated = self._get_xml_generation_time()
+        self._validated_output = self._get_signature(self.output)
+        # Older Robot versions do not return the generation time
+        self.xml_generated = generated or self._validated_output.generated
+        if modified_tests is None:
+            self._layout = self._create_layout()
+            self._base = self._create_base(self.suite)
+        else:
+            self._update_base(modified_tests)
 
-    def _make_backup(self):
+    def _create_layout(self):
+        if not self._incremental_save_enabled() or \
+                not os.path.exists(self.output):
+            return None
+        try:
+            layout = OutputLayout(self.output)
+        except (LayoutError, EnvironmentError):
+            return None
+        if not layout.bind(self.suite):
+            return None
+        return layout
+
+    def _incremental_save_enabled(self):
+        return SETTINGS["incremental_save"] and robotapi.ROBOT_VERSION >= '2.7'
+
+    def _get_modified_tests(self):
+        if not self._incremental_save_enabled() or self._layout is None or \
+                not self._layout.is_valid(self.output):
+            return None
+        return self._layout.get_modified_tests(self.suite)
+
+    def _write_output(self, progress):
+        progress.start("Writing '%s'" % os.path.basename(self.output),
+                       _count_tests(self.suite), 'tests')
+        testoutput = robotapi.RobotTestOutput(self.suite, progress)
+        generated = testoutput.serialize_output(self._temp_path, self.suite)
+        self._replace_output(self._temp_path)
+        return generated
+
+    def _write_modified_tests(self, tests, progress):
+        progress.start("Writing '%s'" % os.path.basename(self.output),
+                       len(tests), 'tests')
+        writer = robotapi.FragmentWriter()
+        generated, root_tag = writer.root()
+        replacements = [(self._layout.root_tag, root_tag),
+                        (self._layout.statistics, writer.statistics(self.suite))]
+        for test in tests:
+            replacements.append((self._layout.get_span(test), writer.test(test)))
+            progress.advance()
+        for suite, span in self._layout.get_suite_status_spans(self.suite):
+            replacements.append((span, writer.suite_status(suite)))
+        self._layout.write(replacements, self._temp_path)
+        self._replace_output(self._temp_path)
+        self._layout.file_replaced()
+        return generated
+
+    def _replace_output(self, path):
+        if os.name == 'nt' and os.path.exists(self.output):
+            os.remove(self.output)
+        os.rename(path, self.output)
+
+    def _validate_output(self):
+        """Returns True if the output needs a backup and is valid."""
         if not self._backup_is_needed():
-            return
+            return False
         try:
             self._validate_related_xml(self.output)
         except:
             self._store_old_backup()
-        else:
-            shutil.copyfile(self.output, self._backup_path)
+            return False
+        return True
+
+    def _make_backup(self):
+        # Called only right before the output is replaced.
+        if self._validate_output():
+            self._snapshot(self.output, self._backup_path)
+
+    def _snapshot(self, source, target):
+        # The output is replaced with a new file right after the backup is
+        # made, so a hard link keeps the old file as the backup. Should the
+        # output be left in place, the link is replaced with a copy using
+        # `_copy_linked_backup`, so that writing to the output later does
+        # not change the backup.
+        if hasattr(os, 'link'):
+            if os.path.exists(target):
+                os.remove(target)
+            try:
+                os.link(source, target)
+                return
+            except OSError:
+                pass
+        shutil.copyfile(source, target)
+
+    def _copy_linked_backup(self):
+        backup = self._backup_path
+        if hasattr(os, 'link') and os.path.exists(backup) and \
+                os.path.exists(self.output) and \
+                os.path.samefile(backup, self.output):
+            os.remove(backup)
+            shutil.copyfile(self.output, backup)
 
     def _backup_is_needed(self):
         return os.path.exists(self.output) and SETTINGS["always_load_old_data_from_xml"]
 
     def _validate_related_xml(self, path):
-        self._get_xml_generation_time(path)
+        signature = self._get_signature(path)
+        if signature != self._validated_output:
+            try:
+                validate(path)
+            except HeaderError:
+                raise IOError('%s is not a valid XML file!' % path)
+            self._validated_output = signature
 
     def _store_old_backup(self):
         if not os.path.exists(self._backup_path):
@@ -178,6 +475,10 @@ Note that some results will most probably be lost.
     def _backup_path(self):
         return '%s.bak' % self.output
 
+    @property
+    def _temp_path(self):
+        return '%s.tmp' % self.output
+
     @property
     def _backup_path_with_timestamp(self):
         return '%s_%s.bak' % (self.output, self._get_timestamp())
@@ -186,9 +487,15 @@ Note that some results will most probably be lost.
         return '%d%02d%02d%02d%02d%02d' % time.localtime()[:6]
 
     def _get_xml_generation_time(self, path=None):
-        if path is None:
-            path = self.output
+        return self._get_signature(path or self.output).generated
+
+    def _get_signature(self, path):
         try:
-            return ET.ElementTree(file=path).getroot().get("generated")
-        except:
-            raise IOError('%s is not a valid XML file!' % self.output)
+            return OutputSignature(path)
+        except (HeaderError, EnvironmentError):
+            raise IOError('%s is not a valid XML file!' % path)
+
+
+def _count_tests(suite):
+    return len(suite.tests) + sum(_count_tests(sub_suite)
+                                  for sub_suite in suite.suites)
@@ -0,0 +1,281 @@
+#  Copyright 2008 Nokia Siemens Networks Oyj
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+import getpass
+import json
+import os
+import re
+import threading
+
+from mabot.utils import robotapi
+
+try:
+    import fcntl
+
+    def _lock(file):
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def _unlock(file):
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+except ImportError:
+    import msvcrt
+
+    def _lock(file):
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+
+    def _unlock(file):
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class Journal(object):
+    """Append-only log of changes made to the model after it was saved.
+
+    Recording a change only notes the changed item. The current status,
+    message and tags of noted items are appended to the journal file, one
+    JSON record per line, and synced to the disk when `flush` is called.
+    Changes can thus be recorded often and flushed in batches. The journal
+    is removed with `clear` after its changes have been saved to the output.
+
+    The journal file is locked while it is open so that other processes
+    do not replay it. See `get_journal_path` and `replay_journals`.
+    """
+
+    def __init__(self):
+        self.path = None
+        self._file = None
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def open(self, path):
+        """Starts journaling changes to `path` closing the current journal."""
+        self.close()
+        self.path = path
+
+    def record(self, item):
+        if self.path is not None:
+            self._lock.acquire()
+            self._pending[id(item)] = item
+            self._lock.release()
+
+    def flush(self):
+        """Appends records of changed items to the journal file."""
+        self._lock.acquire()
+        try:
+            items, self._pending = self._pending.values(), {}
+            records = [record for record in map(_create_record, items)
+                       if record is not None]
+            if not records or self.path is None:
+                return
+            # Parents are written after their children, because replaying
+            # a child changes the status of its parent.
+            records.sort(key=lambda record: -len(record['keywords']))
+            if self._file is None:
+                self._open_file()
+            self._file.write(''.join(json.dumps(record) + '\n'
+                                     for record in records))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        """Removes the journal and discards changes not yet flushed."""
+        self._lock.acquire()
+        try:
+            self._pending = {}
+            self._close_file()
+            if self.path is not None and os.path.exists(self.path):
+                os.remove(self.path)
+        finally:
+            self._lock.release()
+
+    def close(self):
+        """Flushes pending changes and stops journaling."""
+        self.flush()
+        self._lock.acquire()
+        try:
+            self._close_file()
+            self.path = None
+        finally:
+            self._lock.release()
+
+    def _open_file(self):
+        journal = open(self.path, 'ab')
+        try:
+            _lock(journal)
+        except:
+            journal.close()
+            raise
+        self._file = journal
+
+    def _close_file(self):
+        if self._file is not None:
+            _unlock(self._file)
+            self._file.close()
+            self._file = None
+
+
+def _create_record(item):
+    record = {'status': item.status, 'message': item.message,
+              'modified': item.starttime}
+    if item.is_test():
+        record['tags'] = list(item.tags)
+    keywords = []
+    while item.is_keyword():
+        index = _index(item.parent.keywords, item)
+        if index is None:
+            # For example, setups of suites.
+            return None
+        keywords.insert(0, index)
+        item = item.parent
+    if not item.is_test():
+        return None
+    names = []
+    while item is not None:
+        names.insert(0, item.name)
+        item = item.parent
+    record['test'] = names
+    record['keywords'] = keywords
+    return record
+
+
+def _index(items, item):
+    # Items with equal results compare equal, so identity is used instead.
+    for index, other in enumerate(items):
+        if other is item:
+            return index
+    return None
+
+
+def get_journal_path(output):
+    """Returns the path of the journal of this process for `output`.
+
+    Every user and process has an own journal, so that nobody removes or
+    replays changes that someone else has not yet saved.
+    """
+    user = re.sub(r'[^\w-]', '_', _get_user())
+    return '%s.%s.%d.journal' % (output, user, os.getpid())
+
+
+def _get_user():
+    try:
+        return getpass.getuser()
+    except Exception:
+        return 'Unknown'
+
+
+def replay_journals(output, suite, journal):
+    """Applies changes in journals of `output` not used by any process.
+
+    Journals are used by their processes while they are locked, so only
+    journals of processes that have died, and the earlier journal of this
+    process, are replayed. Applied changes are recorded to `journal`, and
+    replayed journals of other processes are removed after `journal` has
+    been flushed.
+
+    Returns the number of applied records. Records of items that are not
+    found, for example because the test data has changed, are ignored.
+    """
+    applied = []
+    replayed = []
+    for path in _find_journals(output):
+        items = _replay_unused_journal(path, suite)
+        if items is not None:
+            applied.extend(items)
+            replayed.append(path)
+    for item in applied:
+        journal.record(item)
+    try:
+        journal.flush()
+    except EnvironmentError:
+        # Replayed journals are kept until their changes are journaled.
+        return len(applied)
+    for path in replayed:
+        if path != journal.path and os.path.exists(path):
+            os.remove(path)
+    return len(applied)
+
+
+def _find_journals(output):
+    directory, name = os.path.split(output)
+    if not os.path.isdir(directory or os.curdir):
+        return []
+    paths = [os.path.join(directory, entry)
+             for entry in os.listdir(directory or os.curdir)
+             if entry.startswith(name + '.') and entry.endswith('.journal')]
+    # Later changes to the same items win.
+    return sorted(paths, key=os.path.getmtime)
+
+
+def _replay_unused_journal(path, suite):
+    try:
+        journal = open(path, 'rb')
+    except IOError:
+        # Removed by its process meanwhile.
+        return None
+    try:
+        try:
+            _lock(journal)
+        except IOError:
+            return None
+        try:
+            return _replay(journal, suite)
+        finally:
+            _unlock(journal)
+    finally:
+        journal.close()
+
+
+def _replay(journal, suite):
+    applied = []
+    for line in journal:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            # The last record is incomplete if Mabot died while writing.
+            continue
+        item = _find_item(suite, record)
+        if item is not None:
+            _apply_record(item, record)
+            applied.append(item)
+    return applied
+
+
+def _find_item(suite, record):
+    names = record['test']
+    if not robotapi.eq(suite.name, names[0], ignore=['_']):
+        return None
+    for name in names[1:-1]:
+        suite = suite.get_suite(name)
+        if suite is None:
+            return None
+    item = suite.get_test(names[-1])
+    for index in record['keywords']:
+        if item is None or index >= len(item.keywords):
+            return None
+        item = item.keywords[index]
+    return item
+
+
+def _apply_record(item, record):
+    item.update_status_and_message(record['status'], record['message'])
+    if 'tags' in record:
+        tags = record['tags']
+        item.remove_tags([tag for tag in item.tags if tag not in tags])
+        item.add_tags([tag for tag in tags if tag not in item.tags])
+    item.starttime = record['modified']
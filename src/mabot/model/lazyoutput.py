@@ -0,0 +1,319 @@
+#  Copyright 2008 Nokia Siemens Networks Oyj
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+import tempfile
+from xml.etree import cElementTree as ET
+from xml.parsers import expat
+
+from mabot.utils import robotapi
+from mabot.utils.progress import ProgressReader
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def load_lazily(path, progress=None):
+    """Reads suites and tests from an output file leaving keywords unparsed.
+
+    Returned suite can be given to `ManualSuite` like suites from
+    `robotapi.XmlTestSuite`. Keywords of tests are available as
+    `LazyKeywords` through `lazy_keywords` attribute of tests. Read bytes
+    are reported to `progress` if it is given.
+    """
+    source = KeywordSource()
+    scanner = _LazyScanner(source)
+    output = open(path, 'rb') if progress is None \
+        else ProgressReader(path, progress)
+    try:
+        scanner.scan(output)
+    finally:
+        output.close()
+    if scanner.suite is None:
+        raise expat.ExpatError("'%s' has no suite." % path)
+    return scanner.suite
+
+
+class KeywordSource(object):
+    """Private copy of an output file from which keywords are read.
+
+    The copy is needed because the output is replaced or rewritten when
+    results are saved and on some platforms an open file cannot be replaced.
+    The temporary file is removed automatically when it is closed.
+    """
+
+    def __init__(self):
+        self._file = tempfile.TemporaryFile()
+
+    def write(self, data):
+        self._file.write(data)
+
+    def read(self, start, end):
+        self._file.seek(start)
+        return self._file.read(end - start)
+
+    def parse(self, start, end):
+        data = '<keywords>%s</keywords>' % self.read(start, end)
+        return [_XmlKeyword(elem) for elem in ET.fromstring(data)]
+
+
+class LazyKeywords(object):
+    """Keywords of a test as a span of the output file.
+
+    `failed` tells whether some keyword has failed so that the execution
+    status of the test is known without parsing the keywords.
+    """
+
+    def __init__(self, source, start):
+        self._source = source
+        self.start = start
+        self.end = None
+        self.failed = False
+
+    def read(self):
+        """Returns the serialized keywords exactly as in the output file."""
+        return self._source.read(self.start, self.end)
+
+    def parse(self):
+        """Returns keywords as objects similar to the ones in Robot results."""
+        return self._source.parse(self.start, self.end)
+
+
+class _XmlSuite(object):
+
+    def __init__(self, attrs, parent):
+        self.name = attrs.get('name', '')
+        self.source = attrs.get('source', '')
+        self.longname = _get_longname(parent, self.name)
+        self.doc = ''
+        self.metadata = robotapi.NormalizedDict(ignore=['_'])
+        self.status = 'FAIL'
+        self.starttime = self.endtime = 'N/A'
+        self.keywords = _Fixtures()
+        self.suites = []
+        self.tests = []
+
+
+class _Fixtures(object):
+    setup = teardown = None
+
+
+class _XmlTest(object):
+    # Fixtures are serialized with other keywords and thus part of them.
+    setup = teardown = None
+    keywords = ()
+
+    def __init__(self, attrs, parent):
+        self.name = attrs.get('name', '')
+        self.longname = _get_longname(parent, self.name)
+        self.timeout = attrs.get('timeout', '')
+        self.doc = ''
+        self.tags = []
+        self.status = 'FAIL'
+        # Like Robot when reading outputs, all tests are considered critical.
+        self.critical = True
+        self.starttime = self.endtime = 'N/A'
+        self.message = ''
+        self.lazy_keywords = None
+
+
+def _get_longname(parent, name):
+    if parent is None:
+        return name
+    return '%s.%s' % (parent.longname, name)
+
+
+class _XmlKeyword(object):
+
+    def __init__(self, elem):
+        self.name = elem.get('name', '')
+        self.type = elem.get('type', 'kw')
+        self.timeout = elem.get('timeout', '')
+        self.doc = elem.findtext('doc') or ''
+        self.args = [arg.text or '' for arg in elem.findall('arguments/arg')]
+        self.messages = [_XmlMessage(msg) for msg in elem.findall('msg')]
+        self.keywords = [_XmlKeyword(kw) for kw in elem.findall('kw')]
+        status = elem.find('status')
+        self.status = status.get('status', 'FAIL')
+        self.starttime = status.get('starttime', 'N/A')
+        self.endtime = status.get('endtime', 'N/A')
+
+    @property
+    def message(self):
+        return self.messages[-1].message if self.messages else ''
+
+
+class _XmlMessage(object):
+
+    def __init__(self, elem):
+        self.message = elem.text or ''
+        self.timestamp = elem.get('timestamp', 'N/A')
+        self.level = elem.get('level', 'INFO')
+
+
+class _KeywordState(object):
+
+    def __init__(self):
+        self.status = None
+        self.message = False
+        self.failed_child = False
+
+    @property
+    def failed(self):
+        # Same rule as in the execution status of keywords in the model.
+        return self.status != 'PASS' and (self.message or self.failed_child)
+
+
+class _LazyScanner(object):
+    """Scans suites and tests from an output file copying it to `source`.
+
+    Contents of keywords are only inspected to find out whether they have
+    failed. Fixtures of suites are parsed after scanning.
+    """
+
+    def __init__(self, source):
+        self.suite = None
+        self._source = source
+        self._elements = []
+        self._items = []
+        self._keywords = []
+        self._fixtures = []
+        self._text = None
+        self._metadata_name = None
+        self._parser = expat.ParserCreate()
+        self._parser.StartElementHandler = self._start
+        self._parser.EndElementHandler = self._end
+
+    def scan(self, output):
+        while True:
+            chunk = output.read(CHUNK_SIZE)
+            self._source.write(chunk)
+            self._parser.Parse(chunk, not chunk)
+            if not chunk:
+                break
+        for suite, fixture in self._fixtures:
+            for kw in fixture.parse():
+                if kw.type in ('setup', 'teardown'):
+                    setattr(suite.keywords, kw.type, kw)
+
+    def _start(self, name, attrs):
+        parent = self._elements[-1] if self._elements else None
+        self._elements.append(name)
+        if name == 'kw' and parent in ('suite', 'test'):
+            self._start_keywords()
+        elif name == 'suite' and parent in ('robot', 'suite'):
+            self._start_item(_XmlSuite(attrs, self._current_suite), 'suites')
+        elif name == 'test' and parent == 'suite':
+            self._start_item(_XmlTest(attrs, self._current_suite), 'tests')
+        elif name == 'status' and parent in ('suite', 'test'):
+            self._set_status(self._items[-1], attrs)
+        elif name == 'item' and parent == 'metadata':
+            self._metadata_name = attrs.get('name', '')
+            self._start_text()
+        elif (name, parent) in [('doc', 'suite'), ('doc', 'test'),
+                                ('tag', 'tags')]:
+            self._start_text()
+
+    @property
+    def _current_suite(self):
+        return self._items[-1] if self._items else None
+
+    def _start_item(self, item, children):
+        if self._items:
+            getattr(self._items[-1], children).append(item)
+        else:
+            self.suite = item
+        self._items.append(item)
+
+    def _start_keywords(self):
+        item = self._items[-1]
+        keywords = LazyKeywords(self._source, self._parser.CurrentByteIndex)
+        if not isinstance(item, _XmlTest):
+            self._fixtures.append((item, keywords))
+        elif item.lazy_keywords is None:
+            item.lazy_keywords = keywords
+        self._keywords.append(_KeywordState())
+        # Keywords are the vast majority of elements and thus handled
+        # with separate, minimal handlers.
+        self._parser.StartElementHandler = self._start_in_keyword
+        self._parser.EndElementHandler = self._end_in_keyword
+
+    def _start_in_keyword(self, name, attrs):
+        if name == 'kw':
+            self._keywords.append(_KeywordState())
+        elif name == 'status':
+            self._keywords[-1].status = attrs.get('status')
+        elif name == 'msg':
+            self._keywords[-1].message = False
+            self._parser.CharacterDataHandler = self._message_text
+
+    def _message_text(self, data):
+        if data:
+            self._keywords[-1].message = True
+
+    def _set_status(self, item, attrs):
+        item.status = attrs.get('status', 'FAIL')
+        item.starttime = attrs.get('starttime', 'N/A')
+        item.endtime = attrs.get('endtime', 'N/A')
+        if isinstance(item, _XmlTest):
+            self._start_text()
+
+    def _start_text(self):
+        self._text = []
+        self._parser.CharacterDataHandler = self._text.append
+
+    def _end(self, name):
+        self._elements.pop()
+        parent = self._elements[-1] if self._elements else None
+        if name in ('suite', 'test') and parent in ('robot', 'suite'):
+            self._items.pop()
+        elif self._text is not None:
+            self._end_text(name)
+
+    def _end_in_keyword(self, name):
+        if name == 'msg':
+            self._parser.CharacterDataHandler = None
+        if name != 'kw':
+            return
+        state = self._keywords.pop()
+        if self._keywords:
+            if state.failed:
+                self._keywords[-1].failed_child = True
+        else:
+            self._end_keywords(state)
+            self._elements.pop()
+            self._parser.StartElementHandler = self._start
+            self._parser.EndElementHandler = self._end
+
+    def _end_keywords(self, state):
+        item = self._items[-1]
+        if isinstance(item, _XmlTest):
+            keywords = item.lazy_keywords
+        else:
+            keywords = self._fixtures[-1][1]
+        keywords.end = self._parser.CurrentByteIndex + len('</kw>')
+        keywords.failed = keywords.failed or bool(state.failed)
+
+    def _end_text(self, name):
+        text = u''.join(self._text)
+        self._text = None
+        self._parser.CharacterDataHandler = None
+        item = self._items[-1]
+        if name == 'doc':
+            item.doc = text
+        elif name == 'tag':
+            item.tags.append(text)
+        elif name == 'item':
+            item.metadata[self._metadata_name] = text
+        elif name == 'status':
+            item.message = text
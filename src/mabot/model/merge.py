@@ -0,0 +1,359 @@
+#  Copyright 2008 Nokia Siemens Networks Oyj
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+from model import ManualSuite, ManualTest, ManualKeyword
+
+MAX_CONFLICTS_IN_MESSAGE = 15
+
+
+class ResultSnapshot(object):
+    """Results of tests as they were in the output file, keyed by longname.
+
+    Works as the common base when merging results saved by someone else.
+    """
+
+    def __init__(self, suite=None):
+        self._states = {}
+        if suite is not None:
+            self.update(iter_tests(suite))
+
+    def update(self, tests):
+        for test in tests:
+            self.set(test.longname, TestState(test))
+
+    def set(self, longname, state):
+        self._states[longname] = state
+
+    def get(self, longname):
+        return self._states.get(longname)
+
+
+class ThreeWayMerge(object):
+    """Merges results saved by someone else into the model without dialogs.
+
+    Tests are matched by their longnames. Changes made only in the model or
+    only in the other output are merged automatically field by field. Fields
+    changed differently on both sides are collected as conflicts, which are
+    resolved all at once with `MergeResult.resolve`. Tests whose end time is
+    unchanged in the other output are skipped without further inspection.
+    """
+
+    def __init__(self, base):
+        self._base = base
+
+    def merge(self, suite, other_suite):
+        result = MergeResult()
+        self._merge_suite(suite, other_suite, result)
+        return result
+
+    def _merge_suite(self, suite, other, result):
+        for other_suite in other.suites:
+            own_suite = suite.get_suite(other_suite.name)
+            if own_suite is None:
+                self._add_suite(suite, other_suite, result)
+            else:
+                self._merge_suite(own_suite, other_suite, result)
+        for other_test in other.tests:
+            own_test = suite.get_test(other_test.name)
+            if own_test is None:
+                self._add_test(suite, other_test, result)
+            else:
+                self._merge_test(own_test, other_test, result)
+
+    def _add_suite(self, parent, other_suite, result):
+        if not isinstance(other_suite, ManualSuite):
+            other_suite = ManualSuite(other_suite, parent, True)
+        parent.add_child(other_suite)
+        self._base.update(iter_tests(other_suite))
+        result.added.append(other_suite)
+
+    def _add_test(self, parent, other_test, result):
+        other_test = _as_manual_test(other_test)
+        parent.add_child(other_test)
+        self._base.update([other_test])
+        result.added.append(other_test)
+
+    def _merge_test(self, test, other_test, result):
+        base = self._base.get(test.longname)
+        if base is not None and base.endtime == other_test.endtime:
+            return
+        other_test = _as_manual_test(other_test)
+        theirs = TestState(other_test)
+        if base is not None and base == theirs:
+            return
+        mine = TestState(test)
+        self._base.set(test.longname, theirs)
+        if mine == theirs:
+            return
+        if base is None:
+            base = test.is_modified and _UnknownState(mine, theirs) or mine
+        if base == mine:
+            _TestMerge(test, other_test).take_theirs()
+            result.updated.append(test)
+            return
+        merge = _TestMerge(test, other_test)
+        merge.merge(base, mine, theirs)
+        result.merged.append(test)
+        result.conflicts.extend(merge.conflicts)
+
+
+class MergeResult(object):
+
+    def __init__(self):
+        self.added = []
+        self.updated = []
+        self.merged = []
+        self.conflicts = []
+
+    def resolve(self, use_theirs):
+        """Resolves all conflicts either keeping own or using other values."""
+        if use_theirs:
+            for conflict in self.conflicts:
+                conflict.use_theirs()
+        self.conflicts = []
+
+    def get_conflict_message(self):
+        lines = [conflict.describe()
+                 for conflict in self.conflicts[:MAX_CONFLICTS_IN_MESSAGE]]
+        if len(self.conflicts) > MAX_CONFLICTS_IN_MESSAGE:
+            lines.append('... and %d more.'
+                         % (len(self.conflicts) - MAX_CONFLICTS_IN_MESSAGE))
+        message = """Results were updated by someone else!
+%d conflicting changes:
+%s
+
+Do you want your changes to be overridden?"""
+        return ("Conflicting Results!",
+                message % (len(self.conflicts), '\n'.join(lines)))
+
+
+class TestState(object):
+    """Mergeable results of a test: status, message, tags and keywords.
+
+    Keywords are flattened in pre-order. Their structure consists of depths
+    and names and their values of statuses and messages. Keywords of tests
+    not parsed from the output file yet are parsed only if they are compared.
+    """
+
+    def __init__(self, test):
+        self.endtime = test.endtime
+        self.status = test.status
+        self.message = test.message
+        self.tags = frozenset(test.tags)
+        self._lazy_keywords = test.get_lazy_keywords()
+        if self._lazy_keywords is None:
+            self._set_keywords(iter_keywords(test))
+
+    def _set_keywords(self, keywords):
+        keywords = list(keywords)
+        self._structure = tuple((depth, kw.name) for depth, kw in keywords)
+        self._keywords = tuple((kw.status, kw.message) for _, kw in keywords)
+
+    def _parse_keywords(self):
+        if self._lazy_keywords is not None:
+            self._set_keywords(_iter_parsed_keywords(self._lazy_keywords.parse()))
+            self._lazy_keywords = None
+
+    @property
+    def structure(self):
+        self._parse_keywords()
+        return self._structure
+
+    @property
+    def keywords(self):
+        self._parse_keywords()
+        return self._keywords
+
+    def __eq__(self, other):
+        return isinstance(other, TestState) and \
+               (self.status, self.message, self.tags, self.structure,
+                self.keywords) == (other.status, other.message, other.tags,
+                                   other.structure, other.keywords)
+
+    def __ne__(self, other):
+        return not self == other
+
+
+class _UnknownState(object):
+    """Base of a test whose results in the output file are not known.
+
+    All differing values are conflicts, but tags are merged as a union.
+    """
+    status = message = structure = keywords = None
+
+    def __init__(self, mine, theirs):
+        self.tags = mine.tags & theirs.tags
+
+
+class _TestMerge(object):
+
+    def __init__(self, test, other_test):
+        self.test = test
+        self.other_test = other_test
+        self.conflicts = []
+
+    def take_theirs(self):
+        self.test._add_info_from_other(self.other_test)
+        self.test.set_tags(self.other_test.tags)
+        self.test._copy_keywords(self.other_test)
+        self.test._update_parent()
+
+    def merge(self, base, mine, theirs):
+        status = self._merge_value('status', base, mine, theirs)
+        message = self._merge_value('message', base, mine, theirs)
+        self._set_result(status, message)
+        self.test.set_tags(self._merge_tags(base, mine, theirs))
+        self._merge_keywords(base, mine, theirs)
+
+    def _merge_value(self, name, base, mine, theirs):
+        value, conflict = _merge(getattr(base, name), getattr(mine, name),
+                                 getattr(theirs, name))
+        if conflict:
+            self.conflicts.append(_ValueConflict(self, name, value,
+                                                 getattr(theirs, name)))
+        return value
+
+    def _set_result(self, status, message):
+        self.test.status = status
+        self.test.message = message
+        self.test._update_parent()
+
+    def _merge_tags(self, base, mine, theirs):
+        added = (mine.tags - base.tags) | (theirs.tags - base.tags)
+        removed = (base.tags - mine.tags) | (base.tags - theirs.tags)
+        return (base.tags | added) - removed
+
+    def _merge_keywords(self, base, mine, theirs):
+        if mine.structure == theirs.structure:
+            self._merge_keyword_values(base, mine, theirs)
+            return
+        structure, conflict = _merge(base.structure, mine.structure,
+                                     theirs.structure)
+        if conflict:
+            self.conflicts.append(_KeywordStructureConflict(self))
+        elif structure == theirs.structure:
+            self.test._copy_keywords(self.other_test)
+
+    def _merge_keyword_values(self, base, mine, theirs):
+        base_values = base.keywords
+        if base.structure != mine.structure:
+            base_values = (None,) * len(mine.keywords)
+        keywords = [kw for _, kw in iter_keywords(self.test, copy=True)]
+        other_keywords = [kw for _, kw in iter_keywords(self.other_test)]
+        for index, kw in enumerate(keywords):
+            value, conflict = _merge(base_values[index], mine.keywords[index],
+                                     theirs.keywords[index])
+            kw.status, kw.message = value
+            if conflict:
+                self.conflicts.append(_KeywordConflict(self, kw,
+                                                       other_keywords[index]))
+
+
+def _merge(base, mine, theirs):
+    """Returns the merged value and whether the value is in conflict.
+
+    In case of a conflict the own value is returned.
+    """
+    if mine == theirs or theirs == base:
+        return mine, False
+    if mine == base:
+        return theirs, False
+    return mine, True
+
+
+class _ValueConflict(object):
+
+    def __init__(self, merge, name, mine, theirs):
+        self._merge = merge
+        self._name = name
+        self._mine = mine
+        self._theirs = theirs
+
+    def use_theirs(self):
+        if self._name == 'status':
+            self._merge._set_result(self._theirs, self._merge.test.message)
+        else:
+            self._merge._set_result(self._merge.test.status, self._theirs)
+
+    def describe(self):
+        return "%s: %s '%s' vs. '%s'" % (self._merge.test.longname,
+                                         self._name, self._mine, self._theirs)
+
+
+class _KeywordConflict(object):
+
+    def __init__(self, merge, keyword, other_keyword):
+        self._merge = merge
+        self._keyword = keyword
+        self._other = other_keyword
+
+    def use_theirs(self):
+        self._keyword.status = self._other.status
+        self._keyword.message = self._other.message
+
+    def describe(self):
+        return "%s: keyword '%s'" % (self._merge.test.longname,
+                                     self._keyword.name)
+
+
+class _KeywordStructureConflict(object):
+
+    def __init__(self, merge):
+        self._merge = merge
+
+    def use_theirs(self):
+        self._merge.test._copy_keywords(self._merge.other_test)
+
+    def describe(self):
+        return "%s: keywords" % self._merge.test.longname
+
+
+def iter_tests(suite):
+    for sub_suite in suite.suites:
+        for test in iter_tests(sub_suite):
+            yield test
+    for test in suite.tests:
+        yield test
+
+
+def iter_keywords(item, depth=0, copy=False):
+    """Yields (depth, keyword) pairs in pre-order.
+
+    Shared keyword templates are copied only if `copy` is true. Otherwise
+    they are yielded as such and must not be modified.
+    """
+    for kw in _get_keywords(item, copy):
+        yield depth, kw
+        for child in iter_keywords(kw, depth+1, copy):
+            yield child
+
+
+def _iter_parsed_keywords(keywords):
+    for kw in keywords:
+        yield 0, kw
+        for child in iter_keywords(kw, 1):
+            yield child
+
+
+def _get_keywords(item, copy):
+    if isinstance(item, ManualKeyword) and not copy:
+        return item.get_keywords_without_copying()
+    return item.keywords
+
+
+def _as_manual_test(test):
+    if isinstance(test, ManualTest):
+        return test
+    return ManualTest(test, None, True)
@@ -13,13 +13,15 @@
 #  limitations under the License.
 
 
-import tkMessageBox
 from datetime import datetime
+from operator import attrgetter
 from time import time
 
 from mabot.settings import SETTINGS
 from mabot import utils
 from mabot.utils import robotapi
+from journal import Journal
+from search import SearchIndex
 
 EMPTY_TIME = '20000101 00:00:00.000'
 
@@ -39,6 +41,95 @@ class Modified:
 
 
 DATA_MODIFIED = Modified()
+JOURNAL = Journal()
+
+
+class Transaction(object):
+    """Groups modifications of the model so that they are propagated once.
+
+    While a transaction is active, changed items do not update their parents
+    immediately. Instead, the parents are collected and updated once, deepest
+    first, when the outermost transaction is committed. All modifications
+    made in the same transaction get the same timestamp.
+    """
+
+    def __init__(self):
+        self._depth = 0
+        self._timestamp = None
+        self._changed = {}
+        self._updating = False
+
+    def begin(self):
+        self._depth += 1
+
+    def commit(self):
+        self._depth -= 1
+        if self._depth == 0 and not self._updating:
+            self._updating = True
+            try:
+                self._update_changed()
+            finally:
+                self._updating = False
+                self._timestamp = None
+
+    def get_timestamp(self):
+        # Items updated when committing belong to the same batch.
+        if not self._depth and not self._updating:
+            return robotapi.get_timestamp()
+        if self._timestamp is None:
+            self._timestamp = robotapi.get_timestamp()
+        return self._timestamp
+
+    def postpone_update(self, item):
+        """Returns True if updating the parent of `item` is postponed."""
+        if not self._depth or self._updating:
+            return False
+        self._changed[id(item.parent)] = item.parent
+        return True
+
+    def _update_changed(self):
+        levels = {}
+        for item in self._changed.values():
+            levels.setdefault(_get_depth(item), {})[id(item)] = item
+        self._changed = {}
+        depth = levels and max(levels) or 0
+        while depth >= 0:
+            for item in levels.pop(depth, {}).values():
+                item._children_changed()
+                if item.parent is not None:
+                    levels.setdefault(depth-1, {})[id(item.parent)] = item.parent
+            depth -= 1
+
+
+def _get_depth(item):
+    depth = 0
+    while item.parent is not None:
+        item = item.parent
+        depth += 1
+    return depth
+
+
+def transactional(method):
+    """Decorator running the method in a transaction."""
+    def wrapper(*args, **kwargs):
+        TRANSACTION.begin()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            TRANSACTION.commit()
+    wrapper.__name__ = method.__name__
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
+TRANSACTION = Transaction()
+
+
+def show_warning(title, message):
+    """Shows a warning to the user. Replaced when running without the UI."""
+    import tkMessageBox
+    tkMessageBox.showwarning(title, message)
+
 
 ALL_TAGS_VISIBLE = "ALL MATCHING TAGS VISIBLE"
 
@@ -70,14 +161,19 @@ class EmptySuite:
     def get_all_visible_tags(self):
         return []
 
+    def get_tag_catalogue(self):
+        return TagCatalogue(self)
+
 
 class UserKeywordLibrary:
 
     def __init__(self):
         self.keywords = {}
+        self._templates = {}
 
     def add_suite_keywords(self, suite):
         self.keywords = suite.user_keywords.handlers
+        self._templates = {}
 
     def get_keywords(self, name, item):
         if not self.keywords.has_key(name):
@@ -89,10 +185,129 @@ class UserKeywordLibrary:
             raise Exception(msg)
         return kw.keywords
 
+    def get_templates(self, name, item):
+        """Returns templates of keywords of the user keyword `name`.
+
+        Templates are created once and shared by all calls of the keyword.
+        """
+        if name not in self._templates:
+            self._templates[name] = tuple(self._create_template(kw, item)
+                                          for kw in self.get_keywords(name, item))
+        return self._templates[name]
+
+    def _create_template(self, kw, item):
+        return KeywordTemplate(kw, self.get_templates(kw.name or '', item))
+
+
+class KeywordTemplate(object):
+    """Immutable keyword without results created from the test data.
+
+    Templates are shared between all calls of a user keyword. They are
+    copied to `ManualKeyword` objects only when keywords of a call are
+    needed, and serialized as such otherwise.
+    """
+    __slots__ = ('name', 'doc', 'args', 'type', 'timeout', 'keywords')
+    status = 'FAIL'
+    message = ''
+    starttime = endtime = EMPTY_TIME
+    visible = True
+
+    def __init__(self, kw, keywords):
+        self.name = kw.name
+        self.doc = robotapi.unescape(kw.doc)
+        self.args = tuple(kw.args)
+        self.type = _intern(kw.type)
+        self.timeout = kw.timeout
+        self.keywords = keywords
+
+    @property
+    def elapsedtime(self):
+        return robotapi.get_elapsed_time_as_string(self.starttime, self.endtime)
+
+    def serialize(self, serializer):
+        serializer.start_keyword(self)
+        for kw in self.keywords:
+            kw.serialize(serializer)
+        serializer.end_keyword(self)
+
 
 KW_LIB = UserKeywordLibrary()
 
+def _intern(value):
+    """Interns ASCII strings, such as keyword types, shared by many items."""
+    if isinstance(value, basestring):
+        try:
+            return intern(str(value))
+        except UnicodeError:
+            pass
+    return value
+
+
+def _pack_timestamp(timestamp):
+    # Timestamps like '20100101 12:00:00.000' are stored as integers like
+    # 20100101120000000.
+    if not (isinstance(timestamp, basestring) and len(timestamp) == 21):
+        return timestamp
+    digits = timestamp[:8] + timestamp[9:11] + timestamp[12:14] + \
+             timestamp[15:17] + timestamp[18:]
+    if not digits.isdigit():
+        return timestamp
+    return int(digits)
+
+
+def _format_timestamp(packed):
+    value = '%017d' % packed
+    return '%s %s:%s:%s.%s' % (value[:8], value[8:10], value[10:12],
+                               value[12:14], value[14:])
+
+
+class _Timestamp(object):
+    """Timestamp attribute stored compactly as an integer."""
+
+    def __init__(self, name):
+        self._attr = '_' + name
+
+    def __get__(self, item, owner):
+        if item is None:
+            return self
+        value = getattr(item, self._attr)
+        if isinstance(value, (int, long)):
+            if value == _EMPTY_TIME:
+                return EMPTY_TIME
+            return _format_timestamp(value)
+        return value
+
+    def __set__(self, item, value):
+        setattr(item, self._attr, _pack_timestamp(value))
+
+
+_EMPTY_TIME = _pack_timestamp(EMPTY_TIME)
+
+
+def _execution_status_dependency(name, searchable=False):
+    """Creates an attribute that invalidates cached execution statuses when set.
+
+    Changes of searchable attributes are also noted in the search index.
+    """
+    attr = '_' + name
+    def setter(self, value):
+        setattr(self, attr, value)
+        self._execution_status_changed()
+        if searchable:
+            self._search_text_changed()
+    return property(attrgetter(attr), setter)
+
+
 class AbstractManualModel(object):
+    # Keywords, which are the most common items, have no instance dictionaries.
+    __slots__ = ()
+    _normalized_name_cache = ('', '')
+    _execution_status = None
+    status = _execution_status_dependency('status')
+    message = _execution_status_dependency('message')
+    visible = _execution_status_dependency('visible')
+    starttime = _Timestamp('starttime')
+    endtime = _Timestamp('endtime')
 
     def __init__(self, item, parent=None):
         self.is_modified = False
@@ -113,9 +328,13 @@ class AbstractManualModel(object):
         status = getattr(item, 'status', 'FAIL')
         return status == 'PASS' and 'PASS' or 'FAIL'
 
+    @transactional
     def set_all(self, status, message=None):
+        self._set_all(status, message)
+
+    def _set_all(self, status, message):
         for item in self._get_items():
-            item.set_all(status, message)
+            item._set_all(status, message)
         self._set_status_and_message(status, message, False)
         self._update_parent()
 
@@ -144,18 +363,22 @@ class AbstractManualModel(object):
 
     def _mark_data_modified(self, update_starttime=True):
         DATA_MODIFIED.modified()
+        JOURNAL.record(self)
         self.is_modified = True
         if update_starttime:
-            self.starttime = robotapi.get_timestamp()
+            self.starttime = TRANSACTION.get_timestamp()
 
     def _update_parent(self):
-        if self.parent is not None:
-            self.parent._child_status_updated()
+        if self.parent is not None and not TRANSACTION.postpone_update(self):
+            self.parent._child_status_updated(self)
 
-    def _child_status_updated(self):
+    def _child_status_updated(self, child):
+        self._update_status()
+        self._update_parent()
+
+    def _children_changed(self):
+        """Updates the item after its children changed in a transaction."""
         self._update_status()
-        if self.parent is not None:
-            self.parent._child_status_updated()
 
     def _update_status(self):
         child_statuses = [ item.status for item in self._get_items() ]
@@ -166,9 +389,22 @@ class AbstractManualModel(object):
         if self.is_modified:
             self.endtime = time
             self.is_modified = False
-        for item in self._get_items():
+        for item in self._get_items_with_results():
             item._save(time)
 
+    def _get_items_with_results(self):
+        """Returns child items without copying keyword templates."""
+        return self._get_items()
+
+    def _get_root(self):
+        # Suites cache their roots, so tests and keywords find them quickly.
+        if self.parent is None:
+            return self
+        return self.parent._get_root()
+
+    def _set_parent(self, parent):
+        self.parent = parent
+
     def has_visible_children(self):
         for item in self._get_items():
             if item.visible:
@@ -176,9 +412,22 @@ class AbstractManualModel(object):
         return False
 
     def get_execution_status(self):
+        if self._execution_status is None:
+            self._execution_status = self._get_execution_status()
+        return self._execution_status
+
+    def _execution_status_changed(self):
+        # Parents having cached status of an item without cached status
+        # did not need the item's status when calculating their own.
+        item = self
+        while item is not None and item._execution_status is not None:
+            item._execution_status = None
+            item = item.parent
+
+    def _get_execution_status(self):
         if self.status == "FAIL" and \
            self.message == self._get_default_message() and \
-           'FAIL' not in [ item.get_execution_status() for item in self._get_items() ]:
+           'FAIL' not in [ item.get_execution_status() for item in self._get_items_with_results() ]:
             return "NOT_EXECUTED"
         return self.status
 
@@ -207,7 +456,15 @@ class AbstractManualModel(object):
         return None
 
     def has_same_name(self, other):
-        return robotapi.eq(self.name, other.name, ignore=['_'])
+        return self.normalized_name == other.normalized_name
+
+    @property
+    def normalized_name(self):
+        name, normalized = self._normalized_name_cache
+        if name != self.name:
+            normalized = robotapi.normalize(self.name, ignore=['_'])
+            self._normalized_name_cache = (self.name, normalized)
+        return normalized
 
     def _get_valid_time(self, timestamp):
         if timestamp == '00000000 00:00:00.000':
@@ -218,6 +475,7 @@ class AbstractManualModel(object):
 
 
 class AbstractManualTestOrKeyword(AbstractManualModel):
+    __slots__ = ()
 
     def _has_same_keywords(self, other):
         if len(self.keywords) != len(other.keywords):
@@ -274,8 +532,12 @@ class AbstractManualTestOrKeyword(AbstractManualModel):
         return 0
 
 class ManualSuite(robotapi.RunnableTestSuite, AbstractManualModel):
+    _tag_index = None
+    _tag_catalogue = None
+    _search_index = None
+    _root = None
 
-    def __init__(self, suite, parent=None, from_xml=False):
+    def __init__(self, suite, parent=None, from_xml=False, progress=None):
         if not from_xml:
             KW_LIB.add_suite_keywords(suite)
         robotapi.BaseTestSuite.__init__(self, suite.name, suite.source)
@@ -284,22 +546,44 @@ class ManualSuite(robotapi.RunnableTestSuite, AbstractManualModel):
         self.metadata = suite.metadata
         if hasattr(suite, 'critical'):
             self.critical = suite.critical
+        self.saving = False
         self.setup = self._get_setup_keyword(suite, from_xml)
         self.teardown = self._get_teardown_keyword(suite, from_xml)
-        self.suites = [ManualSuite(sub_suite, self, from_xml) for sub_suite in suite.suites]
+        self.suites = [ManualSuite(sub_suite, self, from_xml, progress)
+                       for sub_suite in suite.suites]
         self.tests = [ManualTest(test, self, from_xml) for test in suite.tests]
-        self._update_status()
+        if progress is not None:
+            progress.advance(len(self.tests))
+        self._suite_index = ItemIndex(self.suites)
+        self._test_index = ItemIndex(self.tests)
+        self._update_own_status()
         self.source = suite.source
         if from_xml:
             self.starttime = self._get_valid_time(suite.starttime)
             self.endtime = self._get_valid_time(suite.endtime)
-        self.saving = False
         self._check_no_duplicate_tests()
 
+    def __getstate__(self):
+        # Metadata is a NormalizedDict, which cannot be pickled as such.
+        state = self.__dict__.copy()
+        state['metadata'] = self.metadata.items()
+        # Tag and search indexes are built again when needed.
+        state.pop('_tag_index', None)
+        state.pop('_tag_catalogue', None)
+        state.pop('_search_index', None)
+        state.pop('_root', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.metadata = robotapi.NormalizedDict(state['metadata'])
+
     def _check_no_duplicate_tests(self):
-        names = [ robotapi.normalize(test.name, ignore=['_']) for test in self.tests ]
+        counts = {}
+        for test in self.tests:
+            counts[test.normalized_name] = counts.get(test.normalized_name, 0) + 1
         for test in self.tests:
-            count = names.count(robotapi.normalize(test.name, ignore=['_']))
+            count = counts[test.normalized_name]
             if count > 1:
                 msg = "Found test '%s' from suite '%s' %s times.\n"
                 msg += "Mabot supports only unique test case names!"
@@ -310,19 +594,83 @@ class ManualSuite(robotapi.RunnableTestSuite, AbstractManualModel):
         self.message = ''
         robotapi.RunnableTestSuite.set_status(self) # From robot.common.model.BaseTestSuite
 
+    def _update_own_status(self):
+        """Updates statistics assuming that sub suites' statistics are up to date."""
+        self.message = ''
+        self.critical_stats = robotapi.Stat()
+        self.all_stats = robotapi.Stat()
+        for suite in self.suites:
+            self._add_suite_to_stats(suite)
+        for test in self.tests:
+            self._add_test_to_stats(test)
+        self.status = self._get_status()
+
     def _add_test_to_stats(self, test):
         #Overrides the method from robot model. Takes the visibility into account.
-        if not test.visible and not self.saving:
+        self._set_stats_state(test, self._get_stats_state(test))
+        if test.stats_state is None:
             return
         robotapi.RunnableTestSuite._add_test_to_stats(self, test)
 
+    def _get_stats_state(self, test):
+        if not test.visible and not self.saving:
+            return None
+        return test.passed, test.critical
+
+    def _child_status_updated(self, child):
+        # Sub suites have already updated the statistics of their parents.
+        if child.is_test():
+            self._update_test_stats(child)
+
+    def _update_test_stats(self, test):
+        new_state = self._get_stats_state(test)
+        if new_state != test.stats_state:
+            delta = StatisticsDelta(test.stats_state, new_state)
+            self._set_stats_state(test, new_state)
+            self._apply_statistics_delta(delta)
+
+    def _get_root(self):
+        if self._root is None:
+            self._root = AbstractManualModel._get_root(self)
+        return self._root
+
+    def _set_parent(self, parent):
+        self.parent = parent
+        self._forget_root()
+
+    def _forget_root(self):
+        self._root = None
+        for suite in self.suites:
+            suite._forget_root()
+
+    def _set_stats_state(self, test, state):
+        if state != test.stats_state:
+            catalogue = self._get_root()._tag_catalogue
+            if catalogue is not None:
+                catalogue.state_changed(test, test.stats_state, state)
+        test.stats_state = state
+
+    def _children_changed(self):
+        self._update_own_status()
+
+    def _apply_statistics_delta(self, delta):
+        delta.apply(self.critical_stats, self.all_stats)
+        self.status = self._get_status()
+        if self.parent is not None:
+            self.parent._apply_statistics_delta(delta)
+
     def _get_items(self):
         return self.suites + self.tests
 
+    def _set_all(self, status, message):
+        # Statistics are updated when the transaction is committed.
+        for item in self._get_items():
+            item._set_all(status, message)
+
     def _set_status_and_message(self, status, message=None, override_default=True):
         self._update_status()
 
-    def get_execution_status(self):
+    def _get_execution_status(self):
         updated_status = "PASS"
         for item in self._get_items():
             if item.visible:
@@ -336,63 +684,101 @@ class ManualSuite(robotapi.RunnableTestSuite, AbstractManualModel):
     def add_results(self, other, add_from_xml=False, override_method=None):
         if not other or not self.has_same_name(other):
             return None
-        self._add_from_items_to_items(other.suites, self.suites,
-                                      add_from_xml, override_method)
-        self._add_from_items_to_items(other.tests, self.tests,
-                                      add_from_xml, override_method)
+        suites_added = self._add_from_items_to_items(other.suites, self.suites,
+                                                     self._suite_index,
+                                                     add_from_xml,
+                                                     override_method)
+        tests_added = self._add_from_items_to_items(other.tests, self.tests,
+                                                    self._test_index,
+                                                    add_from_xml,
+                                                    override_method)
         if self._has_new_children(other):
             self._mark_data_modified(update_starttime=False)
-        self._update_status()
+        if suites_added or tests_added:
+            self._children_added()
+        else:
+            self._update_own_status()
 
-    def _add_from_items_to_items(self, other_items, self_items,
+    def _add_from_items_to_items(self, other_items, self_items, index,
                                  add_from_xml, override_method):
+        """Returns True if items only in `other_items` were added."""
+        added = False
         for other_item in other_items:
-            item_added = self._add_item_to_items(other_item, self_items,
+            item_added = self._add_item_to_items(other_item, index,
                                                  add_from_xml, override_method)
             if item_added:
                 continue
             elif add_from_xml:
+                other_item._set_parent(self)
                 self_items.append(other_item)
+                index.add(other_item)
+                added = True
             else:
                 # model != XML
                 self._mark_data_modified(update_starttime=False)
+        return added
 
-    def _add_item_to_items(self, other_item, self_items, add_from_xml,
+    def _add_item_to_items(self, other_item, index, add_from_xml,
                                   override_method):
-        for self_item in self_items:
-            if self_item.has_same_name(other_item):
-                self_item.add_results(other_item, add_from_xml,
-                                  override_method)
-                return True
-        return False
+        self_item = index.get(other_item)
+        if self_item is None:
+            return False
+        self_item.add_results(other_item, add_from_xml, override_method)
+        return True
 
     def _has_new_children(self, other):
-        for suite in self.suites:
-            if not self._is_item_in_others(suite, other.suites):
-                return True
-        for test in self.tests:
-            if not self._is_item_in_others(test, other.tests):
-                return True
-        return False
+        return self._has_items_not_in(self.suites, other.suites) or \
+               self._has_items_not_in(self.tests, other.tests)
 
-    def _is_item_in_others(self, item, other_items):
-        for other_item in other_items:
-            if item.has_same_name(other_item):
+    def _has_items_not_in(self, items, other_items):
+        other_index = ItemIndex(other_items)
+        for item in items:
+            if item not in other_index:
                 return True
         return False
 
+    def get_suite(self, name_or_item):
+        """Returns the sub suite with the same normalized name or None."""
+        return self._suite_index.get(name_or_item)
+
+    def get_test(self, name_or_item):
+        """Returns the test with the same normalized name or None."""
+        return self._test_index.get(name_or_item)
+
+    def add_child(self, item):
+        """Adds a suite or a test loaded from another output as the last child."""
+        item._set_parent(self)
+        if item.is_suite():
+            self.suites.append(item)
+            self._suite_index.add(item)
+        else:
+            self.tests.append(item)
+            self._test_index.add(item)
+        self._children_added()
+
+    def _children_added(self):
+        self._reset_tag_indexes()
+        self._execution_status_changed()
+        suite = self
+        while suite is not None:
+            suite._update_own_status()
+            suite = suite.parent
+
+    @transactional
     def add_tags(self, tags):
         if not self.visible:
             return
         for item in self._get_items():
             item.add_tags(tags)
 
+    @transactional
     def remove_tags(self, tags):
         if not self.visible:
             return
         for item in self._get_items():
             item.remove_tags(tags)
 
+    @transactional
     def update_default_message(self, old_default, new_default):
         if old_default.strip() == new_default.strip():
             return
@@ -404,37 +790,75 @@ class ManualSuite(robotapi.RunnableTestSuite, AbstractManualModel):
 
     def _save(self, time):
         self.saving = True
+        self.is_modified = False
         for item in self._get_items():
             item._save(time)
 
     def saved(self):
         self.saving = False
-        self._update_status()
         for suite in self.suites:
             suite.saved()
+        self._update_own_status()
 
     def get_all_visible_tags(self, tags=None):
         if tags is None:
             tags = []
+        self._add_visible_tags(tags, set(tags))
+        return tags
+
+    def _add_visible_tags(self, tags, known):
         if self.visible:
             for item in self._get_items():
-                item.get_all_visible_tags(tags)
-        return tags
+                item._add_visible_tags(tags, known)
+
+    def get_tag_index(self):
+        """Returns the tag index of the whole model, building it if needed."""
+        root = self._get_root()
+        if root._tag_index is None:
+            root._tag_index = TagIndex(root)
+        return root._tag_index
+
+    def get_tag_catalogue(self):
+        """Returns the tag catalogue of the whole model, building it if needed."""
+        root = self._get_root()
+        if root._tag_catalogue is None:
+            root._tag_catalogue = TagCatalogue(root)
+        return root._tag_catalogue
+
+    def get_search_index(self):
+        """Returns the search index of the whole model, building it if needed."""
+        root = self._get_root()
+        if root._search_index is None:
+            root._search_index = SearchIndex(root)
+        return root._search_index
+
+    def _reset_tag_indexes(self):
+        root = self._get_root()
+        root._tag_index = root._tag_catalogue = root._search_index = None
 
     def change_visibility(self, includes, excludes, tag_name):
-        self.visible = False
+        included = self.get_tag_index().select(includes, excludes)
+        return self._change_visibility(included, tag_name)
+
+    def _change_visibility(self, included, tag_name):
+        visible = False
         for item in self._get_items():
-            if item.change_visibility(includes, excludes, tag_name):
-                self.visible = True
-        self._keep_root_always_visible()
+            if item._change_visibility(included, tag_name):
+                visible = True
+        self.visible = visible or self._is_root()
+        self._update_own_status()
         return self.visible
 
-    def _keep_root_always_visible(self):
-        if not self.parent:
-            self.visible = True
+    def _is_root(self):
+        # Root is always visible.
+        return self.parent is None
 
 
 class ManualTest(robotapi.RunnableTestCase, AbstractManualTestOrKeyword):
+    stats_state = None
+    compare_attrs = ('status', 'message', 'tags')
+    _lazy_keywords = None
+    message = _execution_status_dependency('message', searchable=True)
 
     def __init__(self, test, parent, from_xml=False):
         AbstractManualModel.__init__(self, test, parent)
@@ -449,9 +873,56 @@ class ManualTest(robotapi.RunnableTestCase, AbstractManualTestOrKeyword):
         self.teardown = self._get_teardown_keyword(test, from_xml)
         self.tags = robotapi.normalize_tags(test.tags)
         self.keywords = [ ManualKeyword(kw, self, from_xml) for kw in test.keywords ]
+        self._lazy_keywords = getattr(test, 'lazy_keywords', None)
         self.critical = test.critical
         self.timeout = test.timeout
-        self.compare_attrs = ['status', 'message', 'tags']
+
+    def _get_keywords(self):
+        if self._lazy_keywords is not None:
+            # Keywords read lazily from an output file are parsed when
+            # they are needed first time.
+            self._keywords = [ManualKeyword(kw, self, True)
+                              for kw in self._lazy_keywords.parse()]
+            self._lazy_keywords = None
+        return self._keywords
+
+    def _set_keywords(self, keywords):
+        self._keywords = keywords
+        self._lazy_keywords = None
+
+    keywords = property(_get_keywords, _set_keywords)
+
+    def get_lazy_keywords(self):
+        """Returns keywords not parsed from an output file yet or None."""
+        return self._lazy_keywords
+
+    def _get_items_with_results(self):
+        # Keywords not parsed yet cannot have been changed.
+        if self._lazy_keywords is not None:
+            return []
+        return self.keywords
+
+    def has_visible_children(self):
+        if self._lazy_keywords is not None:
+            return True
+        return AbstractManualTestOrKeyword.has_visible_children(self)
+
+    def _get_execution_status(self):
+        if self._lazy_keywords is None:
+            return AbstractManualTestOrKeyword._get_execution_status(self)
+        if self.status == 'FAIL' and not self._lazy_keywords.failed and \
+                self.message == self._get_default_message():
+            return 'NOT_EXECUTED'
+        return self.status
+
+    def serialize(self, serializer):
+        if self._lazy_keywords is None:
+            robotapi.RunnableTestCase.serialize(self, serializer)
+            return
+        # Keywords not parsed yet are written as they were in the output.
+        serializer.start_test(self)
+        serializer.write_raw(self._lazy_keywords.read())
+        serializer.end_test(self)
 
     def _mark_data_modified(self, executed=True):
         AbstractManualModel._mark_data_modified(self)
@@ -459,8 +930,9 @@ class ManualTest(robotapi.RunnableTestCase, AbstractManualTestOrKeyword):
             self._add_tags_added_to_modified_tests(mark_modified=False)
 
     def _add_tags_added_to_modified_tests(self, mark_modified):
-        self.add_tags(SETTINGS["tags_added_to_modified_tests"],
-                      mark_modified=mark_modified)
+        tags = SETTINGS["tags_added_to_modified_tests"]
+        if tags:
+            self.add_tags(tags, mark_modified=mark_modified)
 
     def _get_items(self):
         return self.keywords
@@ -488,7 +960,7 @@ class ManualTest(robotapi.RunnableTestCase, AbstractManualTestOrKeyword):
             test = self._load_test_from_datasource()
         except IOError, error:
             msg = 'Could not check correct model from data source!\n%s'
-            tkMessageBox('Loading Data Source Failed', msg % (error))
+            show_warning('Loading Data Source Failed', msg % (error))
             return
         if not test or test._has_same_keywords(self):
             return
@@ -497,21 +969,20 @@ class ManualTest(robotapi.RunnableTestCase, AbstractManualTestOrKeyword):
         else:
             msg = "Keywords of test '%s' were updated from the data source.\n"
             msg += "Therefore changes made to those keywords could not be saved.\n"
-            tkMessageBox('Keywords Reloaded', msg % (self.longname))
+            show_warning('Keywords Reloaded', msg % (self.longname))
         self._add_info_from_other(test)
         self._copy_keywords(test)
         self._mark_data_modified(executed=False)
 
     def _load_test_from_datasource(self):
         suite = ManualSuite(utils.load_data(self.parent.source, SETTINGS))
-        for test in suite.tests:
-            if self.has_same_name(test):
-                return test
+        return suite.get_test(self)
 
     def _copy_keywords(self, other):
         self.keywords = other.keywords
         for kw in self.keywords:
             kw.parent = self
+        self._execution_status_changed()
 
     def _create_message_for_duplicate_results(self, other):
         s_diffs, o_diffs = self._get_message_for_different_attrs(other)
@@ -530,8 +1001,31 @@ Do you want your changes to be overridden?"""
             if tag not in tags:
                 tags.append(tag)
                 self._mark_data_modified(executed=False)
-        self.tags = sorted(tags)
+        self.set_tags(tags)
 
+    def set_tags(self, tags):
+        """Replaces tags without marking the test modified."""
+        indexes = self._get_tag_indexes()
+        for index in indexes:
+            index.remove(self)
+        self.tags = sorted(tags)
+        for index in indexes:
+            index.add(self)
+
+    def _get_tag_indexes(self):
+        # Only indexes that have already been built need to be updated.
+        root = self._get_root()
+        return [index for index in (getattr(root, '_tag_index', None),
+                                    getattr(root, '_tag_catalogue', None),
+                                    getattr(root, '_search_index', None))
+                if index is not None]
+
+    def _search_text_changed(self):
+        index = getattr(self._get_root(), '_search_index', None)
+        if index is not None:
+            index.update(self)
+
+    @transactional
     def add_tags(self, tags, mark_modified=True):
         if not self.visible:
             return
@@ -543,6 +1037,8 @@ Do you want your changes to be overridden?"""
         if not tag in self.tags:
             self._remove_related_tags_if_allowed_only_once(tag)
             self.tags.append(tag)
+            for index in self._get_tag_indexes():
+                index.add_tag(self, tag)
             if mark_modified:
                 self._mark_data_modified(executed=False)
 
@@ -554,6 +1050,7 @@ Do you want your changes to be overridden?"""
     def _remove_tags_matching_prefix(self, prefix):
         self.remove_tags([tag for tag in self.tags if tag.startswith(prefix)])
 
+    @transactional
     def remove_tags(self, tags):
         if not self.visible:
             return
@@ -563,44 +1060,72 @@ Do you want your changes to be overridden?"""
     def _remove_tag(self, tag):
         if tag in self.tags:
             self.tags.remove(tag)
+            for index in self._get_tag_indexes():
+                index.remove_tag(self, tag)
             self._mark_data_modified(executed=False)
 
+    @transactional
     def update_default_message(self, old_default, new_default):
+        # Execution status depends on the default message.
+        self._execution_status_changed()
         if self.message == old_default:
             self.set_message(new_default)
 
     def get_all_visible_tags(self, tags):
+        self._add_visible_tags(tags, set(tags))
+        return tags
+
+    def _add_visible_tags(self, tags, known):
         if self.visible:
             for tag in self.tags:
-                if not tag in tags:
+                if tag not in known:
+                    known.add(tag)
                     tags.append(tag)
-        return tags
 
     def change_visibility(self, includes, excludes, tag_name):
-        if self.is_included(includes, excludes) and \
-           (tag_name == ALL_TAGS_VISIBLE or tag_name in self.tags):
-            self.visible = True
-        else:
-            self.visible = False
+        included = self.is_included(includes, excludes) and [self] or []
+        return self._change_visibility(included, tag_name)
+
+    def _change_visibility(self, included, tag_name):
+        self.visible = self in included and \
+            (tag_name == ALL_TAGS_VISIBLE or tag_name in self.tags)
         return self.visible
 
-    def _child_status_updated(self):
+    def _child_status_updated(self, child):
         self._add_tags_added_to_modified_tests(mark_modified=True)
-        AbstractManualTestOrKeyword._child_status_updated(self)
+        AbstractManualTestOrKeyword._child_status_updated(self, child)
+
+    def _children_changed(self):
+        self._add_tags_added_to_modified_tests(mark_modified=True)
+        self._update_status()
 
 
 class ManualKeyword(AbstractManualTestOrKeyword):
+    __slots__ = ('parent', 'name', 'doc', 'args', 'type', 'timeout',
+                 '_status', '_message', '_visible', '_starttime', '_endtime',
+                 '_msg_timestamp', 'msg_level', 'is_modified', '_id',
+                 '_execution_status', '_normalized_name_cache', '_keywords',
+                 '_templates')
+    compare_attrs = ('status', 'message')
+    msg_timestamp = _Timestamp('msg_timestamp')
 
     def __init__(self, kw, parent, from_xml):
+        # Slots do not have defaults like class attributes of other items.
+        self._execution_status = None
+        self._normalized_name_cache = ('', '')
+        self._keywords = None
+        self._templates = ()
         AbstractManualModel.__init__(self, kw, parent)
         if from_xml:
             self._init_from_xml(kw)
         else:
-            self._init_from_test_material()
-        self.args = kw.args
-        self.type = kw.type
+            self._init_from_test_material(kw)
+        # Same keywords are typically used in many tests.
+        self.name = _intern(self.name)
+        self.doc = _intern(self.doc)
+        self.args = tuple(kw.args)
+        self.type = _intern(kw.type)
         self.timeout = kw.timeout
-        self.compare_attrs = ['status', 'message']
 
     def _init_from_xml(self, kw):
         self.starttime = self._get_valid_time(kw.starttime)
@@ -609,14 +1134,43 @@ class ManualKeyword(AbstractManualTestOrKeyword):
             message = list(kw.messages)[-1]
             self.message = message.message
             self.msg_timestamp = message.timestamp
-            self.msg_level = message.level
+            self.msg_level = _intern(message.level)
         else:
             self._init_empty_messages()
         self.keywords = [ManualKeyword(sub_kw, self, True) for sub_kw in kw.keywords]
 
-    def _init_from_test_material(self):
+    def _init_from_test_material(self, kw):
         self._init_empty_messages()
-        self.keywords = [ManualKeyword(sub_kw, self, False) for sub_kw in KW_LIB.get_keywords(self.name or '', self)]
+        if isinstance(kw, KeywordTemplate):
+            self.doc = kw.doc
+            self._templates = kw.keywords
+        else:
+            self._templates = KW_LIB.get_templates(self.name or '', self)
+
+    def _get_keywords(self):
+        if self._keywords is None:
+            # Shared templates are copied when keywords are needed first time.
+            self._keywords = [ManualKeyword(template, self, False)
+                              for template in self._templates]
+        return self._keywords
+
+    def _set_keywords(self, keywords):
+        self._keywords = keywords
+
+    keywords = property(_get_keywords, _set_keywords)
+
+    def get_keywords_without_copying(self):
+        """Returns keywords or, if they are not needed yet, their templates."""
+        if self._keywords is None:
+            return self._templates
+        return self._keywords
+
+    def _get_items_with_results(self):
+        # Templates have no results and thus need not be copied.
+        return self._keywords or []
+
+    def has_visible_children(self):
+        return len(self.get_keywords_without_copying()) > 0
 
     def _init_empty_messages(self):
         self.message = ""
@@ -645,7 +1199,7 @@ class ManualKeyword(AbstractManualTestOrKeyword):
         if self.message:
             ManualMessage(self.message, self.status, self.msg_timestamp,
                           self.msg_level).serialize(serializer)
-        for kw in self.keywords:
+        for kw in self.get_keywords_without_copying():
             kw.serialize(serializer)
         serializer.end_keyword(self)
 
@@ -664,6 +1218,240 @@ Do you want your changes to be overridden?"""
         return "Conflicting Keyword Results!", message
 
 
+class ItemIndex(object):
+    """Index of suites or tests by their normalized names.
+
+    Items can be looked up either with a name or with another item. Like with
+    a linear search, the first added item wins if there are duplicate names.
+    Items are indexed by their names unless a function getting another name,
+    for example the longname, is given as `get_name`.
+    """
+
+    def __init__(self, items=(), get_name=None):
+        self._items = {}
+        self._get_name = get_name
+        for item in items:
+            self.add(item)
+
+    def add(self, item):
+        self._items.setdefault(self._get_key(item), item)
+
+    def get(self, name_or_item):
+        return self._items.get(self._get_key(name_or_item))
+
+    def _get_key(self, name_or_item):
+        if isinstance(name_or_item, basestring):
+            return robotapi.normalize(name_or_item, ignore=['_'])
+        if self._get_name is not None:
+            return robotapi.normalize(self._get_name(name_or_item),
+                                      ignore=['_'])
+        return name_or_item.normalized_name
+
+    def __contains__(self, name_or_item):
+        return self._get_key(name_or_item) in self._items
+
+
+class TagIndex(object):
+    """Index of tests by their normalized tags.
+
+    Tag patterns are matched only against the distinct tags in the index and
+    tests matching combined patterns are then got with set operations.
+    """
+
+    def __init__(self, suite):
+        self._tests = set()
+        self._tags = {}
+        self._add_suite(suite)
+
+    def _add_suite(self, suite):
+        for sub_suite in suite.suites:
+            self._add_suite(sub_suite)
+        for test in suite.tests:
+            self.add(test)
+
+    def add(self, test):
+        self._tests.add(test)
+        for tag in test.tags:
+            self.add_tag(test, tag)
+
+    def remove(self, test):
+        self._tests.discard(test)
+        for tag in test.tags:
+            self._remove_from_tag(test, self._normalize(tag))
+
+    def add_tag(self, test, tag):
+        self._tags.setdefault(self._normalize(tag), set()).add(test)
+
+    def remove_tag(self, test, tag):
+        """Removes a tag that has already been removed from the test."""
+        key = self._normalize(tag)
+        if key not in [self._normalize(t) for t in test.tags]:
+            self._remove_from_tag(test, key)
+
+    def _remove_from_tag(self, test, key):
+        tests = self._tags.get(key)
+        if tests is not None:
+            tests.discard(test)
+            if not tests:
+                del self._tags[key]
+
+    def _normalize(self, tag):
+        return robotapi.normalize(tag, ignore=['_'])
+
+    def select(self, includes, excludes):
+        """Returns tests matching `includes` but not `excludes` as a set.
+
+        Patterns are interpreted like in `BaseTestCase.is_included`.
+        """
+        if includes:
+            selected = self._match_any_rule(includes)
+        else:
+            selected = set(self._tests)
+        if excludes:
+            selected -= self._match_any_rule(excludes)
+        return selected
+
+    def _match_any_rule(self, rules):
+        matching = set()
+        for rule in rules:
+            matching |= self._match_rule(rule)
+        return matching
+
+    def _match_rule(self, rule):
+        nots = rule.split('NOT')
+        matching = self._match_all_tags(nots.pop(0))
+        for pattern in nots:
+            if not matching:
+                break
+            matching -= self._match_all_tags(pattern)
+        return matching
+
+    def _match_all_tags(self, pattern):
+        matching = None
+        for tag_pattern in pattern.split('&'):
+            tests = self._match_tag(tag_pattern)
+            matching = tests if matching is None else matching & tests
+            if not matching:
+                break
+        return matching
+
+    def _match_tag(self, pattern):
+        matcher = robotapi.Matcher(pattern, ignore=['_'])
+        matching = set()
+        for tag, tests in self._tags.items():
+            if matcher.match(tag):
+                matching |= tests
+        return matching
+
+
+class TagCatalogue(object):
+    """Tags of the model with counts of tests having them.
+
+    Counts of passed and failed tests include only tests that are visible.
+    They are updated incrementally when tags, statuses or visibility of tests
+    change.
+    """
+
+    def __init__(self, suite):
+        self._stats = {}
+        self._add_suite(suite)
+
+    def _add_suite(self, suite):
+        for sub_suite in suite.suites:
+            self._add_suite(sub_suite)
+        for test in suite.tests:
+            self.add(test)
+
+    def add(self, test):
+        for tag in test.tags:
+            self.add_tag(test, tag)
+
+    def remove(self, test):
+        for tag in test.tags:
+            self.remove_tag(test, tag)
+
+    def add_tag(self, test, tag):
+        if tag not in self._stats:
+            self._stats[tag] = TagStat(tag)
+        self._stats[tag].add(test.stats_state, 1)
+
+    def remove_tag(self, test, tag):
+        stat = self._stats.get(tag)
+        if stat is None:
+            return
+        stat.add(test.stats_state, -1)
+        if not stat.total:
+            del self._stats[tag]
+
+    def state_changed(self, test, old_state, new_state):
+        for tag in test.tags:
+            stat = self._stats.get(tag)
+            if stat is not None:
+                stat.add(old_state, -1, total=False)
+                stat.add(new_state, 1, total=False)
+
+    def get(self, tag):
+        return self._stats.get(tag)
+
+    def get_visible_tags(self):
+        """Returns tags of visible tests in sorted order."""
+        return sorted(tag for tag, stat in self._stats.items() if stat.visible)
+
+
+class TagStat(object):
+
+    def __init__(self, name):
+        self.name = name
+        self.total = self.passed = self.failed = 0
+
+    @property
+    def visible(self):
+        return self.passed + self.failed
+
+    def add(self, state, count, total=True):
+        if total:
+            self.total += count
+        if state is None:
+            return
+        if state[0]:
+            self.passed += count
+        else:
+            self.failed += count
+
+
+class StatisticsDelta(object):
+    """Change in suite statistics caused by a change in a single test.
+
+    States are either None, when the test is not included in statistics, or
+    tuples (passed, critical).
+    """
+
+    def __init__(self, old_state, new_state):
+        self.critical_passed = self.critical_failed = 0
+        self.all_passed = self.all_failed = 0
+        self._add(old_state, -1)
+        self._add(new_state, 1)
+
+    def _add(self, state, count):
+        if state is None:
+            return
+        passed, critical = state
+        if passed:
+            self.all_passed += count
+            if critical:
+                self.critical_passed += count
+        else:
+            self.all_failed += count
+            if critical:
+                self.critical_failed += count
+
+    def apply(self, critical_stats, all_stats):
+        critical_stats.passed += self.critical_passed
+        critical_stats.failed += self.critical_failed
+        all_stats.passed += self.all_passed
+        all_stats.failed += self.all_failed
+
+
 class ManualMessage(object):
 
     def __init__(self, message, status, timestamp=None, level=None):
@@ -0,0 +1,92 @@
+#  Copyright 2008 Nokia Siemens Networks Oyj
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+import os
+import re
+from xml.parsers import expat
+
+HEADER_SIZE = 4096
+MAX_HEADER_SIZE = 64 * HEADER_SIZE
+_GENERATED = re.compile(r'\sgenerated\s*=\s*(["\'])(.*?)\1')
+
+
+class HeaderError(Exception):
+    """Used when an output file has no readable root element."""
+
+
+def read_root_tag(path):
+    """Returns the offset and the start tag of the root element of `path`.
+
+    Only the beginning of the file is read.
+    """
+    source = open(path, 'rb')
+    try:
+        header = ''
+        while len(header) < MAX_HEADER_SIZE:
+            chunk = source.read(HEADER_SIZE)
+            if not chunk:
+                break
+            header += chunk
+            start = header.find('<robot')
+            end = header.find('>', start) + 1
+            if start != -1 and end != 0:
+                return start, header[start:end]
+    finally:
+        source.close()
+    raise HeaderError("'%s' has no root element." % path)
+
+
+def get_generation_time(root_tag):
+    match = _GENERATED.search(root_tag)
+    if match:
+        return match.group(2)
+    return None
+
+
+def validate(path):
+    """Raises HeaderError if `path` is not well-formed XML.
+
+    The file is parsed as a stream without building a tree.
+    """
+    parser = expat.ParserCreate()
+    source = open(path, 'rb')
+    try:
+        try:
+            parser.ParseFile(source)
+        except expat.ExpatError, error:
+            raise HeaderError("'%s' is not valid XML: %s" % (path, error))
+    finally:
+        source.close()
+
+
+class OutputSignature(object):
+    """Cheap fingerprint of an output file.
+
+    Consists of the size, modification time and inode of the file and a hash
+    of the root start tag, which contains the generation time. Creating
+    a signature requires only a stat call and reading the file header.
+    """
+
+    def __init__(self, path):
+        stat = os.stat(path)
+        root_tag = read_root_tag(path)[1]
+        self.generated = get_generation_time(root_tag)
+        self._key = (stat.st_size, stat.st_mtime, stat.st_ino, hash(root_tag))
+
+    def __eq__(self, other):
+        return isinstance(other, OutputSignature) and self._key == other._key
+
+    def __ne__(self, other):
+        return not self == other
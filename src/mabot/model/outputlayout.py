@@ -0,0 +1,251 @@
+#  Copyright 2008 Nokia Siemens Networks Oyj
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+import os
+from bisect import bisect_right
+from xml.parsers import expat
+
+from mabot.utils import robotapi
+from outputheader import read_root_tag, HeaderError
+from utils import has_modifications
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class LayoutError(Exception):
+    """Used when the layout of an output file cannot be used."""
+
+
+class OutputLayout(object):
+    """Byte offsets of suites, tests and statistics in an output XML file.
+
+    The layout allows saving only the modified tests by splicing them into
+    the existing file. It is valid only as long as nobody else changes the
+    file and the model has the same structure as the file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.root_tag = None
+        self.statistics = None
+        self.suite = None
+        self._spans = []
+        self._items = {}
+        self._scan()
+        self._signature = self._get_signature()
+
+    def _scan(self):
+        self.root_tag = self._scan_root_tag()
+        scanner = _LayoutScanner(self)
+        source = open(self.path, 'rb')
+        try:
+            scanner.scan(source)
+        except expat.ExpatError, error:
+            raise LayoutError(str(error))
+        finally:
+            source.close()
+        if self.suite is None or self.statistics is None:
+            raise LayoutError("'%s' has no suite or statistics." % self.path)
+
+    def _scan_root_tag(self):
+        try:
+            start, tag = read_root_tag(self.path)
+        except HeaderError, error:
+            raise LayoutError(str(error))
+        return self.add_span(_Span(start=start, end=start+len(tag)))
+
+    def add_span(self, span):
+        self._spans.append(span)
+        return span
+
+    def _get_signature(self):
+        stat = os.stat(self.path)
+        return stat.st_size, stat.st_mtime, stat.st_ino
+
+    def is_valid(self, path):
+        """Returns True if `path` is the file scanned and it is unchanged."""
+        return path == self.path and os.path.exists(path) and \
+               self._get_signature() == self._signature
+
+    def bind(self, suite):
+        """Maps model items to elements. Returns False if they do not match."""
+        self._items = {}
+        return self._bind_suite(self.suite, suite)
+
+    def _bind_suite(self, span, suite):
+        if not (span.matches(suite) and span.status and
+                len(span.suites) == len(suite.suites) and
+                len(span.tests) == len(suite.tests)):
+            return False
+        self._items[id(suite)] = span
+        for test_span, test in zip(span.tests, suite.tests):
+            if not test_span.matches(test):
+                return False
+            self._items[id(test)] = test_span
+        for suite_span, sub_suite in zip(span.suites, suite.suites):
+            if not self._bind_suite(suite_span, sub_suite):
+                return False
+        return True
+
+    def get_span(self, item):
+        return self._items.get(id(item))
+
+    def write(self, replacements, target):
+        """Writes the file to `target` replacing given (span, data) pairs.
+
+        After writing, offsets are updated to match the new file. Replaced
+        spans must not overlap.
+        """
+        replacements = sorted(replacements, key=lambda r: r[0].start)
+        source = open(self.path, 'rb')
+        output = open(target, 'wb')
+        try:
+            position = 0
+            for span, data in replacements:
+                self._copy(source, output, span.start - position)
+                output.write(data)
+                source.seek(span.end)
+                position = span.end
+            self._copy(source, output)
+        finally:
+            source.close()
+            output.close()
+        self._update_offsets(replacements)
+
+    def _copy(self, source, output, size=-1):
+        while size != 0:
+            chunk = source.read(size if 0 < size < CHUNK_SIZE else CHUNK_SIZE)
+            if not chunk:
+                break
+            output.write(chunk)
+            size -= len(chunk)
+
+    def _update_offsets(self, replacements):
+        ends = []
+        deltas = [0]
+        for span, data in replacements:
+            ends.append(span.end)
+            deltas.append(deltas[-1] + len(data) - (span.end - span.start))
+        new_position = lambda pos: pos + deltas[bisect_right(ends, pos)]
+        for span in self._spans:
+            span.start, span.end = new_position(span.start), new_position(span.end)
+
+    def file_replaced(self):
+        """Must be called after the written file has replaced the original."""
+        self._signature = self._get_signature()
+
+    def get_modified_tests(self, suite):
+        """Returns modified tests or None if the modifications are structural.
+
+        Structural modifications, such as added tests, and tests not found
+        from the layout require saving the whole file.
+        """
+        tests = []
+        if not self._collect_modified_tests(suite, tests):
+            return None
+        return tests
+
+    def _collect_modified_tests(self, suite, tests):
+        if suite.is_modified or self.get_span(suite) is None:
+            return False
+        for sub_suite in suite.suites:
+            if not self._collect_modified_tests(sub_suite, tests):
+                return False
+        for test in suite.tests:
+            if has_modifications(test):
+                if self.get_span(test) is None:
+                    return False
+                tests.append(test)
+        return True
+
+    def get_suite_status_spans(self, suite):
+        """Returns (suite, status span) pairs for all suites in the model."""
+        spans = [(suite, self.get_span(suite).status)]
+        for sub_suite in suite.suites:
+            spans.extend(self.get_suite_status_spans(sub_suite))
+        return spans
+
+
+class _Span(object):
+
+    def __init__(self, name=None, start=None, end=None):
+        self.name = name
+        self.start = start
+        self.end = end
+
+    def matches(self, item):
+        return self.name is not None and \
+               robotapi.normalize(self.name, ignore=['_']) == item.normalized_name
+
+
+class _SuiteSpan(_Span):
+
+    def __init__(self, name):
+        _Span.__init__(self, name)
+        self.suites = []
+        self.tests = []
+        self.status = None
+
+
+class _LayoutScanner(object):
+
+    def __init__(self, layout):
+        self._layout = layout
+        self._stack = []
+        self._parser = expat.ParserCreate()
+        self._parser.StartElementHandler = self._start
+        self._parser.EndElementHandler = self._end
+
+    def scan(self, source):
+        self._parser.ParseFile(source)
+
+    def _start(self, name, attrs):
+        span = self._create_span(name, attrs)
+        if span is not None:
+            span.start = self._parser.CurrentByteIndex
+            self._layout.add_span(span)
+        self._stack.append(span)
+
+    def _create_span(self, name, attrs):
+        parent = self._stack[-1] if self._stack else None
+        if len(self._stack) == 1:
+            if name == 'suite':
+                self._layout.suite = _SuiteSpan(attrs.get('name'))
+                return self._layout.suite
+            if name == 'statistics':
+                self._layout.statistics = _Span()
+                return self._layout.statistics
+        elif isinstance(parent, _SuiteSpan):
+            if name == 'suite':
+                return self._append(parent.suites, _SuiteSpan(attrs.get('name')))
+            if name == 'test':
+                return self._append(parent.tests, _Span(attrs.get('name')))
+            if name == 'status':
+                parent.status = _Span()
+                return parent.status
+        return None
+
+    def _append(self, spans, span):
+        spans.append(span)
+        return span
+
+    def _end(self, name):
+        span = self._stack.pop()
+        if span is None:
+            return
+        index = self._parser.CurrentByteIndex
+        if index == span.start:
+            raise LayoutError("Empty element '%s' is not supported." % name)
+        span.end = index + len('</%s>' % name)
@@ -0,0 +1,153 @@
+#  Copyright 2008 Nokia Siemens Networks Oyj
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+from bisect import bisect_left, bisect_right
+
+from mabot.utils import robotapi
+
+# Changed items are checked one by one until there are this many of them
+REBUILD_LIMIT = 500
+_FIELD_SEPARATOR = '\x00'
+_ITEM_SEPARATOR = '\x01'
+
+
+class SearchIndex(object):
+    """Index of suites and tests by their texts for finding them quickly.
+
+    Longnames and documentation of suites and tests, and tags and messages
+    of tests are normalized like names in Robot and joined to one string.
+    Substring queries are then repeated `find` calls to that string. Prefix
+    queries use a sorted list of normalized names, longnames and tags.
+
+    Changed tests are only noted when they change. Their current texts are
+    checked separately when searching until there are so many of them that
+    the index is built again.
+    """
+
+    def __init__(self, suite):
+        self._suite = suite
+        self._build()
+
+    def _build(self):
+        self._items = list(_iter_items(self._suite))
+        self._positions = dict((id(item), index)
+                               for index, item in enumerate(self._items))
+        texts = [_get_text(item) for item in self._items]
+        self._starts = []
+        start = 0
+        for text in texts:
+            self._starts.append(start)
+            start += len(text) + len(_ITEM_SEPARATOR)
+        self._text = _ITEM_SEPARATOR.join(texts)
+        self._keys = sorted((key, index)
+                            for index, item in enumerate(self._items)
+                            for key in _get_keys(item))
+        self._changed = {}
+
+    def update(self, item):
+        """Notes that texts of `item` have changed."""
+        index = self._positions.get(id(item))
+        if index is not None:
+            self._changed[index] = item
+
+    # Methods used by tests to update their tag indexes.
+
+    def add(self, test):
+        self.update(test)
+
+    def remove(self, test):
+        self.update(test)
+
+    def add_tag(self, test, tag):
+        self.update(test)
+
+    def remove_tag(self, test, tag):
+        self.update(test)
+
+    def find(self, query, limit=100):
+        """Returns at most `limit` items matching `query` in the model order.
+
+        By default items whose texts contain the query are returned. If the
+        query ends with '*', items whose name, longname or a tag starts with
+        the rest of the query are returned instead. Case, spaces and
+        underscores are ignored.
+        """
+        if len(self._changed) > REBUILD_LIMIT:
+            self._build()
+        prefix = query.endswith('*')
+        query = _normalize(query.rstrip('*'))
+        if not query:
+            return []
+        if prefix:
+            found = self._find_prefix(query)
+            matches = lambda item: [key for key in _get_keys(item)
+                                    if key.startswith(query)]
+        else:
+            found = self._find_substring(query, limit)
+            matches = lambda item: query in _get_text(item)
+        found.extend(index for index, item in self._changed.items()
+                     if matches(item))
+        return [self._items[index] for index in sorted(found)[:limit]]
+
+    def _find_substring(self, query, limit):
+        found = []
+        position = self._text.find(query)
+        while position != -1 and len(found) < limit:
+            index = bisect_right(self._starts, position) - 1
+            if index not in self._changed:
+                found.append(index)
+            if index + 1 == len(self._starts):
+                break
+            position = self._text.find(query, self._starts[index+1])
+        return found
+
+    def _find_prefix(self, query):
+        found = set()
+        for position in xrange(bisect_left(self._keys, (query,)),
+                               len(self._keys)):
+            key, index = self._keys[position]
+            if not key.startswith(query):
+                break
+            if index not in self._changed:
+                found.add(index)
+        return list(found)
+
+
+def _iter_items(suite):
+    yield suite
+    for sub_suite in suite.suites:
+        for item in _iter_items(sub_suite):
+            yield item
+    for test in suite.tests:
+        yield test
+
+
+def _get_text(item):
+    fields = [item.longname, item.doc]
+    if item.is_test():
+        fields.extend(item.tags)
+        fields.append(item.message)
+    return _FIELD_SEPARATOR.join(_normalize(field) for field in fields)
+
+
+def _get_keys(item):
+    keys = [item.normalized_name, _normalize(item.longname)]
+    if item.is_test():
+        keys.extend(_normalize(tag) for tag in item.tags)
+    return keys
+
+
+def _normalize(text):
+    return robotapi.normalize(text, ignore=['_'])
@@ -0,0 +1,206 @@
+#  Copyright 2008 Nokia Siemens Networks Oyj
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+import os
+import re
+from hashlib import sha1
+
+from model import ManualSuite, ItemIndex
+from outputheader import OutputSignature, HeaderError
+from utils import set_longnames, has_modifications
+from mabot import utils
+from mabot.utils import robotapi
+
+
+class ShardedOutput(object):
+    """Output whose suites are saved to separate shard files.
+
+    Suites at `depth` below the root suite, and suites without sub suites
+    higher in the tree, are shards. Every shard is saved as a standard Robot
+    output file to a directory next to the output and has a lock of its own,
+    so that results of different shards can be saved at the same time.
+
+    Results in shard files override results of the same suites in the output
+    itself. The output is written only when suites outside shards change or
+    when shards are combined to it.
+    """
+
+    def __init__(self, output, depth=1):
+        self.output = output
+        self.directory = output + '.shards'
+        self._depth = max(depth, 1)
+        self._signatures = {}
+
+    def get_shards(self, suite):
+        """Returns shard suites of the model in the order of the model."""
+        shards = []
+        if suite.suites:
+            self._collect_shards(suite, 0, shards)
+        return shards
+
+    def _collect_shards(self, suite, depth, shards):
+        if depth == self._depth or (depth and not suite.suites):
+            shards.append(suite)
+        else:
+            for sub_suite in suite.suites:
+                self._collect_shards(sub_suite, depth+1, shards)
+
+    def get_modified_shards(self, suite):
+        return [shard for shard in self.get_shards(suite)
+                if has_modifications(shard)]
+
+    def is_modified_outside_shards(self, suite):
+        """Returns True if suites above shards or their tests are modified."""
+        return bool(suite.suites) and self._is_modified_outside(suite, 0)
+
+    def _is_modified_outside(self, suite, depth):
+        if depth == self._depth or (depth and not suite.suites):
+            return False
+        if suite.is_modified:
+            return True
+        for test in suite.tests:
+            if has_modifications(test):
+                return True
+        for sub_suite in suite.suites:
+            if self._is_modified_outside(sub_suite, depth+1):
+                return True
+        return False
+
+    def get_path(self, suite):
+        name = re.sub(r'[^\w.-]+', '_', suite.longname)[:80]
+        key = robotapi.normalize(suite.longname, ignore=['_'])
+        return os.path.join(self.directory, '%s-%s.xml'
+                            % (name, sha1(key.encode('UTF-8')).hexdigest()[:8]))
+
+    def apply(self, suite):
+        """Replaces suites of `suite` with suites read from shard files.
+
+        Returns the number of replaced suites.
+        """
+        applied = 0
+        parents = {}
+        for shard in self.get_shards(suite):
+            path = self.get_path(shard)
+            if os.path.exists(path):
+                if self._replace(shard, self.read(path)):
+                    parents[id(shard.parent)] = shard.parent
+                applied += 1
+        _update_parents(parents.values())
+        if applied:
+            suite._reset_tag_indexes()
+        return applied
+
+    def read(self, path):
+        """Reads a shard and remembers its signature."""
+        signature = self._get_signature(path)
+        shard = robotapi.XmlTestSuite(path)
+        self._signatures[path] = signature
+        return shard
+
+    def _replace(self, shard, other):
+        # Parents are updated with `_update_parents` after all replacements.
+        if not robotapi.eq(shard.name, other.name, ignore=['_']):
+            return False
+        parent = shard.parent
+        new_shard = ManualSuite(other, parent, True)
+        set_longnames(new_shard, parent.longname)
+        parent.suites[parent.suites.index(shard)] = new_shard
+        return True
+
+    def lock(self, shard, ask_method):
+        """Locks the shard file of `shard` and returns the lock."""
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        lock = utils.LockFile(self.get_path(shard))
+        lock.create_lock(ask_method)
+        return lock
+
+    def is_changed(self, path):
+        """Returns True if the shard has changed after it was read or written."""
+        return self._get_signature(path) != self._signatures.get(path)
+
+    def write(self, shard, progress=None):
+        """Writes a shard marking it saved.
+
+        If writing fails, the shard is left as it was and marked modified.
+        """
+        path = self.get_path(shard)
+        shard.save()
+        try:
+            write_output(shard, path, progress)
+        except:
+            # Only saving the whole shard is reliable after a failed save.
+            shard.is_modified = True
+            raise
+        finally:
+            shard.saved()
+        self._signatures[path] = self._get_signature(path)
+
+    def combine(self, target=None, progress=None):
+        """Writes the output with results of all shards to `target`.
+
+        By default the output itself is rewritten. The written output is
+        a standard Robot output file.
+        """
+        suite = ManualSuite(robotapi.XmlTestSuite(self.output), None, True)
+        self.apply(suite)
+        return write_output(suite, target or self.output, progress)
+
+    def _get_signature(self, path):
+        try:
+            return OutputSignature(path)
+        except (HeaderError, EnvironmentError):
+            return None
+
+
+def _update_parents(parents):
+    """Updates parents of replaced shards and their parents once each."""
+    suites = {}
+    for parent in parents:
+        parent._suite_index = ItemIndex(parent.suites)
+        parent._execution_status_changed()
+        while parent is not None and id(parent) not in suites:
+            suites[id(parent)] = parent
+            parent = parent.parent
+    # Statistics of sub suites are needed by their parents.
+    for suite in sorted(suites.values(), key=_get_depth, reverse=True):
+        suite._update_own_status()
+
+
+def _get_depth(suite):
+    depth = 0
+    while suite.parent is not None:
+        suite = suite.parent
+        depth += 1
+    return depth
+
+
+def write_output(suite, path, progress=None):
+    """Writes `suite` to `path` via a temporary file.
+
+    Returns the generation time of the written output.
+    """
+    temp = '%s.tmp' % path
+    try:
+        testoutput = robotapi.RobotTestOutput(suite, progress)
+        generated = testoutput.serialize_output(temp, suite)
+    except:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+    if os.name == 'nt' and os.path.exists(path):
+        os.remove(path)
+    os.rename(temp, path)
+    return generated
@@ -0,0 +1,35 @@
+#  Copyright 2008 Nokia Siemens Networks Oyj
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+"""Helpers shared by modules handling the model."""
+
+
+def set_longnames(suite, parent_longname):
+    """Sets longnames of `suite` and everything in it below `parent_longname`."""
+    suite.longname = '%s.%s' % (parent_longname, suite.name)
+    for test in suite.tests:
+        test.longname = '%s.%s' % (suite.longname, test.name)
+    for sub_suite in suite.suites:
+        set_longnames(sub_suite, suite.longname)
+
+
+def has_modifications(item):
+    """Returns True if `item` or any item with results below it is modified."""
+    if item.is_modified:
+        return True
+    for sub_item in item._get_items_with_results():
+        if has_modifications(sub_item):
+            return True
+    return False
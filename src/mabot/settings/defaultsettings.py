@@ -19,5 +19,13 @@ tags_added_to_modified_tests = []
 tags_allowed_only_once = []
 always_load_old_data_from_xml = False
 check_simultaneous_save = False
+incremental_save = False
+cache_test_data = False
+lazy_keyword_loading = False
+journal_changes = False
+parallel_parsing = False
+cache_parsed_files = False
+sharded_output = False
+shard_depth = 1
 include = []
 exclude = []
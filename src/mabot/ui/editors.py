@@ -21,6 +21,8 @@ from ui import *
 from mabot.utils import get_status_color
 
 START = 1.0
+# Milliseconds after the last keystroke before the message is stored
+MESSAGE_COMMIT_DELAY = 500
 
 def Editor(master, tree_item):
     if tree_item.item.model_item.is_suite():
@@ -36,6 +38,7 @@ class AbstractEditor:
         self._tree_item = tree_item
         self._model_item = self._tree_item.item.model_item
         self._current_row = 0
+        self._pending_commit = None
         self._editor = CommonFrame(master)
         self._init_data(self._editor)
         self._editor.pack(fill=BOTH)
@@ -87,9 +90,11 @@ class AbstractEditor:
                                         self._model_item.message, editable=True,
                                         yscrollcommand=scrollbar_y.set,
                                         xscrollcommand=scrollbar_x.set)
-        self._message_field.bind('<Key>', self._save_message)
-        #This should make sure that all the data is saved.
-        self._message_field.bind('<Leave>', self._save_message)
+        # Storing the message updates the model and the tree, so it is done
+        # only after typing has paused or the field is left.
+        self._message_field.bind('<Key>', self._message_edited)
+        self._message_field.bind('<FocusOut>', self.commit)
+        self._message_field.bind('<Leave>', self.commit)
         scrollbar_y.config(command=self._message_field.yview)
         scrollbar_x.config(command=self._message_field.xview)
         row.pack(fill='both')
@@ -101,9 +106,23 @@ class AbstractEditor:
     def _get_times(self):
         return self._model_item.starttime[:-4] + ' / ' + self._model_item.endtime[:-4]
 
-    def _save_message(self, event):
-        self._model_item.set_message(self._get_message())
-        self.update(update_message=False)
+    def _message_edited(self, event):
+        self._cancel_pending_commit()
+        self._pending_commit = self._message_field.after(MESSAGE_COMMIT_DELAY,
+                                                         self.commit)
+
+    def _cancel_pending_commit(self):
+        if self._pending_commit is not None:
+            self._message_field.after_cancel(self._pending_commit)
+            self._pending_commit = None
+
+    def commit(self, event=None):
+        """Stores the edited message to the model if it has changed."""
+        self._cancel_pending_commit()
+        message = self._get_message()
+        if message.strip() != self._model_item.message:
+            self._model_item.set_message(message)
+            self.update(update_message=False)
 
     def update(self, update_message=True):
         if update_message:
@@ -111,18 +130,18 @@ class AbstractEditor:
             self._message_field.insert(START, self._model_item.message)
         self._status.set(self._model_item.status)
         self._times.update_field(self._get_times())
-        self._tree_item.update()
+        self._tree_item.refresh()
 
     def _set_status(self, status):
+        self._cancel_pending_commit()
         self._model_item.update_status_and_message(status, self._get_message())
-        self._tree_item.update()
         self.update()
 
     def _get_message(self):
         return self._message_field.get(START, END)
 
     def close(self):
-        self._save_message(None)
+        self.commit()
         self._editor.destroy()
 
 class TitleLabel(Label):
@@ -214,6 +233,9 @@ class SuiteEditor(AbstractEditor):
         self._status_field.configure(foreground=get_status_color(self._model_item))
         self._status_field.update_field(self._model_item.status)
 
+    def commit(self, event=None):
+        pass
+
     def close(self):
         self._editor.destroy()
 
@@ -19,6 +19,7 @@ import tkMessageBox
 import tkFileDialog
 import tkSimpleDialog
 from idlelib import TreeWidget
+import time
 import traceback
 
 from tree import SuiteTreeItem
@@ -26,30 +27,62 @@ from tree import Node
 
 from mabot.settings import SETTINGS
 from mabot.model.io import IO
-from mabot.model.model import DATA_MODIFIED
+from mabot.model.model import DATA_MODIFIED, JOURNAL
 from mabot.model.model import ALL_TAGS_VISIBLE
 from mabot.model.model import get_includes_and_excludes_from_pattern
 from mabot import utils
+from mabot.utils.progress import Cancelled, tasks_running
 from mabot.version import version
 
 from editors import Editor
 from editors import SuiteEditor
-from progressbar import ProgressBar
+from progressbar import ProgressDialog
 from ui import CommonFrame, RemoveTagsDialog, ChangeStatusDialog, \
                SettingsDialog
 
+# Milliseconds between writing journaled changes to the disk
+JOURNAL_FLUSH_INTERVAL = 2000
+# Milliseconds after the last keystroke before searching
+FIND_DELAY = 200
+# Maximum number of search results shown
+FIND_LIMIT = 200
+
+
+class _StartupTimer(object):
+    """Prints the time elapsed since starting when startup phases end."""
+
+    def __init__(self, started, enabled):
+        self._started = started
+        self._enabled = enabled
+
+    def phase(self, name):
+        if self._enabled:
+            print '%-16s %8.3f s' % (name, time.time() - self._started)
+
 
 class Mabot:
 
-    def __init__(self, datasource, options):
-        self.root = Tk()
+    def __init__(self, datasource, options, started=None):
+        self._timer = _StartupTimer(started or time.time(),
+                                    options.get('startuptime'))
+        self._timer.phase('Imports')
         self._save_options(options)
         self.io = IO()
         self.suite = self.io.load_data(None)
         self._create_ui()
+        # The window is shown before the possibly slow loading starts.
+        self.root.update()
+        self._timer.phase('Window shown')
         self._load_data_and_update_ui(datasource)
+        self.root.update_idletasks()
+        self._timer.phase('Data shown')
+        if options.get('startuptime'):
+            JOURNAL.close()
+            return
         self._ask_tags_added_to_modified_tests()
+        self.root.after(JOURNAL_FLUSH_INTERVAL, self._flush_journal)
         self.root.mainloop()
+        JOURNAL.close()
 
     def _save_options(self, options):
         if options['include']:
@@ -60,18 +93,35 @@ class Mabot:
             SETTINGS.save()
 
     def _load_data_and_update_ui(self, datasource):
-        progress = ProgressBar(self.root, 'Loading...')
+        # Data is loaded using a new IO so that the current data is kept
+        # intact if loading fails or is cancelled.
+        io = IO()
         try:
-            self.suite = self.io.load_data(datasource)
-            progress.destroy()
+            suite = ProgressDialog(self.root, 'Loading...').run(io.load_data,
+                                                                datasource)
+        except Cancelled:
+            self._statusbar('Loading cancelled')
         except IOError, error:
-            progress.destroy()
             self._show_error(error, 'Loading Failed!')
         except Exception, error:
-            progress.destroy()
             self._show_error(error, "Unexpected error while loading data!")
         else:
+            self._timer.phase('Data loaded')
+            self.io = io
+            self.suite = suite
             self._update_ui()
+            if io.journal_replayed:
+                self._statusbar('Restored %d unsaved changes from the journal'
+                                % io.journal_replayed)
+
+    def _flush_journal(self):
+        # Saving and loading use the model and the journal in a worker thread.
+        if not tasks_running():
+            try:
+                JOURNAL.flush()
+            except EnvironmentError, error:
+                self._statusbar('Writing the journal failed: %s' % error)
+        self.root.after(JOURNAL_FLUSH_INTERVAL, self._flush_journal)
 
     def _show_error(self, error, message):
         traceback.print_exc()
@@ -84,9 +134,11 @@ class Mabot:
         self._create_statusbar(self.root)
 
     def _update_ui(self):
+        self._update_title()
         self._init_tree_view()
         self._update_visibility()
         self._create_new_editor()
+        self._find()
 
     def _ask_tags_added_to_modified_tests(self):
         if SETTINGS['ask_tags_added_to_modified_tests_at_startup']:
@@ -98,20 +150,23 @@ class Mabot:
             SETTINGS.save()
 
     def _create_root(self):
-        self.root.destroy()
         self.root = Tk()
-        name = 'Mabot'
-        if self.suite.name:
-            name = '%s - %s' % (self.suite.name, name)
-        self.root.title(name)
+        self._update_title()
         self.root.protocol("WM_DELETE_WINDOW", self._quit)
         self.root.configure(background='white')
         width, height = self.root.maxsize()
         self.root.geometry('%dx%d+100+50' % (width-200, height-100))
 
+    def _update_title(self):
+        name = 'Mabot'
+        if self.suite.name:
+            name = '%s - %s' % (self.suite.name, name)
+        self.root.title(name)
+
     def _create_middle_window(self):
         middle_window = CommonFrame(self.root)
         self._create_visibility_selection(middle_window)
+        self._create_quick_find(middle_window)
         self.canvas = self._create_tree(middle_window)
         self._init_tree_view()
         self.editor_frame = CommonFrame(middle_window)
@@ -149,9 +204,61 @@ class Mabot:
         self.tag_options = OptionMenu(master, self.tag_selection, ALL_TAGS_VISIBLE,
                                       command=lambda x: self._tag_selection_updated(True))
         self.tag_options.configure(bg="white")
+        # Counts in the menu are refreshed every time it is opened.
+        self.tag_options['menu'].configure(postcommand=self._update_tag_selection)
+        self._tags_in_selection = []
         self.tag_options.pack(side=LEFT)
         master.pack(anchor=NW)
 
+    def _create_quick_find(self, master):
+        find_frame = CommonFrame(master)
+        Label(find_frame, text="Find:", background='white').pack(side=LEFT)
+        self.find_pattern = Entry(find_frame, width=40)
+        self.find_pattern.pack(side=LEFT)
+        self.find_pattern.bind('<KeyRelease>', self._find_pattern_edited)
+        self.find_pattern.bind('<Return>', lambda event: self._show_found(0))
+        self._pending_find = None
+        find_frame.pack(anchor=NW)
+        # Results are shown below the field only when there are some.
+        self.find_results = Listbox(master, height=8, width=100,
+                                    background='white', exportselection=0)
+        self.find_results.bind('<<ListboxSelect>>', self._found_selected)
+        self._find_frame = find_frame
+        self._found = []
+
+    def _find_pattern_edited(self, event=None):
+        if self._pending_find is not None:
+            self.find_pattern.after_cancel(self._pending_find)
+        self._pending_find = self.find_pattern.after(FIND_DELAY, self._find)
+
+    def _find(self):
+        self._pending_find = None
+        query = self.find_pattern.get()
+        self._found = []
+        if query:
+            self._found = self.suite.get_search_index().find(query, FIND_LIMIT)
+        self.find_results.delete(0, END)
+        for item in self._found:
+            self.find_results.insert(END, item.longname)
+        if self._found:
+            self.find_results.pack(after=self._find_frame, anchor=NW)
+        else:
+            self.find_results.pack_forget()
+            if query:
+                self._statusbar("No matches for '%s'" % query)
+
+    def _found_selected(self, event=None):
+        selection = self.find_results.curselection()
+        if selection:
+            self._show_found(int(selection[0]))
+
+    def _show_found(self, index):
+        if index >= len(self._found):
+            return
+        item = self._found[index]
+        if self.node.show_item(item) is None:
+            self._statusbar("'%s' is hidden by the tag filter" % item.longname)
+
     def _tag_pattern_updated(self):
         if self.last_tag_pattern == self.tag_pattern.get():
             return
@@ -162,20 +269,32 @@ class Mabot:
     def _update_visibility(self):
         self._change_visibility()
         self.tag_selection.set(ALL_TAGS_VISIBLE) # default value
-        self._recreate_tag_selection()
+        self._update_tag_selection()
 
     def _change_visibility(self):
         inc, exc = get_includes_and_excludes_from_pattern(self.tag_pattern.get())
         self.suite.change_visibility(inc, exc, self.tag_selection.get())
 
-    def _recreate_tag_selection(self):
+    def _update_tag_selection(self):
+        # First entry in the menu is ALL_TAGS_VISIBLE.
+        catalogue = self.suite.get_tag_catalogue()
+        tags = catalogue.get_visible_tags()
         selection = self.tag_options['menu']
-        while selection.index(END) != 0:
-            selection.delete(END)
-        for tag in sorted(self.suite.get_all_visible_tags()):
-            selection.insert(END, 'command', label=tag,
-                             command=_setit(self.tag_selection, tag,
-                                            lambda x: self._tag_selection_updated(True)))
+        visible = set(tags)
+        for index in reversed(range(len(self._tags_in_selection))):
+            if self._tags_in_selection[index] not in visible:
+                selection.delete(index + 1)
+                del self._tags_in_selection[index]
+        existing = set(self._tags_in_selection)
+        for index, tag in enumerate(tags):
+            if tag not in existing:
+                selection.insert(index + 1, 'command',
+                                 command=_setit(self.tag_selection, tag,
+                                                lambda x: self._tag_selection_updated(True)))
+            stat = catalogue.get(tag)
+            selection.entryconfigure(index + 1, label='%s  (%d passed, %d failed)'
+                                     % (tag, stat.passed, stat.failed))
+        self._tags_in_selection = tags
 
     def _tag_selection_updated(self, only_selection_updated=False):
         if only_selection_updated and \
@@ -201,11 +320,12 @@ class Mabot:
         dialog.destroy()
 
     def _set_status(self, status, message=None, all=False):
+        self.current_editor.commit()
         if all:
             self._active_node.item.model_item.set_all(status, message)
         else:
             self._active_node.item.model_item.update_status_and_message(status, message)
-        self.node.update()
+        self._active_node.refresh(children=all)
         self.current_editor.update()
 
     def _add_tags(self, event=None):
@@ -258,13 +378,16 @@ class Mabot:
                 self._load_data_and_update_ui(directory)
 
     def _save(self, path=None):
-        progress = ProgressBar(self.root, 'Saving...')
-        progress.add_ask_method(tkMessageBox.askyesno)
+        self.current_editor.commit()
+        dialog = ProgressDialog(self.root, 'Saving...')
         try:
-            saved, changes = self.io.save_data(path, progress.call_ask_method)
-            progress.destroy()
+            saved, changes = dialog.run(self.io.save_data, path, dialog.ask)
+        except Cancelled:
+            # Results of others may have been merged before cancelling.
+            self._update_ui()
+            self._statusbar('Saving cancelled')
+            return
         except Exception, error:
-            progress.destroy()
             self._show_error(error, 'Saving Failed!')
             return
         if changes:
@@ -280,6 +403,24 @@ class Mabot:
             else:
                 self._statusbar('No changes to be saved')
 
+    def _combine_shards(self):
+        if not self.io.is_sharded():
+            self._statusbar('Output is not saved to shards')
+            return
+        dialog = ProgressDialog(self.root, 'Combining...')
+        try:
+            changes = dialog.run(self.io.combine_shards, dialog.ask)
+        except Cancelled:
+            self._update_ui()
+            self._statusbar('Combining cancelled')
+            return
+        except Exception, error:
+            self._show_error(error, 'Combining Failed!')
+            return
+        if changes:
+            self._update_ui()
+        self._statusbar('Combined shards to ' + self.io.output)
+
     def _statusbar(self, message):
         self._statusbar_right.configure(text=message)
 
@@ -293,9 +434,15 @@ class Mabot:
             self.root.destroy()
 
     def _continue_without_saving(self):
-        return not DATA_MODIFIED.is_modified() or \
-            tkMessageBox.askyesno("Unsaved changes",
-                    "You have unsaved changes.\nDo you still want to exit?")
+        self.current_editor.commit()
+        if not DATA_MODIFIED.is_modified():
+            return True
+        if not tkMessageBox.askyesno("Unsaved changes",
+                    "You have unsaved changes.\nDo you still want to exit?"):
+            return False
+        # Changes the user chose not to save are not restored later.
+        JOURNAL.clear()
+        return True
 
     def _edit_settings(self):
         settings_dialog = SettingsDialog(self.root, "Settings")
@@ -327,6 +474,7 @@ More information: http://code.google.com/p/robotframework-mabot/''' % (version)
         filemenu.add_command(label="Save        Ctrl+S", command=lambda: self._save())
         self.root.bind("<Control-s>", lambda x: self._save())
         filemenu.add_command(label="Save As", command=self._save_as)
+        filemenu.add_command(label="Combine Shards", command=self._combine_shards)
         filemenu.add_separator()
         filemenu.add_command(label="Quit        Ctrl+Q", command=self._quit)
         self.root.bind("<Control-q>", self._quit)
@@ -13,61 +13,85 @@
 #  limitations under the License.
 
 
-import os
 from Tkinter import *
-import thread
-import time
+import tkMessageBox
 
+from mabot.utils.progress import BackgroundTask
 
-class ProgressBar(Toplevel):
+POLL_INTERVAL = 100
+
+
+class ProgressDialog(Toplevel):
+    """Runs a function in a background task showing its progress.
+
+    The dialog grabs all input while the task runs so that the model is used
+    only by the task. The task can be cancelled from the dialog.
+    """
 
     def __init__(self, parent, title):
-        self._parent = parent
-        self._title = title
-        self.not_created = False
-        self._init_progress_bar()
-
-    def _init_progress_bar(self):
-        if os.name != 'nt':
-            self.not_created = True
-            return
-        Toplevel.__init__(self, self._parent)
-        self.title(self._title)
-        self.protocol("WM_DELETE_WINDOW", lambda: True)
-        self.width = 200
-        self.height = 10
-        self.geometry(self._get_location(self._parent))
-        self.progress_bar_view = ProgressBarView(self, self.width, self.height)
-        self.progress_bar_view.pack()
-        self._parent.update()
-        self._running = thread.allocate_lock()
-        thread.start_new_thread(self._update, ())
-
-    def add_ask_method(self, method):
-        self._ask_method = method
-
-    def call_ask_method(self, *args):
-        self.destroy()
-        result = self._ask_method(*args)
-        self._init_progress_bar()
-        return result
+        Toplevel.__init__(self, parent)
+        self.title(title)
+        self.transient(parent)
+        self.protocol("WM_DELETE_WINDOW", self._cancel)
+        self.width = 300
+        self.height = 15
+        self._task = None
+        self._label = Label(self, width=50, anchor=W)
+        self._label.pack(padx=5, pady=5, fill=X)
+        self._view = ProgressBarView(self, self.width, self.height)
+        self._view.pack(padx=5)
+        self._cancel_button = Button(self, text='Cancel', command=self._cancel)
+        self._cancel_button.pack(pady=5)
+        self.geometry(self._get_location(parent))
 
     def _get_location(self, parent):
         x = parent.winfo_rootx() + parent.winfo_width()/2 - self.width/2
         y = parent.winfo_rooty() + parent.winfo_height()/2 - self.height/2
         return "+%d+%d" % (x, y)
 
-    def _update(self):
-        while self._running.acquire(0):
-            self.progress_bar_view.update_progress()
-            time.sleep(0.1)
-            self._running.release()
-
-    def destroy(self):
-        if self.not_created:
+    def run(self, function, *args):
+        """Runs the function and returns its result or raises its error.
+
+        The function gets a `Progress` as keyword argument `progress`.
+        Raises `Cancelled` if the task is cancelled.
+        """
+        self._task = BackgroundTask(function, *args).start()
+        self.wait_visibility()
+        self.grab_set()
+        self.after(POLL_INTERVAL, self._poll)
+        self.wait_window(self)
+        return self._task.get_result()
+
+    def ask(self, title, message):
+        """Asks a yes/no question. Can be called from the task."""
+        return self._task.ask(title, message)
+
+    def _ask(self, title, message):
+        return tkMessageBox.askyesno(title, message, parent=self)
+
+    def _poll(self):
+        if self._task.poll(self._ask):
+            self.destroy()
             return
-        self._running.acquire()
-        Toplevel.destroy(self)
+        self._show(self._task.progress)
+        self.after(POLL_INTERVAL, self._poll)
+
+    def _show(self, progress):
+        message, done, total, unit = progress.state
+        if progress.cancelled:
+            message = 'Cancelling...'
+        if total:
+            self._label.configure(text='%s  %d%%' % (message, 100 * done / total))
+            self._view.show_fraction(float(done) / total)
+        else:
+            self._label.configure(text=unit and '%s: %d %s' % (message, done, unit)
+                                  or message)
+            self._view.update_progress()
+
+    def _cancel(self):
+        if self._task is not None:
+            self._task.progress.cancel()
+            self._cancel_button.configure(state=DISABLED)
 
 
 class ProgressBarView:
@@ -77,24 +101,26 @@ class ProgressBarView:
         self.value = 0
         self.width = width
         self.height = height
-        #TODO: Test with Ubuntu
         self.fill_color  = 'blue'
         self.background = 'white'
 
         self.frame = Frame(self.master, bd=2, width=self.width, height=self.height)
         self.canvas = Canvas(self.frame, background=self.background,
                              width=self.width, height=self.height)
-        self.scale = self.canvas.create_rectangle(0, 0, self.width, self.height,
+        self.scale = self.canvas.create_rectangle(0, 0, 0, self.height,
                                                   fill=self.fill_color)
         self.canvas.pack(fill=BOTH, expand=YES)
-        self.update()
 
     def update_progress(self):
+        """Moves the bar when the total amount of work is not known."""
         self.value += self.width / 20
         if self.value > self.width:
             self.value -= self.width
         self.update()
 
+    def show_fraction(self, fraction):
+        self.canvas.coords(self.scale, 0, 0, fraction * self.width, self.height)
+
     def pack(self, *args, **kw):
         self.frame.pack(*args, **kw)
 
@@ -102,4 +128,3 @@ class ProgressBarView:
         start = (float(self.value) / self.width * self.width) - self.width / 4
         end = float(self.value) / self.width * self.width
         self.canvas.coords(self.scale, start, 0, end, self.height)
-        self.canvas.update_idletasks()
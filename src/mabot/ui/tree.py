@@ -45,9 +45,56 @@ class Node(TreeWidget.TreeNode):
                 parent = parent.parent
 
     def drawtext(self):
-        self.label.update_foreground(get_status_color(self.item.model_item))
+        self._update_label()
         TreeWidget.TreeNode.drawtext(self)
 
+    def refresh(self, children=False):
+        """Updates the status colors of this node and its parents.
+
+        Unlike `update`, this does not redraw the whole tree. If `children` is
+        True, also already created child nodes are refreshed.
+        """
+        if children:
+            self._refresh_children()
+        node = self
+        while node is not None:
+            node._update_label()
+            node = node.parent
+
+    def _refresh_children(self):
+        for child in self.children:
+            child._update_label()
+            child._refresh_children()
+
+    def _update_label(self):
+        self.label.update_foreground(get_status_color(self.item.model_item))
+
+    def show_item(self, model_item):
+        """Expands nodes leading to `model_item` and selects its node.
+
+        Other nodes are left as they are and the tree is redrawn only once.
+        Returns the selected node, or None if the item is not in the tree
+        because it is not visible.
+        """
+        path = self.item.get_path_to(model_item)
+        if path is None:
+            return None
+        node = self
+        for item in path[1:]:
+            node._create_children()
+            node.state = 'expanded'
+            node = [child for child in node.children if child.item is item][0]
+        node.update()
+        node.select()
+        node.view()
+        return node
+
+    def _create_children(self):
+        # Creates child nodes like `draw` does for expanded nodes.
+        if not self.children:
+            for item in self.item._GetSubList() or []:
+                self.children.append(self.__class__(self.canvas, self, item))
+
 
 class ForeGroundLabel(Label):
 
@@ -67,9 +114,16 @@ class _RobotTreeItem(TreeWidget.TreeItem):
 
     def __init__(self, item):
         self.model_item = item
-        self.children = self._get_children()
+        self._children = None
         self.label = self._get_label()
 
+    @property
+    def children(self):
+        # Created only when the node is expanded for the first time.
+        if self._children is None:
+            self._children = self._get_children()
+        return self._children
+
     def GetText(self):
         return self.label
 
@@ -79,6 +133,29 @@ class _RobotTreeItem(TreeWidget.TreeItem):
     def IsExpandable(self):
         return self.model_item.has_visible_children()
 
+    def represents(self, model_item):
+        return self.model_item is model_item
+
+    def get_path_to(self, model_item):
+        """Returns tree items from this item to the one showing `model_item`.
+
+        Returns None if `model_item` is not shown below this item.
+        """
+        ancestors = set()
+        item = model_item
+        while item is not None:
+            ancestors.add(id(item))
+            item = item.parent
+        path = [self]
+        while not path[-1].represents(model_item):
+            for child in path[-1].children:
+                if id(child.model_item) in ancestors:
+                    path.append(child)
+                    break
+            else:
+                return None
+        return path
+
 
 class SuiteTreeItem(_RobotTreeItem):
 
@@ -100,6 +177,15 @@ class SuiteTreeItem(_RobotTreeItem):
             return 'file_suite'
         return 'dir_suite'
 
+    def represents(self, model_item):
+        # Suites with only one folder suite child are shown as one node.
+        item = self.model_item
+        while item is not model_item:
+            if not self._only_one_visible_folder_suite_child(item):
+                return False
+            item = [s for s in item.suites if s.visible][0]
+        return True
+
     def _only_one_visible_folder_suite_child(self, item):
         return len([s for s in item.suites if s.visible ]) == 1 \
                and not item.suites[0].tests
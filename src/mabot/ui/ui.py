@@ -14,6 +14,7 @@
 
 
 from Tkinter import *
+import tkMessageBox
 
 from abstracttkdialog import AbstractTkDialog
 
@@ -37,6 +38,14 @@ class SettingsDialog(AbstractTkDialog):
                     self._info_label,
                     self._always_load_old_data_from_xml,
                     self._check_simultaneous_save,
+                    self._incremental_save,
+                    self._cache_test_data,
+                    self._lazy_keyword_loading,
+                    self._journal_changes,
+                    self._parallel_parsing,
+                    self._cache_parsed_files,
+                    self._sharded_output,
+                    self._shard_depth,
                     self._include,
                     self._exclude ]
         for index, method in enumerate(methods):
@@ -79,6 +88,39 @@ class SettingsDialog(AbstractTkDialog):
         self.check_simultaneous_save = self._create_radio_buttons(master,
             "Check Simultaneous Save:", SETTINGS["check_simultaneous_save"], row)
 
+    def _incremental_save(self, master, row):
+        self.incremental_save = self._create_radio_buttons(master,
+            "Save Only Modified Tests:", SETTINGS["incremental_save"], row)
+
+    def _cache_test_data(self, master, row):
+        self.cache_test_data = self._create_radio_buttons(master,
+            "Cache Test Data Between Sessions:", SETTINGS["cache_test_data"], row)
+
+    def _lazy_keyword_loading(self, master, row):
+        self.lazy_keyword_loading = self._create_radio_buttons(master,
+            "Load Keywords from XML Only When Needed:", SETTINGS["lazy_keyword_loading"], row)
+
+    def _journal_changes(self, master, row):
+        self.journal_changes = self._create_radio_buttons(master,
+            "Keep Journal of Unsaved Changes:", SETTINGS["journal_changes"], row)
+
+    def _parallel_parsing(self, master, row):
+        self.parallel_parsing = self._create_radio_buttons(master,
+            "Parse Test Data Files in Parallel:", SETTINGS["parallel_parsing"], row)
+
+    def _cache_parsed_files(self, master, row):
+        self.cache_parsed_files = self._create_radio_buttons(master,
+            "Cache Parsed Test Data Files:", SETTINGS["cache_parsed_files"], row)
+
+    def _sharded_output(self, master, row):
+        self.sharded_output = self._create_radio_buttons(master,
+            "Save Suites to Separate Shard Files:", SETTINGS["sharded_output"], row)
+
+    def _shard_depth(self, master, row):
+        self.shard_depth = self._create_entry(master,
+            "Suite Level of Shards (1 is below the root suite):",
+            str(SETTINGS["shard_depth"]), row)
+
     def _include(self, master, row):
         title="Include Tags (i.e. smoke, manual);"
         self.include = self._create_entry(master, title,
@@ -114,6 +156,14 @@ class SettingsDialog(AbstractTkDialog):
         tags_allowed_only_once = self._get_tags(self.tags_allowed_only_once)
         load_always = self.always_load_old_data_from_xml.get()
         check_simultaneous = self.check_simultaneous_save.get()
+        incremental_save = self.incremental_save.get()
+        cache_test_data = self.cache_test_data.get()
+        lazy_keyword_loading = self.lazy_keyword_loading.get()
+        journal_changes = self.journal_changes.get()
+        parallel_parsing = self.parallel_parsing.get()
+        cache_parsed_files = self.cache_parsed_files.get()
+        sharded_output = self.sharded_output.get()
+        shard_depth = int(self.shard_depth.get())
         include = self._get_tags(self.include)
         exclude = self._get_tags(self.exclude)
         self.new_settings = {"default_message":self.default_message.get(START, END).strip(),
@@ -122,6 +172,14 @@ class SettingsDialog(AbstractTkDialog):
                             "tags_added_to_modified_tests":tags_added_to_modified_tests,
                             "always_load_old_data_from_xml":load_always,
                             "check_simultaneous_save":check_simultaneous,
+                            "incremental_save":incremental_save,
+                            "cache_test_data":cache_test_data,
+                            "lazy_keyword_loading":lazy_keyword_loading,
+                            "journal_changes":journal_changes,
+                            "parallel_parsing":parallel_parsing,
+                            "cache_parsed_files":cache_parsed_files,
+                            "sharded_output":sharded_output,
+                            "shard_depth":shard_depth,
                             "include":include,
                             "exclude":exclude,
                             }
@@ -130,7 +188,14 @@ class SettingsDialog(AbstractTkDialog):
         return utils.get_tags_from_string(field.get())
 
     def validate(self):
-        return True
+        try:
+            if int(self.shard_depth.get()) > 0:
+                return True
+        except ValueError:
+            pass
+        tkMessageBox.showerror('Invalid Settings',
+                               'Suite level of shards must be a positive integer.')
+        return False
 
 
 class ChangeStatusDialog(AbstractTkDialog):
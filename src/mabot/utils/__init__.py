@@ -13,6 +13,6 @@
 #  limitations under the License.
 
 
-from io import load_data
+from io import load_data, ParsingProgress
 from lock import LockFile
 from utils import get_tags_from_string, get_status_color
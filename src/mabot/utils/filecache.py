@@ -0,0 +1,155 @@
+#  Copyright 2008 Nokia Siemens Networks Oyj
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+import cPickle as pickle
+import os
+import tempfile
+import time
+from hashlib import sha1
+
+from mabot.settings.utils import SETTINGS_DIRECTORY
+from mabot.version import version
+from robotapi import ROBOT_VERSION
+
+CACHE_DIRECTORY = os.path.join(SETTINGS_DIRECTORY, 'mabot', 'parsed')
+FORMAT = 1
+# Files modified this close to storing them may have changed without
+# their modification time changing and are always hashed when loading.
+RACY_SECONDS = 2
+
+
+class ParsedFileCache(object):
+    """Persistent cache of parsed test case files.
+
+    Entries are keyed by the path of the file and contain the parsed file
+    or the parsing error together with the messages logged while parsing.
+    An entry is used if the size of the file is unchanged and either its
+    modification time or, if that has changed, the hash of its content
+    matches. Entries are replaced atomically, so processes using the same
+    cache directory at the same time see either the old or the new entry.
+    """
+
+    def __init__(self, directory=None):
+        self._directory = directory or CACHE_DIRECTORY
+        self._signatures = {}
+
+    def get(self, path):
+        """Returns `(datafile, error, messages)` of `path` or None."""
+        signature = _Signature(path)
+        self._signatures[path] = signature
+        parsed = self._load(path, signature)
+        if parsed is None:
+            # Hashing before parsing makes changes done while parsing
+            # invalidate the stored entry.
+            signature.hash()
+        return parsed
+
+    def _load(self, path, signature):
+        cache = self._open(path)
+        if cache is None:
+            return None
+        try:
+            try:
+                if pickle.load(cache) != FORMAT or \
+                        not signature.matches(*pickle.load(cache)):
+                    return None
+                return pickle.load(cache)
+            except Exception:
+                # Corrupted or incompatible entries are just ignored
+                return None
+        finally:
+            cache.close()
+
+    def put(self, path, parsed):
+        """Stores `(datafile, error, messages)` parsed from `path`.
+
+        The file is expected to be unchanged since `get` was called for it.
+        The datafile must not have a parent.
+        """
+        signature = self._signatures.pop(path, None) or _Signature(path)
+        if signature.size is None:
+            return
+        directory = self._directory
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                # Created by another process meanwhile
+                if not os.path.isdir(directory):
+                    raise
+        handle, temp = tempfile.mkstemp('.tmp', '', directory)
+        cache = os.fdopen(handle, 'wb')
+        try:
+            for data in (FORMAT, signature.stored(), parsed):
+                pickle.dump(data, cache, pickle.HIGHEST_PROTOCOL)
+        finally:
+            cache.close()
+        self._replace(temp, self._get_cache_path(path))
+
+    def _open(self, path):
+        try:
+            return open(self._get_cache_path(path), 'rb')
+        except IOError:
+            return None
+
+    def _get_cache_path(self, path):
+        key = repr((os.path.normcase(os.path.abspath(path)), ROBOT_VERSION,
+                    version))
+        return os.path.join(self._directory, '%s.parsed' % sha1(key).hexdigest())
+
+    def _replace(self, temp, path):
+        if os.name == 'nt' and os.path.exists(path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        try:
+            os.rename(temp, path)
+        except OSError:
+            # Another process stored the entry meanwhile
+            os.remove(temp)
+
+
+class _Signature(object):
+
+    def __init__(self, path):
+        self._path = path
+        self.digest = None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.size = self.mtime = None
+        else:
+            self.size, self.mtime = stat.st_size, stat.st_mtime
+        self._time = time.time()
+
+    def matches(self, size, mtime, digest, stored):
+        if self.size is None or size != self.size:
+            return False
+        if mtime == self.mtime and mtime < stored - RACY_SECONDS:
+            return True
+        return self.hash() == digest
+
+    def stored(self):
+        return self.size, self.mtime, self.hash(), self._time
+
+    def hash(self):
+        if self.digest is None and self.size is not None:
+            data = open(self._path, 'rb')
+            try:
+                self.digest = sha1(data.read()).hexdigest()
+            finally:
+                data.close()
+        return self.digest
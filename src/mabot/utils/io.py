@@ -13,11 +13,45 @@
 #  limitations under the License.
 
 
-from robotapi import TestSuite, RobotSettings
+import os
+
+from robotapi import TestSuite, RobotSettings, LOGGER, ROBOT_VERSION
 
 
 def load_data(source, settings):
     robot_settings = RobotSettings()
     robot_settings['Include'] = settings['include']
     robot_settings['Exclude'] = settings['exclude']
+    if ROBOT_VERSION >= '2.7' and (settings['cache_parsed_files'] or
+            settings['parallel_parsing'] and os.path.isdir(source)):
+        from parallel import parse_test_data
+        from filecache import ParsedFileCache
+        cache = settings['cache_parsed_files'] and ParsedFileCache() or None
+        processes = not settings['parallel_parsing'] and 1 or None
+        return parse_test_data(source, robot_settings, processes, cache)
     return TestSuite([source], robot_settings)
+
+
+class ParsingProgress(object):
+    """Reports test data files parsed by Robot to a `Progress`.
+
+    Robot logs a message about every file it parses. The object is used as
+    a Robot logger between calls to `register` and `unregister`.
+    """
+
+    def __init__(self, progress):
+        self._progress = progress
+        self._registered = False
+
+    def register(self):
+        # Messages logged earlier are relayed to new loggers immediately.
+        LOGGER.register_logger(self)
+        self._registered = True
+
+    def unregister(self):
+        LOGGER.unregister_logger(self)
+        self._registered = False
+
+    def message(self, msg):
+        if self._registered and msg.message.startswith('Parsing file'):
+            self._progress.advance()
@@ -16,6 +16,8 @@
 import os
 import time
 
+LOCKED_TITLE = "File locked for editing!"
+
 class LockFile:
 
     def __init__(self, path):
@@ -32,7 +34,7 @@ class LockFile:
         lock_file_content = self._get_lock_file()
         message = "%s\nDo you want to remove the lock?" % (lock_file_content)
         if lock_file_content is not None and \
-            not ask_method("File locked for editing!", message):
+            not ask_method(LOCKED_TITLE, message):
             raise LockException("Lock '%s' not overridden." % self.lock_path)
         return self._create_lock()
 
@@ -0,0 +1,171 @@
+#  Copyright 2008 Nokia Siemens Networks Oyj
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+import os
+from StringIO import StringIO
+
+from robot.common.statistics import (Statistics, SuiteStat, SuiteStatistics,
+                                     TagStatistics, TotalStatistics)
+from robot.reporting.outputwriter import OutputWriter
+from robot.utils import XmlWriter, get_timestamp
+from robot.version import get_full_version
+
+BUFFER_SIZE = 1024 * 1024
+
+
+class StreamingOutputWriter(OutputWriter):
+    """Writes output XML and collects statistics in a single pass.
+
+    Statistics are written when the writer is closed. Generation time of the
+    output is available from `generated` attribute after creating the writer.
+    Written tests are reported to `progress` if it is given.
+    """
+
+    def __init__(self, path, progress=None):
+        self.generated = None
+        self._progress = progress
+        self._suite_stats = []
+        self._root_stats = None
+        self._tag_stats = TagStatistics()
+        OutputWriter.__init__(self, path)
+
+    def _get_writer(self, path, generator):
+        self.generated = get_timestamp()
+        writer = XmlWriter(open(path, 'w', BUFFER_SIZE), encoding='UTF-8')
+        writer.start('robot', {'generator': get_full_version(generator),
+                               'generated': self.generated})
+        return writer
+
+    def start_suite(self, suite):
+        OutputWriter.start_suite(self, suite)
+        self._suite_stats.append(_SuiteStatistics(suite))
+
+    def end_test(self, test):
+        OutputWriter.end_test(self, test)
+        suite_stats = self._suite_stats[-1]
+        suite_stats.add_test(test)
+        self._tag_stats.add_test(test, suite_stats.critical_tags)
+        if self._progress is not None:
+            self._progress.advance()
+
+    def end_suite(self, suite):
+        OutputWriter.end_suite(self, suite)
+        stats = self._suite_stats.pop()
+        if self._suite_stats:
+            self._suite_stats[-1].add_suite(stats)
+        else:
+            self._root_stats = stats
+
+    def write_raw(self, data):
+        """Writes already serialized, UTF-8 encoded XML as is."""
+        _write_raw(self._writer, data)
+
+    def abort(self):
+        """Closes the output without finishing it."""
+        self._writer.close()
+
+    def close(self):
+        if self._root_stats:
+            _Statistics(self._root_stats, self._tag_stats).serialize(self)
+        OutputWriter.close(self)
+
+
+class FragmentWriter(OutputWriter):
+    """Serializes single elements of output XML into UTF-8 encoded strings.
+
+    Returned fragments do not have a trailing newline.
+    """
+
+    def __init__(self):
+        self._output = StringIO()
+        OutputWriter.__init__(self, None)
+
+    def _get_writer(self, path, generator):
+        return _FragmentXmlWriter(self._output, encoding='UTF-8')
+
+    def root(self):
+        """Returns generation time and the start tag of the root element."""
+        generated = get_timestamp()
+        self._writer.start('robot', {'generator': get_full_version('Rebot'),
+                                     'generated': generated})
+        return generated, self._flush()
+
+    def test(self, test):
+        test.serialize(self)
+        return self._flush()
+
+    def write_raw(self, data):
+        """Writes already serialized, UTF-8 encoded XML as is."""
+        _write_raw(self._writer, data)
+
+    def suite_status(self, suite):
+        self._write_status(suite)
+        return self._flush()
+
+    def statistics(self, suite):
+        Statistics(suite).serialize(self)
+        return self._flush()
+
+    def _flush(self):
+        data = self._output.getvalue()
+        self._output.seek(0)
+        self._output.truncate()
+        return data[:-1] if data.endswith('\n') else data
+
+
+def _write_raw(writer, data):
+    writer.output.write(data)
+    writer.output.write(os.linesep)
+
+
+class _FragmentXmlWriter(XmlWriter):
+
+    def _preamble(self):
+        pass
+
+
+class _SuiteStatistics(SuiteStatistics):
+
+    def __init__(self, suite):
+        self.all = SuiteStat(suite)
+        self.critical = SuiteStat(suite)
+        self.critical_tags = suite.critical
+        self.suites = []
+        self._suite_stat_level = -1
+
+    def add_test(self, test):
+        self.all.add_test(test)
+        if test.critical:
+            self.critical.add_test(test)
+
+    def add_suite(self, stats):
+        self.suites.append(stats)
+        self.all.add_stat(stats.all)
+        self.critical.add_stat(stats.critical)
+
+
+class _Statistics(object):
+
+    def __init__(self, suite_stats, tag_stats):
+        self.suite = suite_stats
+        self.tags = tag_stats
+        self.total = TotalStatistics(suite_stats)
+
+    def serialize(self, serializer):
+        serializer.start_statistics(self)
+        self.total.serialize(serializer)
+        self.tags.serialize(serializer)
+        self.suite.serialize(serializer)
+        serializer.end_statistics(self)
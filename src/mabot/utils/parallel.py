@@ -0,0 +1,204 @@
+#  Copyright 2008 Nokia Siemens Networks Oyj
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+import multiprocessing
+import os
+
+from robot.parsing.model import TestCaseFile, TestDataDirectory
+from robot.parsing.populators import FromDirectoryPopulator
+from robot.utils import abspath
+
+from robotapi import RunnableTestSuite, DataError, LOGGER, NormalizedDict
+
+# Directories with fewer files are not worth starting processes for
+MIN_FILES = 8
+
+
+def parse_test_data(source, settings, processes=None, cache=None):
+    """Creates a runnable test suite from a test data file or directory.
+
+    Works like `robotapi.TestSuite` but test case files are parsed in
+    a pool of `processes` processes, by default one per CPU. Directories
+    and initialization files are still handled in this process in the same
+    order as by Robot, and messages logged while parsing files are relayed
+    to Robot's logger in this process.
+
+    If a `filecache.ParsedFileCache` is given, test case files found from it
+    are not parsed at all, and other files are stored to it after parsing.
+    """
+    source = abspath(source)
+    if os.path.isdir(source):
+        files = _TestCaseFileCollector().collect(source, settings['SuiteNames'])
+    else:
+        files = [source]
+    received = {}
+    if cache is not None:
+        for path in files:
+            parsed = cache.get(path)
+            if parsed is not None:
+                received[path] = parsed
+        files = [path for path in files if path not in received]
+    processes = processes or multiprocessing.cpu_count()
+    if processes < 2 or len(files) < MIN_FILES:
+        populator = _ParallelDirectoryPopulator(iter([]), received, cache)
+        data = _parse_suite(source, settings, populator)
+    else:
+        pool = multiprocessing.Pool(processes, _init_worker)
+        try:
+            chunksize = len(files) / (processes * 4) + 1
+            populator = _ParallelDirectoryPopulator(
+                pool.imap(_parse_file, files, chunksize), received, cache)
+            data = _parse_suite(source, settings, populator)
+        finally:
+            pool.terminate()
+    suite = RunnableTestSuite(data)
+    suite.set_options(settings)
+    suite.filter_empty_suites()
+    if not suite.get_test_count() and not settings['RunEmptySuite']:
+        raise DataError("Test suite '%s' contains no test cases." % suite.source)
+    return suite
+
+
+def _parse_suite(source, settings, populator):
+    try:
+        if not os.path.isdir(source):
+            return populator.create_file(None, source)
+        return _ParallelDataDirectory(None, source, populator).populate(
+            settings['SuiteNames'], settings['WarnOnSkipped'])
+    except DataError, err:
+        raise DataError("Parsing '%s' failed: %s" % (source, unicode(err)))
+
+
+class _TestCaseFileCollector(FromDirectoryPopulator):
+    """Lists test case files Robot would parse from a directory, in order."""
+
+    def collect(self, path, include_suites):
+        files = []
+        self._collect(path, include_suites, files)
+        return files
+
+    def _collect(self, path, include_suites, files):
+        include_suites = self._get_include_suites(path, include_suites)
+        for name, child in self._list_dir(path):
+            if self._is_init_file(name, child) or \
+                    not self._is_included(name, child, include_suites):
+                continue
+            if os.path.isdir(child):
+                self._collect(child, include_suites, files)
+            else:
+                files.append(child)
+
+
+class _ParallelDataDirectory(TestDataDirectory):
+    """Test data directory whose children are created by `populator`.
+
+    Directories are populated and errors logged by Robot's own
+    `FromDirectoryPopulator`. Only its `add_child` hook is replaced.
+    """
+
+    def __init__(self, parent, source, populator):
+        TestDataDirectory.__init__(self, parent, source)
+        self._populator = populator
+
+    def populate(self, include_suites=[], warn_on_skipped=False, recurse=True):
+        self._populator.populate(self.source, self, include_suites,
+                                 warn_on_skipped, recurse)
+        self.children = [ch for ch in self.children if ch.has_tests()]
+        return self
+
+    def add_child(self, path, include_suites):
+        # Like `robot.parsing.model.TestData` used by the original.
+        if os.path.isdir(path):
+            child = _ParallelDataDirectory(self, path, self._populator)
+            self.children.append(child.populate(include_suites))
+        else:
+            self.children.append(self._populator.create_file(self, path))
+
+
+class _ParallelDirectoryPopulator(FromDirectoryPopulator):
+    """Populates directories like Robot using files parsed by the pool.
+
+    Files are normally received in the order they are needed. Files that
+    were not parsed by the pool or found from the cache, for example
+    because they were added after listing the files, are parsed in this
+    process.
+    """
+
+    def __init__(self, parsed_files, received, cache=None):
+        self._parsed_files = parsed_files
+        self._received = received
+        self._cache = cache
+
+    def create_file(self, datadir, path):
+        parsed = self._receive(path)
+        if parsed is None:
+            # Messages are logged while parsing in this process.
+            _, datafile, error, messages = _parse_file(path)
+            self._store(path, (datafile, error, messages))
+        else:
+            datafile, error, messages = parsed
+            for message, level, html in messages:
+                LOGGER.write(message, level, html)
+        if error is not None:
+            raise DataError(error)
+        datafile.parent = datadir
+        datafile._tables = NormalizedDict(datafile._get_tables())
+        return datafile
+
+    def _receive(self, path):
+        while path not in self._received:
+            try:
+                parsed_path, datafile, error, messages = self._parsed_files.next()
+            except StopIteration:
+                return None
+            self._received[parsed_path] = (datafile, error, messages)
+            self._store(parsed_path, (datafile, error, messages))
+        return self._received.pop(path)
+
+    def _store(self, path, parsed):
+        if self._cache is not None:
+            self._cache.put(path, parsed)
+
+
+def _init_worker():
+    # Messages are relayed to the parent process and need not be cached.
+    LOGGER.disable_message_cache()
+
+
+def _parse_file(path):
+    recorder = _MessageRecorder()
+    LOGGER.register_logger(recorder)
+    # Messages logged earlier are relayed to new loggers immediately.
+    del recorder.messages[:]
+    try:
+        try:
+            datafile = TestCaseFile(source=path).populate()
+        except DataError, err:
+            return path, None, unicode(err), recorder.messages
+    finally:
+        LOGGER.unregister_logger(recorder)
+    # Tables are looked up only while populating and the lookup contains
+    # functions, which cannot be pickled. It is recreated when received.
+    datafile._tables = None
+    return path, datafile, None, recorder.messages
+
+
+class _MessageRecorder(object):
+
+    def __init__(self):
+        self.messages = []
+
+    def message(self, msg):
+        self.messages.append((msg.message, msg.level, msg.html))
@@ -0,0 +1,145 @@
+#  Copyright 2008 Nokia Siemens Networks Oyj
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+import sys
+import threading
+from Queue import Queue, Empty
+
+
+_running_tasks = [0]
+_running_tasks_lock = threading.Lock()
+
+
+def tasks_running():
+    """Returns True if any `BackgroundTask` is still running its function."""
+    return _running_tasks[0] > 0
+
+
+def _add_running_tasks(count):
+    _running_tasks_lock.acquire()
+    try:
+        _running_tasks[0] += count
+    finally:
+        _running_tasks_lock.release()
+
+
+class Cancelled(Exception):
+    """Used when loading or saving is cancelled by the user."""
+
+
+class Progress(object):
+    """Progress of loading or saving data reported in phases.
+
+    A phase has a message, a unit and optionally the total amount of work,
+    for example bytes to read or tests to write. Progress can be read from
+    other threads at any time and cancelling is possible from any thread.
+    The operation is interrupted with `Cancelled` when it next reports
+    progress.
+    """
+
+    def __init__(self):
+        self.cancelled = False
+        self.state = ('', 0, None, '')
+
+    def start(self, message, total=None, unit=''):
+        self.check_cancelled()
+        self.state = (message, 0, total, unit)
+
+    def advance(self, amount=1):
+        self.check_cancelled()
+        message, done, total, unit = self.state
+        self.state = (message, done + amount, total, unit)
+
+    def cancel(self):
+        self.cancelled = True
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise Cancelled('Cancelled by the user.')
+
+
+class ProgressReader(object):
+    """File opened for reading that reports read bytes to a `Progress`."""
+
+    def __init__(self, path, progress):
+        self.name = path
+        self._file = open(path, 'rb')
+        self._progress = progress
+
+    def read(self, size=-1):
+        data = self._file.read(size)
+        self._progress.advance(len(data))
+        return data
+
+    def close(self):
+        self._file.close()
+
+
+class BackgroundTask(object):
+    """Runs a function in a worker thread.
+
+    The function gets a `Progress` as keyword argument `progress`. The thread
+    that started the task must call `poll` regularly. Questions the function
+    asks using `ask` are answered in `poll` so that user interfaces need to
+    be used only from their own thread.
+    """
+
+    def __init__(self, function, *args):
+        self.progress = Progress()
+        self._function = function
+        self._args = args
+        self._questions = Queue()
+        self._answers = Queue()
+        self._result = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run)
+        self._thread.setDaemon(True)
+
+    def start(self):
+        _add_running_tasks(1)
+        try:
+            self._thread.start()
+        except:
+            _add_running_tasks(-1)
+            raise
+        return self
+
+    def _run(self):
+        try:
+            self._result = self._function(*self._args, progress=self.progress)
+        except:
+            self._error = sys.exc_info()
+        _add_running_tasks(-1)
+
+    def ask(self, title, message):
+        """Asks a question in the polling thread and waits for the answer."""
+        self._questions.put((title, message))
+        return self._answers.get()
+
+    def poll(self, ask_method):
+        """Answers pending questions and returns True if the task is done."""
+        try:
+            question = self._questions.get_nowait()
+        except Empty:
+            pass
+        else:
+            self._answers.put(ask_method(*question))
+        return not self._thread.isAlive()
+
+    def get_result(self):
+        """Returns the result of a finished task or raises its error."""
+        if self._error is not None:
+            raise self._error[0], self._error[1], self._error[2]
+        return self._result
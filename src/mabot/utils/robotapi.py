@@ -17,13 +17,15 @@ import sys
 try:
     from robot.common import UserErrorHandler
     from robot.common.model import BaseTestSuite
+    from robot.common.statistics import Stat
     from robot.running import TestSuite
     from robot.running.model import RunnableTestSuite, RunnableTestCase
     from robot.conf import RobotSettings
     from robot.running.namespace import Namespace
     from robot.utils import (ArgumentParser, get_timestamp, normalize,
                             elapsed_time_to_string, eq, normalize_tags,
-                            unescape, get_elapsed_time)
+                            unescape, get_elapsed_time, matches,
+                            Matcher, NormalizedDict)
     from robot import version
     ROBOT_VERSION = version.get_version()
     from robot.errors import DataError, Information
@@ -43,28 +45,61 @@ def XmlTestSuite(suite):
     from robot.result import ExecutionResult
     return ExecutionResult(suite).suite
 
-def RobotTestOutput(suite):
+def RobotTestOutput(suite, progress=None):
     if ROBOT_VERSION < '2.6':
         from robot.serializing.testoutput import RobotTestOutput as _RobotTestOutput
         return _RobotTestOutput(suite, NoOperation())
     elif ROBOT_VERSION < '2.7':
         from robot.result.resultwriter import ResultFromXML
         return ResultFromXML(suite, NoOperation())
-    return _ResultFromXML(suite)
+    return _ResultFromXML(suite, progress)
+
+def FragmentWriter():
+    from mabot.utils.outputwriter import FragmentWriter
+    return FragmentWriter()
 
 class _ResultFromXML(object):
     
-    def __init__(self, suite):
+    def __init__(self, suite, progress=None):
         self.suite = suite
-    
-    def serialize_output(self, path, _non_needed):        
-        from robot.reporting.outputwriter import OutputWriter
-        serializer = OutputWriter(path)
-        self.suite.serialize(serializer)
-        from robot.common import Statistics 
-        statistics = Statistics(self.suite, ())
-        statistics.serialize(serializer)
+        self.progress = progress
+
+    def serialize_output(self, path, _non_needed):
+        """Writes the output and returns its generation time."""
+        from mabot.utils.outputwriter import StreamingOutputWriter
+        serializer = StreamingOutputWriter(path, self.progress)
+        try:
+            self.suite.serialize(serializer)
+        except:
+            serializer.abort()
+            raise
         serializer.close()
+        return serializer.generated
+
+
+def list_data_files(directory):
+    """Returns paths in `directory` that Robot tries to parse as test data.
+
+    The initialization file and files and directories that end up not being
+    suites, for example because they contain no tests, are included.
+    """
+    from robot.parsing.populators import FromDirectoryPopulator
+    populator = FromDirectoryPopulator()
+    return [path for name, path in populator._list_dir(directory)
+            if populator._is_init_file(name, path)
+            or populator._is_included(name, path, None)]
+
+
+def get_resource_imports(path):
+    """Returns import settings of the resource file `path`.
+
+    Returns an empty list if the file cannot be parsed.
+    """
+    from robot.parsing.model import ResourceFile
+    try:
+        return ResourceFile(path).populate().setting_table.imports
+    except DataError:
+        return []
 
 
 def get_elapsed_time_as_string(start_time, end_time):
@@ -0,0 +1,172 @@
+#  Copyright 2008 Nokia Siemens Networks Oyj
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from os.path import dirname, join, normcase
+
+from mabot.batch import (Batch, BatchError, batch, read_updates,
+                         _BatchQuestions)
+from mabot.model.io import IO
+from mabot.model import io, model
+from mabot.utils.lock import LOCKED_TITLE
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        data = normcase(join(dirname(__file__), 'data', 'root_suite'))
+        self.suite = IO().load_data(data)
+        self.batch = Batch(self.suite)
+
+    def tearDown(self):
+        model.DATA_MODIFIED.status = False
+
+    def test_updating_test_by_longname(self):
+        count = self.batch.apply([{'test': 'Root Suite.Sub Suite3.TC2',
+                                   'status': 'pass', 'message': 'Ok'}])
+        test = self.suite.suites[2].tests[1]
+        self.assertEquals(count, 1)
+        self.assertEquals((test.status, test.message), ('PASS', 'Ok'))
+        self.assertEquals(self.suite.all_stats.passed, 1)
+
+    def test_longname_is_normalized_like_name_patterns(self):
+        count = self.batch.apply([{'test': 'root_suite.SUB SUITE3.tc2',
+                                   'status': 'PASS'}])
+        self.assertEquals(count, 1)
+        self.assertEquals(self.suite.suites[2].tests[1].status, 'PASS')
+
+    def test_updating_tests_by_name_pattern(self):
+        count = self.batch.apply([{'test': 'Root Suite.Sub Suite3.*',
+                                   'status': 'PASS'}])
+        self.assertEquals(count, 3)
+        self.assertEquals(self.suite.suites[2].status, 'PASS')
+
+    def test_updating_tests_by_tag_pattern(self):
+        count = self.batch.apply([{'tag': 'tag-1&tag-2', 'tags': 'new, other',
+                                   'remove_tags': 'tag-3'}])
+        self.assertEquals(count, 1)
+        self.assertEquals(self.suite.suites[0].tests[0].tags,
+                          ['new', 'other', 'tag-1', 'tag-2'])
+
+    def test_message_is_updated_without_changing_status(self):
+        self.batch.apply([{'test': 'Root Suite.Sub Suite3.TC1',
+                           'message': 'Checked'}])
+        test = self.suite.suites[2].tests[0]
+        self.assertEquals((test.status, test.message), ('FAIL', 'Checked'))
+
+    def test_unknown_test(self):
+        self.assertRaises(BatchError, self.batch.apply,
+                          [{'test': 'Root Suite.Nonex', 'status': 'PASS'}])
+
+    def test_invalid_status(self):
+        self.assertRaises(BatchError, self.batch.apply,
+                          [{'test': 'Root Suite.Sub Suite3.TC1', 'status': 'OK'}])
+
+    def test_update_without_selection(self):
+        self.assertRaises(BatchError, self.batch.apply, [{'status': 'PASS'}])
+
+
+class TestRunningBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.output = join(self.tempdir, 'output.xml')
+        shutil.copy(join(dirname(__file__), 'data', 'suites.xml'), self.output)
+        self.updates = join(self.tempdir, 'updates.csv')
+        updates = open(self.updates, 'w')
+        updates.write('test,message\nSuites.Testcases.Failing,From batch\n')
+        updates.close()
+        self._orig_journal_changes = io.SETTINGS['journal_changes']
+        io.SETTINGS['journal_changes'] = True
+
+    def tearDown(self):
+        io.SETTINGS['journal_changes'] = self._orig_journal_changes
+        model.DATA_MODIFIED.saved()
+        shutil.rmtree(self.tempdir)
+
+    def test_journals_are_not_replayed_or_removed(self):
+        journal = self.output + '.other.1.journal'
+        record = {'test': ['Suites', 'Testcases', 'Passing'], 'keywords': [],
+                  'status': 'FAIL', 'message': 'From journal', 'modified': ''}
+        journal_file = open(journal, 'w')
+        journal_file.write(json.dumps(record) + '\n')
+        journal_file.close()
+        self.assertEquals(batch(self.output, self.updates), 1)
+        self.assertTrue(os.path.exists(journal))
+        saved = open(self.output).read()
+        self.assertTrue('From batch' in saved)
+        self.assertFalse('From journal' in saved)
+
+    def test_warning_method_is_restored(self):
+        orig_show_warning = model.show_warning
+        batch(self.output, self.updates)
+        self.assertEquals(model.show_warning, orig_show_warning)
+        self.assertRaises(BatchError, batch, self.output,
+                          join(self.tempdir, 'nonex.json'))
+        self.assertEquals(model.show_warning, orig_show_warning)
+
+
+class TestReadingUpdates(unittest.TestCase):
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_reading_csv(self):
+        self._write('.csv', 'test,status,message\nA.B,PASS,\nA.C,FAIL,Bad\n')
+        self.assertEquals(read_updates(self.path),
+                          [{'test': 'A.B', 'status': 'PASS'},
+                           {'test': 'A.C', 'status': 'FAIL', 'message': 'Bad'}])
+
+    def test_reading_json(self):
+        self._write('.json', '[{"tag": "smoke", "tags": ["a", "b"]}]')
+        self.assertEquals(read_updates(self.path),
+                          [{'tag': 'smoke', 'tags': ['a', 'b']}])
+
+    def test_reading_invalid_json(self):
+        self._write('.json', '{"tag": "smoke"}')
+        self.assertRaises(BatchError, read_updates, self.path)
+
+    def _write(self, extension, content):
+        handle, self.path = tempfile.mkstemp(suffix=extension)
+        os.write(handle, content)
+        os.close(handle)
+
+
+class TestBatchQuestions(unittest.TestCase):
+
+    def test_lock_is_removed_only_when_forced(self):
+        self.assertTrue(_BatchQuestions(True)(LOCKED_TITLE, ''))
+        self.assertFalse(_BatchQuestions(False)(LOCKED_TITLE, ''))
+
+    def test_own_results_are_kept_in_conflicts(self):
+        self.assertFalse(_BatchQuestions(True)('Conflicting Results!', ''))
+
+
+class TestImportingWithoutTkinter(unittest.TestCase):
+
+    def test_batch_does_not_import_tkinter(self):
+        code = ("import sys; import mabot.batch; "
+                "sys.exit('Tkinter' in sys.modules or 'tkMessageBox' in sys.modules)")
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        self.assertEquals(subprocess.call([sys.executable, '-c', code], env=env), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
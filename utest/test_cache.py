@@ -0,0 +1,150 @@
+#  Copyright 2008 Nokia Siemens Networks Oyj
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from os.path import dirname, join
+
+from mabot.model import cache
+from mabot.model.cache import TestDataCache
+from mabot.settings import SETTINGS
+
+ROOT_SUITE = join(dirname(__file__), 'data', 'root_suite')
+
+
+class TestTestDataCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.data = join(self.tempdir, 'root_suite')
+        shutil.copytree(ROOT_SUITE, self.data)
+        self.cache = TestDataCache(SETTINGS, join(self.tempdir, 'cache'))
+        self.parsed = []
+        self._orig_parse = self.cache._parse
+        self.cache._parse = self._parse
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def _parse(self, source, parent=None):
+        self.parsed.append(os.path.basename(source))
+        return self._orig_parse(source, parent)
+
+    def test_model_is_loaded_from_cache(self):
+        suite = self.cache.load(self.data)
+        cached = self.cache.load(self.data)
+        self.assertEquals(self.parsed, ['root_suite'])
+        self.assertEquals(cached.longname, suite.longname)
+        self.assertEquals([t.longname for t in cached.suites[2].tests],
+                          [t.longname for t in suite.suites[2].tests])
+        self.assertEquals(len(cached.suites[1].tests[0].keywords), 5)
+        self.assertEquals(cached.suites[1].tests[0].parent, cached.suites[1])
+        self.assertEquals(cached.all_stats.failed, 5)
+        self.assertEquals(cached.metadata.items(), suite.metadata.items())
+
+    def test_only_changed_file_is_parsed_again(self):
+        self.cache.load(self.data)
+        self._modify('sub_suite3.html', 'TC1', 'Renamed')
+        suite = self.cache.load(self.data)
+        self.assertEquals(self.parsed, ['root_suite', 'sub_suite3.html'])
+        self.assertEquals(suite.suites[2].tests[0].longname,
+                          'Root Suite.Sub Suite3.Renamed')
+        self.assertEquals(suite.suites[2].parent, suite)
+        self.assertEquals(suite.get_suite('Sub Suite3'), suite.suites[2])
+        self.assertEquals(self.cache.load(self.data).suites[2].tests[0].name,
+                          'Renamed')
+        self.assertEquals(len(self.parsed), 2)
+
+    def test_added_file_causes_parsing_whole_directory(self):
+        self.cache.load(self.data)
+        shutil.copy(join(self.data, 'sub_suite3.html'),
+                    join(self.data, 'sub_suite4.html'))
+        self._touch(self.data)
+        suite = self.cache.load(self.data)
+        self.assertEquals(self.parsed, ['root_suite', 'root_suite'])
+        self.assertEquals(len(suite.suites), 4)
+
+    def test_skipped_file_changed_in_place_is_parsed(self):
+        os.mkdir(join(self.data, 'nested'))
+        skipped = join(self.data, 'nested', 'skipped.txt')
+        open(skipped, 'w').write('*** Keywords ***\nKeyword\n    No Operation\n')
+        self.assertEquals(len(self.cache.load(self.data).suites), 3)
+        content = open(skipped).read()
+        open(skipped, 'w').write('*** Test Cases ***\nNew Test\n    Log    Hi\n'
+                                 + content)
+        self._touch(skipped)
+        suite = self.cache.load(self.data)
+        self.assertEquals(self.parsed, ['root_suite', 'root_suite'])
+        self.assertEquals([sub.name for sub in suite.suites],
+                          ['Nested', 'Sub Suite1', 'Sub Suite2', 'Sub Suite3'])
+        self.assertEquals(suite.suites[0].suites[0].tests[0].name, 'New Test')
+
+    def _write_suite_importing(self, setting, name):
+        suite = open(join(self.data, 'importing.txt'), 'w')
+        suite.write('*** Settings ***\n%s    %s\n\n'
+                    '*** Test Cases ***\nTest\n    Keyword\n' % (setting, name))
+        suite.close()
+
+    def test_changed_resource_file_causes_parsing_whole_data(self):
+        resource = join(self.tempdir, 'resource.txt')
+        open(resource, 'w').write('*** Keywords ***\nKeyword\n    No Operation\n')
+        self._write_suite_importing('Resource', '../resource.txt')
+        self.cache.load(self.data)
+        self.cache.load(self.data)
+        self.assertEquals(self.parsed, ['root_suite'])
+        open(resource, 'a').write('    Log    Changed\n')
+        self._touch(resource)
+        self.cache.load(self.data)
+        self.assertEquals(self.parsed, ['root_suite', 'root_suite'])
+
+    def test_cache_is_not_used_when_imported_file_is_not_known(self):
+        self._write_suite_importing('Variables', '${VARIABLES}/variables.py')
+        self.cache.load(self.data)
+        self.cache.load(self.data)
+        self.assertEquals(self.parsed, ['root_suite', 'root_suite'])
+
+    def test_changed_settings_use_different_cache(self):
+        self.cache.load(self.data)
+        orig = SETTINGS['default_message']
+        SETTINGS['default_message'] = 'Changed'
+        try:
+            self.cache.load(self.data)
+        finally:
+            SETTINGS['default_message'] = orig
+        self.assertEquals(self.parsed, ['root_suite', 'root_suite'])
+
+    def test_corrupted_cache_is_ignored(self):
+        self.cache.load(self.data)
+        path = self.cache._get_cache_path(os.path.abspath(self.data))
+        open(path, 'wb').write('corrupted')
+        self.assertEquals(len(self.cache.load(self.data).suites), 3)
+        self.assertEquals(self.parsed, ['root_suite', 'root_suite'])
+
+    def _modify(self, name, old, new):
+        path = join(self.data, name)
+        content = open(path).read()
+        open(path, 'w').write(content.replace(old, new))
+        self._touch(path)
+
+    def _touch(self, path):
+        # Make sure modification time changes also on coarse file systems
+        mtime = time.time() + 10
+        os.utime(path, (mtime, mtime))
+
+
+if __name__ == "__main__":
+    unittest.main()
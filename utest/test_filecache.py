@@ -0,0 +1,150 @@
+#  Copyright 2008 Nokia Siemens Networks Oyj
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+from os.path import basename, dirname, join
+
+from mabot.utils import parallel, robotapi
+from mabot.utils.filecache import ParsedFileCache
+
+ROOT_SUITE = join(dirname(__file__), 'data', 'root_suite')
+
+
+class _MessageCollector(object):
+
+    def __init__(self):
+        self.messages = []
+
+    def message(self, msg):
+        self.messages.append(msg.message)
+
+
+class TestParsedFileCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.data = join(self.tempdir, 'root_suite')
+        shutil.copytree(ROOT_SUITE, self.data)
+        self.cache_dir = join(self.tempdir, 'cache')
+        self.settings = robotapi.RobotSettings()
+        self.parsed = []
+        self._orig_parse_file = parallel._parse_file
+        parallel._parse_file = self._parse_file
+
+    def tearDown(self):
+        parallel._parse_file = self._orig_parse_file
+        shutil.rmtree(self.tempdir)
+
+    def _parse_file(self, path):
+        self.parsed.append(basename(path))
+        return self._orig_parse_file(path)
+
+    def _parse(self, source=None):
+        self.parsed = []
+        return parallel.parse_test_data(source or self.data, self.settings, 1,
+                                         ParsedFileCache(self.cache_dir))
+
+    def _path(self, name):
+        return join(self.data, name)
+
+    def _names(self, suite):
+        return [(test.longname, list(test.tags),
+                 [kw.name for kw in test.keywords])
+                for sub_suite in suite.suites for test in sub_suite.tests]
+
+    def _modify(self, name, old, new, keep_mtime=False):
+        path = self._path(name)
+        stat = os.stat(path)
+        content = open(path).read()
+        assert old in content
+        open(path, 'w').write(content.replace(old, new))
+        if keep_mtime:
+            os.utime(path, (stat.st_atime, stat.st_mtime))
+
+    def _touch_files(self):
+        for name in os.listdir(self.data):
+            stat = os.stat(self._path(name))
+            os.utime(self._path(name), (stat.st_atime, stat.st_mtime - 60))
+
+    def test_cached_files_are_not_parsed(self):
+        suite = self._parse()
+        self.assertEquals(sorted(self.parsed), sorted(os.listdir(self.data)))
+        cached = self._parse()
+        self.assertEquals(self.parsed, [])
+        self.assertEquals(self._names(cached), self._names(suite))
+        self.assertEquals(self._names(cached),
+            self._names(robotapi.TestSuite([self.data], self.settings)))
+        self.assertEquals(cached.suites[0].parent, cached)
+
+    def test_only_changed_file_is_parsed_again(self):
+        self._parse()
+        self._modify('sub_suite3.html', 'TC1', 'Renamed')
+        suite = self._parse()
+        self.assertEquals(self.parsed, ['sub_suite3.html'])
+        self.assertEquals(suite.suites[2].tests[0].name, 'Renamed')
+
+    def test_change_soon_after_caching_is_found_by_hash(self):
+        # Modification times do not necessarily change within a second.
+        os.utime(self._path('sub_suite3.html'), None)
+        self._parse()
+        self._modify('sub_suite3.html', 'TC1', 'TCX', keep_mtime=True)
+        self.assertEquals(self._parse().suites[2].tests[0].name, 'TCX')
+        self.assertEquals(self.parsed, ['sub_suite3.html'])
+
+    def test_touched_file_is_not_parsed_again(self):
+        self._parse()
+        self._touch_files()
+        self._parse()
+        self.assertEquals(self.parsed, [])
+
+    def test_single_file_is_cached(self):
+        path = self._path('sub_suite1.html')
+        suite = self._parse(path)
+        self.assertEquals(self._parse(path).name, suite.name)
+        self.assertEquals(self.parsed, [])
+
+    def test_messages_are_replayed_from_cache(self):
+        open(self._path('invalid.html'), 'w').write('<p>No tables</p>')
+        self._parse()
+        collector = _MessageCollector()
+        robotapi.LOGGER.register_logger(collector)
+        # Messages logged earlier are relayed when registering.
+        collector.messages = []
+        try:
+            self._parse()
+        finally:
+            robotapi.LOGGER.unregister_logger(collector)
+        self.assertEquals(self.parsed, [])
+        self.assertTrue("Parsing file '%s'." % self._path('invalid.html')
+                        in collector.messages)
+        self.assertEquals(len([msg for msg in collector.messages
+                               if msg.startswith('Parsing file')]), 4)
+        self.assertTrue([msg for msg in collector.messages
+                         if 'invalid.html' in msg and 'failed' in msg])
+
+    def test_corrupted_entries_are_ignored(self):
+        self._parse()
+        for name in os.listdir(self.cache_dir):
+            open(join(self.cache_dir, name), 'wb').write('corrupted')
+        self.assertEquals(len(self._parse().suites), 3)
+        self.assertEquals(len(self.parsed), 3)
+        self._parse()
+        self.assertEquals(self.parsed, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -18,6 +18,8 @@ import os
 import unittest
 from os.path import dirname, join
 import shutil
+import tempfile
+import xml.etree.cElementTree as ET
 
 from robot.utils.asserts import assert_raises_with_msg
 from robot.utils import normpath
@@ -238,7 +240,7 @@ class TestBackUp(_TestIO):
         self.io._make_backup()
         f.close()
         self.assertTrue(os.path.exists(backup))
-        self.assertTrue('NOT IN REAL XML' in self._read(backup))
+        self.assertEquals(self._read(backup), self._read(XML_DATASOURCE_ONLY))
 
     def test_backup_invalid_xml_backup_exists(self):
         io.SETTINGS["always_load_old_data_from_xml"] = True
@@ -252,6 +254,13 @@ class TestBackUp(_TestIO):
         self._test_creating_backup(INVALID_XML, False)
         self.assertFalse(os.path.exists(self._get_timestamp_backup(INVALID_XML)))
 
+    def test_backup_is_copied_if_output_is_not_replaced(self):
+        backup = self._get_backup(XML_DATASOURCE_ONLY)
+        self.io._make_backup()
+        self.io._copy_linked_backup()
+        self.assertFalse(os.path.samefile(backup, XML_DATASOURCE_ONLY))
+        self.assertEquals(self._read(backup), self._read(XML_DATASOURCE_ONLY))
+
     def _test_creating_backup(self, path, backup_exists):
         backup = self._get_backup(path)
         self.io._make_backup()
@@ -337,6 +346,22 @@ class TestSavingData(_TestIO):
         self.assertTrue(saved)
         self.assertFalse(changes)
 
+    def test_generation_time_is_stored_when_saving(self):
+        DATA_MODIFIED.modified()
+        self.io.save_data(None, None)
+        self.assertEquals(self.io.xml_generated,
+                          self.io._get_xml_generation_time())
+
+    def test_saved_statistics(self):
+        self.io.save_data(HTML_DATASOURCES_XML, None)
+        root = ET.ElementTree(file=HTML_DATASOURCES_XML).getroot()
+        stats = [(stat.text, stat.get('pass'), stat.get('fail'))
+                 for stat in root.find('statistics').getiterator('stat')]
+        suite = self.io.suite
+        expected = (suite.all_stats.passed, suite.all_stats.failed)
+        self.assertEquals(stats[1][1:], tuple(str(i) for i in expected))
+        self.assertEquals(stats[-1][0], suite.longname)
+
     def test_save_data_should_change_output(self):
         output = HTML_DATASOURCES_XML.replace('testcases2.xml', 'new.xml')
         try:
@@ -347,6 +372,60 @@ class TestSavingData(_TestIO):
             if os.path.exists(output):
                 os.remove(output)
 
+    def test_generation_time_is_read_from_header(self):
+        self.assertEquals(self.io._get_xml_generation_time(),
+                          ET.ElementTree(file=HTML_DATASOURCES_XML).getroot().get('generated'))
+
+    def test_unchanged_output_is_not_validated_again(self):
+        self.io._validated_output = self.io._get_signature(HTML_DATASOURCES_XML)
+        orig_validate, io.validate = io.validate, None
+        try:
+            self.io._validate_related_xml(HTML_DATASOURCES_XML)
+        finally:
+            io.validate = orig_validate
+
+    def test_changed_output_is_validated(self):
+        self.io._validated_output = self.io._get_signature(HTML_DATASOURCES_XML)
+        f = open(HTML_DATASOURCES_XML, 'a')
+        f.write('<invalid>')
+        f.close()
+        self.assertRaises(IOError, self.io._validate_related_xml,
+                          HTML_DATASOURCES_XML)
+
+    def test_results_saved_by_someone_else_are_merged(self):
+        io.SETTINGS["check_simultaneous_save"] = True
+        other = io.IO()
+        other.load_data(HTML_DATASOURCE_WITH_XML)
+        other.suite.tests[0].set_all('FAIL', 'Other')
+        other.save_data(None, None)
+        self.io.suite.tests[1].update_status_and_message('PASS', 'Mine')
+        saved, changes = self.io.save_data(None, None)
+        self.assertTrue(changes)
+        self.assertEquals([t.message for t in self.io.suite.tests],
+                          ['Other', 'Mine'])
+
+    def test_output_is_backed_up_once_per_save(self):
+        backups = []
+        orig_snapshot = self.io._snapshot
+        def snapshot(source, target):
+            backups.append(target)
+            orig_snapshot(source, target)
+        self.io._snapshot = snapshot
+        DATA_MODIFIED.modified()
+        self.io.save_data(None, None)
+        self.assertEquals(backups, [HTML_DATASOURCES_XML + '.bak'])
+        self.assertFalse(os.path.samefile(backups[0], HTML_DATASOURCES_XML))
+
+    def test_results_are_snapshotted_only_when_merging(self):
+        longname = self.io.suite.tests[0].longname
+        for check in False, True:
+            io.SETTINGS["check_simultaneous_save"] = check
+            self.io.load_data(HTML_DATASOURCE_WITH_XML)
+            self.assertEquals(self.io._base.get(longname) is not None, check)
+            self.io.suite.tests[0].set_message('Saved')
+            self.io.save_data(None, None)
+            self.assertEquals(self.io._base.get(longname) is not None, check)
+
     def test_saving_when_data_is_reloaded_from_xml(self):
         io.SETTINGS["check_simultaneous_save"] = True
         self.io.xml_generated = "changed"
@@ -355,5 +434,94 @@ class TestSavingData(_TestIO):
         self.assertTrue(saved)
 
 
+class TestIncrementalSave(TestSavingData):
+
+    def setUp(self):
+        io.SETTINGS["incremental_save"] = True
+        TestSavingData.setUp(self)
+        # Test data is written with an old Robot version, full save updates it
+        self.io._layout = None
+        DATA_MODIFIED.modified()
+        self.io.save_data(None, None)
+
+    def tearDown(self):
+        TestSavingData.tearDown(self)
+        io.SETTINGS["incremental_save"] = False
+
+    def test_layout_is_created_when_loading(self):
+        self.assertTrue(self.io._layout is not None)
+
+    def test_only_modified_tests_are_written(self):
+        test = self.io.suite.tests[0]
+        test.set_all('FAIL', 'Incremental')
+        self.assertEquals(self.io._get_modified_tests(), [test])
+        self.io.save_data(None, None)
+        self._output_should_match_full_save()
+
+    def test_saving_twice(self):
+        for index, status in enumerate(['FAIL', 'PASS']):
+            self.io.suite.tests[index].set_all(status, 'Changed')
+            self.io.save_data(None, None)
+            self._output_should_match_full_save()
+
+    def test_structural_changes_save_whole_output(self):
+        self.io.suite.is_modified = True
+        self.assertEquals(self.io._get_modified_tests(), None)
+
+    def _output_should_match_full_save(self):
+        incremental = self._read_without_timestamps()
+        io.SETTINGS["incremental_save"] = False
+        DATA_MODIFIED.modified()
+        self.io.save_data(None, None)
+        io.SETTINGS["incremental_save"] = True
+        self.assertEquals(incremental, self._read_without_timestamps())
+
+    def _read_without_timestamps(self):
+        root = ET.ElementTree(file=HTML_DATASOURCES_XML).getroot()
+        root.set('generated', '')
+        for elem in root.getiterator():
+            for name in 'starttime', 'endtime', 'timestamp':
+                if name in elem.attrib:
+                    elem.set(name, '')
+        return ET.tostring(root)
+
+
+class TestSavingOverOtherSuite(_TestIO):
+
+    def setUp(self):
+        _TestIO.setUp(self)
+        io.SETTINGS["always_load_old_data_from_xml"] = True
+        io.SETTINGS["check_simultaneous_save"] = True
+        self.tempdir = tempfile.mkdtemp()
+        self.output = join(self.tempdir, 'output.xml')
+        shutil.copy(join(DATA_FOLDER, 'suites.xml'), self.output)
+        self.io.load_data(self.output)
+        self.io.suite.suites[0].tests[0].set_all('PASS', 'Mine')
+        shutil.copy(join(DATA_FOLDER, 'testcases.xml'), self.output)
+        self.questions = []
+
+    def tearDown(self):
+        _TestIO.tearDown(self)
+        shutil.rmtree(self.tempdir)
+
+    def _ask(self, answer):
+        def ask(title, message):
+            self.questions.append(title)
+            return answer
+        return ask
+
+    def test_other_suite_is_not_overwritten_without_asking(self):
+        self.assertRaises(IOError, self.io.save_data, None, self._ask(False))
+        self.assertEquals(self.questions, [io.OTHER_SUITE_TITLE])
+        self.assertRaises(IOError, self.io.save_data, None, None)
+        self.assertEquals(io.robotapi.XmlTestSuite(self.output).name,
+                          'Testcases')
+
+    def test_other_suite_is_overwritten_when_confirmed(self):
+        self.assertEquals(self.io.save_data(None, self._ask(True)),
+                          (True, False))
+        self.assertEquals(io.robotapi.XmlTestSuite(self.output).name, 'Suites')
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,167 @@
+#  Copyright 2008 Nokia Siemens Networks Oyj
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from os.path import dirname, join
+
+from mabot.model import io
+from mabot.model.journal import Journal, get_journal_path
+from mabot.model.model import DATA_MODIFIED, JOURNAL
+
+SUITES = join(dirname(__file__), 'data', 'suites.xml')
+
+
+class TestJournal(unittest.TestCase):
+
+    def setUp(self):
+        io.SETTINGS['journal_changes'] = True
+        self.tempdir = tempfile.mkdtemp()
+        self.output = join(self.tempdir, 'output.xml')
+        self.journal = get_journal_path(self.output)
+        shutil.copy(SUITES, self.output)
+        self.io, self.suite = self._load()
+
+    def tearDown(self):
+        JOURNAL.close()
+        io.SETTINGS['journal_changes'] = False
+        io.SETTINGS['lazy_keyword_loading'] = False
+        DATA_MODIFIED.saved()
+        shutil.rmtree(self.tempdir)
+
+    def _load(self):
+        DATA_MODIFIED.saved()
+        reader = io.IO()
+        return reader, reader.load_data(self.output)
+
+    def _reload(self):
+        JOURNAL.flush()
+        return self._load()
+
+    def _test(self, suite, suite_index=0, test_index=0):
+        return suite.suites[suite_index].tests[test_index]
+
+    def test_changes_are_written_only_when_flushed(self):
+        self._test(self.suite).set_all('PASS', 'Journaled')
+        self.assertFalse(os.path.exists(self.journal))
+        JOURNAL.flush()
+        records = [json.loads(line) for line in open(self.journal)]
+        self.assertEquals(records[-1]['test'],
+                          self._test(self.suite).longname.split('.'))
+        self.assertEquals(records[-1]['message'], 'Journaled')
+
+    def test_changes_are_replayed_when_loading(self):
+        test = self._test(self.suite, 1, 1)
+        test.update_status_and_message('PASS', 'Journaled')
+        test.add_tags(['journaled'])
+        reader, suite = self._reload()
+        replayed = self._test(suite, 1, 1)
+        self.assertEquals(reader.journal_replayed, 1)
+        self.assertEquals((replayed.status, replayed.message, replayed.tags),
+                          (test.status, test.message, test.tags))
+        self.assertEquals(replayed.starttime, test.starttime)
+        self.assertTrue(replayed.is_modified)
+        self.assertTrue(DATA_MODIFIED.is_modified())
+        self.assertEquals(suite.all_stats.passed, self.suite.all_stats.passed)
+
+    def test_removed_tags_are_replayed(self):
+        test = self._test(self.suite, 1, 1)
+        test.remove_tags(['fail'])
+        test.add_tags(['journaled'])
+        self.assertEquals(self._test(self._reload()[1], 1, 1).tags,
+                          ['journaled'])
+
+    def test_keyword_changes_are_replayed(self):
+        test = self._test(self.suite, 0, 1)
+        test.keywords[0].update_status_and_message('FAIL', 'Keyword failed')
+        test.update_status_and_message('PASS', 'Passed anyway')
+        replayed = self._test(self._reload()[1], 0, 1)
+        self.assertEquals(replayed.keywords[0].message, 'Keyword failed')
+        self.assertEquals((replayed.status, replayed.message),
+                          ('PASS', 'Passed anyway'))
+
+    def test_keyword_changes_are_replayed_to_lazily_loaded_keywords(self):
+        io.SETTINGS['lazy_keyword_loading'] = True
+        self.test_keyword_changes_are_replayed()
+
+    def test_saving_removes_journal(self):
+        self._test(self.suite).set_all('PASS', 'Saved')
+        JOURNAL.flush()
+        self.io.save_data(None, None)
+        self.assertFalse(os.path.exists(self.journal))
+        self._test(self.suite).set_message('After save')
+        reader, suite = self._reload()
+        self.assertEquals(reader.journal_replayed, 1)
+        self.assertEquals(self._test(suite).message, 'After save')
+
+    def _journal_of_other_process(self, message):
+        other = Journal()
+        other.open(self.output + '.other.1.journal')
+        self.other_journal = other.path
+        test = self._test(self.suite)
+        test.set_message(message)
+        other.record(test)
+        other.flush()
+        # The change was made by the other process only.
+        JOURNAL.clear()
+        return other
+
+    def test_journals_of_running_processes_are_not_replayed(self):
+        other = self._journal_of_other_process('Not saved by other')
+        try:
+            reader, suite = self._reload()
+            self.assertEquals(reader.journal_replayed, 0)
+            self.assertNotEquals(self._test(suite).message, 'Not saved by other')
+            reader.save_data(None, None)
+            self.assertTrue(os.path.exists(self.other_journal))
+        finally:
+            other.close()
+
+    def test_journals_of_dead_processes_are_replayed_and_taken_over(self):
+        other = self._journal_of_other_process('Not saved by dead')
+        # Closing without clearing leaves the journal like a crash does.
+        other.close()
+        reader, suite = self._reload()
+        self.assertEquals(reader.journal_replayed, 1)
+        self.assertEquals(self._test(suite).message, 'Not saved by dead')
+        self.assertFalse(os.path.exists(self.other_journal))
+        records = [json.loads(line) for line in open(self.journal)]
+        self.assertEquals(records[-1]['message'], 'Not saved by dead')
+
+    def test_incomplete_and_unknown_records_are_ignored(self):
+        self._test(self.suite).set_message('Changed')
+        JOURNAL.flush()
+        journal = open(self.journal, 'ab')
+        journal.write(json.dumps({'test': ['Suites', 'Nonex'], 'keywords': [],
+                                  'status': 'PASS', 'message': '',
+                                  'modified': ''}) + '\n')
+        journal.write('{"test": ["Suites", "Su')
+        journal.close()
+        reader, suite = self._load()
+        self.assertEquals(reader.journal_replayed, 1)
+        self.assertEquals(self._test(suite).message, 'Changed')
+
+    def test_journal_is_not_used_when_disabled(self):
+        io.SETTINGS['journal_changes'] = False
+        reader, suite = self._load()
+        self._test(suite).set_message('Changed')
+        JOURNAL.flush()
+        self.assertFalse(os.path.exists(self.journal))
+
+
+if __name__ == "__main__":
+    unittest.main()
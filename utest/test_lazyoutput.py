@@ -0,0 +1,128 @@
+#  Copyright 2008 Nokia Siemens Networks Oyj
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+from os.path import dirname, join
+
+from mabot.model import io, model
+from mabot.model.merge import ResultSnapshot, TestState, iter_tests
+
+SUITES = join(dirname(__file__), 'data', 'suites.xml')
+TESTCASES = join(dirname(__file__), 'data', 'testcases.xml')
+
+
+class TestLazyKeywordLoading(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.eager = self._load(SUITES, lazy=False)
+        self.io, self.suite = self._load(SUITES, lazy=True)
+
+    def tearDown(self):
+        io.SETTINGS['lazy_keyword_loading'] = False
+        model.DATA_MODIFIED.status = False
+        shutil.rmtree(self.tempdir)
+
+    def _load(self, source, lazy):
+        io.SETTINGS['lazy_keyword_loading'] = lazy
+        path = join(self.tempdir, '%s-%s' % (lazy, os.path.basename(source)))
+        shutil.copy(source, path)
+        reader = io.IO()
+        return reader, reader.load_data(path)
+
+    def _tests(self, suite):
+        return list(iter_tests(suite))
+
+    def test_suites_and_tests_are_loaded(self):
+        eager = self.eager[1]
+        self.assertEquals(self.suite.longname, eager.longname)
+        self.assertEquals(self.suite.metadata.items(), eager.metadata.items())
+        for test, eager_test in zip(self._tests(self.suite), self._tests(eager)):
+            for attr in ('longname', 'status', 'message', 'tags', 'doc',
+                         'starttime', 'endtime', 'critical', 'timeout'):
+                self.assertEquals(getattr(test, attr), getattr(eager_test, attr))
+        self.assertEquals(self.suite.all_stats.failed, eager.all_stats.failed)
+
+    def test_keywords_are_parsed_only_when_needed(self):
+        test = self.suite.suites[0].tests[1]
+        self.assertTrue(test.get_lazy_keywords() is not None)
+        self.assertTrue(test.has_visible_children())
+        eager_test = self.eager[1].suites[0].tests[1]
+        self.assertEquals([(kw.name, kw.status, kw.message) for kw in test.keywords],
+                          [(kw.name, kw.status, kw.message)
+                           for kw in eager_test.keywords])
+        self.assertEquals(test.keywords[0].parent, test)
+        self.assertTrue(test.get_lazy_keywords() is None)
+
+    def test_execution_status_is_known_without_parsing(self):
+        for test in self._tests(self.suite):
+            test.message = io.SETTINGS['default_message']
+        for test in self._tests(self.eager[1]):
+            test.message = io.SETTINGS['default_message']
+        self.assertEquals([t.get_execution_status() for t in self._tests(self.suite)],
+                          [t.get_execution_status() for t in self._tests(self.eager[1])])
+        for test in self._tests(self.suite):
+            self.assertTrue(test.get_lazy_keywords() is not None)
+
+    def test_snapshot_does_not_parse_keywords(self):
+        test = self.suite.suites[0].tests[1]
+        state = ResultSnapshot(self.suite).get(test.longname)
+        self.assertTrue(test.get_lazy_keywords() is not None)
+        self.assertEquals(state, TestState(test))
+        self.assertEquals(state.structure, TestState(test).structure)
+        self.assertTrue(test.get_lazy_keywords() is not None)
+
+    def test_untouched_keywords_are_written_verbatim(self):
+        test = self.suite.suites[0].tests[1]
+        keywords = test.get_lazy_keywords().read()
+        test.set_message('Changed')
+        self.io.save_data(None, None)
+        self.assertTrue(keywords in open(self.io.output, 'rb').read())
+        saved = io.IO().load_data(self.io.output)
+        self.assertEquals(saved.suites[0].tests[1].message, 'Changed')
+        self.assertEquals(len(saved.suites[0].tests[1].keywords),
+                          len(self.eager[1].suites[0].tests[1].keywords))
+
+    def test_edited_keywords_are_saved(self):
+        self.suite.suites[0].tests[1].keywords[0].update_status_and_message(
+            'FAIL', 'Edited')
+        self.io.save_data(None, None)
+        io.SETTINGS['lazy_keyword_loading'] = False
+        saved = io.IO().load_data(self.io.output)
+        self.assertEquals(saved.suites[0].tests[1].keywords[0].message, 'Edited')
+
+    def test_results_are_same_as_after_loading_all_keywords(self):
+        eager_io, eager = self.eager
+        for suite, reader in [(self.suite, self.io), (eager, eager_io)]:
+            suite.suites[1].tests[2].set_all('PASS', 'Checked')
+            reader.save_data(None, None)
+        io.SETTINGS['lazy_keyword_loading'] = False
+        saved, eager_saved = [io.IO().load_data(reader.output)
+                              for reader in (self.io, eager_io)]
+        self.assertEquals([(t.longname, t.status, t.message, len(t.keywords))
+                           for t in self._tests(saved)],
+                          [(t.longname, t.status, t.message, len(t.keywords))
+                           for t in self._tests(eager_saved)])
+
+    def test_lazy_loading_is_not_used_with_test_data(self):
+        io.SETTINGS['lazy_keyword_loading'] = True
+        suite = io.IO().load_data(TESTCASES.replace('.xml', '.html'))
+        self.assertTrue(self._tests(suite)[0].get_lazy_keywords() is None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+#  Copyright 2008 Nokia Siemens Networks Oyj
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+from copy import deepcopy
+from os.path import dirname, join, normcase
+
+import unittest
+
+from mabot.model.io import IO
+from mabot.model import model
+from mabot.model.merge import ResultSnapshot, ThreeWayMerge
+
+SAVED = '20100101 12:00:00.000'
+
+
+class TestThreeWayMerge(unittest.TestCase):
+
+    def setUp(self):
+        data = normcase(join(dirname(__file__), 'data', 'root_suite'))
+        self.suite = IO().load_data(data)
+        self.other_suite = deepcopy(self.suite)
+        self.merge = ThreeWayMerge(ResultSnapshot(self.suite))
+
+    def tearDown(self):
+        model.DATA_MODIFIED.status = False
+
+    def test_changes_only_in_other_are_taken(self):
+        self._change_other(2, 0, 'PASS', 'Other')
+        result = self.merge.merge(self.suite, self.other_suite)
+        test = self.suite.suites[2].tests[0]
+        self.assertEquals((test.status, test.message), ('PASS', 'Other'))
+        self.assertEquals(result.updated, [test])
+        self.assertEquals(result.conflicts, [])
+        self.assertFalse(test.is_modified)
+        self.assertEquals(self.suite.all_stats.passed, 1)
+
+    def test_own_changes_are_kept(self):
+        self.suite.suites[2].tests[0].set_all('PASS', 'Mine')
+        result = self.merge.merge(self.suite, self.other_suite)
+        test = self.suite.suites[2].tests[0]
+        self.assertEquals((test.status, test.message), ('PASS', 'Mine'))
+        self.assertEquals(result.updated + result.merged, [])
+
+    def test_changes_in_different_tests_are_merged(self):
+        self.suite.suites[2].tests[0].set_all('PASS', 'Mine')
+        self._change_other(2, 1, 'PASS', 'Other')
+        self.merge.merge(self.suite, self.other_suite)
+        self.assertEquals([t.message for t in self.suite.suites[2].tests],
+                          ['Mine', 'Other', self.suite.suites[2].tests[2].message])
+        self.assertEquals(self.suite.all_stats.passed, 2)
+
+    def test_different_fields_of_same_test_are_merged(self):
+        self.suite.suites[0].tests[0].set_message('Mine')
+        other_test = self.other_suite.suites[0].tests[0]
+        other_test.remove_tags(['tag-1'])
+        other_test.add_tags(['new'])
+        other_test.endtime = SAVED
+        result = self.merge.merge(self.suite, self.other_suite)
+        test = self.suite.suites[0].tests[0]
+        self.assertEquals(test.message, 'Mine')
+        self.assertEquals(test.tags, ['new', 'tag-2', 'tag-3'])
+        self.assertEquals(result.merged, [test])
+        self.assertEquals(result.conflicts, [])
+
+    def test_keywords_changed_on_different_sides_are_merged(self):
+        self.suite.suites[1].tests[0].keywords[0].set_all('PASS', 'Mine')
+        other_test = self.other_suite.suites[1].tests[0]
+        other_test.keywords[1].set_all('PASS', 'Other')
+        other_test.endtime = SAVED
+        result = self.merge.merge(self.suite, self.other_suite)
+        keywords = self.suite.suites[1].tests[0].keywords
+        self.assertEquals([kw.message for kw in keywords[:2]], ['Mine', 'Other'])
+        self.assertEquals(result.conflicts, [])
+
+    def test_conflicts_are_batched(self):
+        for index in range(3):
+            self.suite.suites[2].tests[index].set_all('PASS', 'Mine')
+            self._change_other(2, index, 'FAIL', 'Other')
+        result = self.merge.merge(self.suite, self.other_suite)
+        self.assertEquals(len(result.merged), 3)
+        title, message = result.get_conflict_message()
+        self.assertTrue('6 conflicting changes' in message)
+        self.assertTrue("Root Suite.Sub Suite3.TC3: message 'Mine' vs. 'Other'"
+                        in message)
+
+    def test_keeping_own_values_in_conflicts(self):
+        self.suite.suites[2].tests[0].set_all('PASS', 'Mine')
+        self._change_other(2, 0, 'FAIL', 'Other')
+        result = self.merge.merge(self.suite, self.other_suite)
+        result.resolve(use_theirs=False)
+        test = self.suite.suites[2].tests[0]
+        self.assertEquals((test.status, test.message), ('PASS', 'Mine'))
+        self.assertEquals(result.conflicts, [])
+
+    def test_using_other_values_in_conflicts(self):
+        self.suite.suites[2].tests[0].set_all('PASS', 'Mine')
+        self._change_other(2, 0, 'FAIL', 'Other')
+        result = self.merge.merge(self.suite, self.other_suite)
+        result.resolve(use_theirs=True)
+        test = self.suite.suites[2].tests[0]
+        # Status was changed only in the model
+        self.assertEquals((test.status, test.message), ('PASS', 'Other'))
+        self.assertEquals(test.keywords[0].message, 'Other')
+        self.assertEquals(self.suite.all_stats.passed, 1)
+
+    def test_tests_with_unchanged_end_time_are_skipped(self):
+        self.other_suite.suites[2].tests[0].set_all('PASS', 'Other')
+        self.merge.merge(self.suite, self.other_suite)
+        self.assertEquals(self.suite.suites[2].tests[0].status, 'FAIL')
+
+    def test_new_tests_in_other_are_added(self):
+        other_test = deepcopy(self.other_suite.suites[2].tests[0])
+        other_test.name = other_test.longname = 'New'
+        other_test.set_all('PASS')
+        self.other_suite.suites[2].tests.append(other_test)
+        result = self.merge.merge(self.suite, self.other_suite)
+        suite = self.suite.suites[2]
+        self.assertEquals(suite.get_test('New').parent, suite)
+        self.assertEquals(result.added, [suite.get_test('New')])
+        self.assertEquals(self.suite.all_stats.passed, 1)
+
+    def _change_other(self, suite_index, test_index, status, message):
+        test = self.other_suite.suites[suite_index].tests[test_index]
+        test.set_all(status, message)
+        test.endtime = SAVED
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -13,11 +13,14 @@
 
 from copy import deepcopy
 from os.path import dirname, join, normcase
+import os
+import tempfile
 
 import unittest
 
 from mabot.model.io import IO
 from mabot.model import model
+from mabot.model.merge import ResultSnapshot
 from mabot.model.model import ManualMessage
 
 
@@ -86,6 +89,37 @@ class TestAddDataFromOtherItem(_TestAddingData):
                           "Should be added at the end, because there is no order.")
         self.assertEquals(model.DATA_MODIFIED.is_modified(), False)
 
+    def test_added_test_is_indexed_and_in_statistics_of_parents(self):
+        tag_index = self.suite.get_tag_index()
+        search_index = self.suite.get_search_index()
+        passed = self.suite.all_stats.passed
+        test = deepcopy(self.other_suite.suites[0].tests[0])
+        test.name = 'Added Test'
+        test.longname = self.suite.suites[0].longname + '.Added Test'
+        test.tags = ['added']
+        test.status = 'PASS'
+        self.other_suite.suites[0].tests.append(test)
+        self.suite.suites[0].add_results(self.other_suite.suites[0],
+                                         add_from_xml=True)
+        self.assertTrue(self.suite.get_tag_index() is not tag_index)
+        self.assertEquals(list(self.suite.get_tag_index().select(['added'], [])),
+                          [test])
+        self.assertTrue(self.suite.get_search_index() is not search_index)
+        self.assertEquals(self.suite.get_search_index().find('added test'),
+                          [test])
+        self.assertEquals(self.suite.all_stats.passed, passed + 1)
+
+    def test_tests_of_added_suite_update_indexes_of_new_root(self):
+        suite = deepcopy(self.other_suite.suites[0])
+        suite.name = 'Added Suite'
+        suite.tests[0].set_message('Message in other suite')
+        self.other_suite.suites.append(suite)
+        self.suite.add_results(self.other_suite, add_from_xml=True)
+        search_index = self.suite.get_search_index()
+        suite.tests[0].set_message('Unique added message')
+        self.assertEquals(search_index.find('unique added message'),
+                          [suite.tests[0]])
+
     def test_adding_suites_tests_with_removed_test_in_beginning(self):
         self._test_removed_test(0, False)
 
@@ -275,9 +309,9 @@ class TestAddDataFromOtherItem(_TestAddingData):
 class TestSavingWhenChangesInKeywords(_TestAddingData):
 
     def setUp(self):
-        self._orig_dialog = model.tkMessageBox
+        self._orig_dialog = model.show_warning
         self.dialog = MockDialog()
-        model.tkMessageBox = self.dialog.call
+        model.show_warning = self.dialog.call
         _TestAddingData.setUp(self)
         self.other_test.keywords.pop(1)
         self.other_test.endtime = '20080101 10:10:10.000'
@@ -285,7 +319,7 @@ class TestSavingWhenChangesInKeywords(_TestAddingData):
         self.test.message = 'Hello'
 
     def tearDown(self):
-        model.tkMessageBox = self._orig_dialog
+        model.show_warning = self._orig_dialog
 
     def test_changes_in_kws_and_saving_data_when_own_kws_uptodate_and_others_old(self):
         self.test.add_results(self.other_test, True, self.dialog.call)
@@ -491,6 +525,141 @@ class TestGettingTags(unittest.TestCase):
         tags = self.suite.get_all_visible_tags()
         self.assertEquals(['tag-1', 'tag-2', 'tag-3'], tags)
 
+class TestTagIndex(unittest.TestCase):
+
+    def setUp(self):
+        data = normcase(join(dirname(__file__), 'data', 'root_suite'))
+        self.suite = IO().load_data(data)
+        self.tests = [test for suite in self.suite.suites for test in suite.tests]
+
+    def test_selection_matches_is_included(self):
+        index = self.suite.get_tag_index()
+        for pattern in ['tag-1', 'TAG_1', 'tag-?', 'tag*&*3', 'tag-1NOTtag-3',
+                        'NOT', 'tag-1ANDnone', 'nonex*', '*']:
+            inc, exc = model.get_includes_and_excludes_from_pattern(pattern)
+            expected = set(test for test in self.tests
+                           if test.is_included(inc, exc))
+            self.assertEquals(index.select(inc, exc), expected, pattern)
+
+    def test_index_is_updated_when_tags_change(self):
+        index = self.suite.get_tag_index()
+        test = self.suite.suites[1].tests[0]
+        test.add_tags(['new'])
+        self.assertEquals(index.select(['new'], []), set([test]))
+        test.remove_tags(['new'])
+        self.assertEquals(index.select(['new'], []), set())
+        test.set_tags(['other'])
+        self.assertEquals(index.select(['other'], []), set([test]))
+
+    def test_tag_is_kept_when_tag_with_same_normalized_name_remains(self):
+        index = self.suite.get_tag_index()
+        test = self.suite.suites[0].tests[0]
+        test.add_tags(['Tag 1'])
+        test.remove_tags(['tag-1', 'Tag 1'])
+        test.add_tags(['tag_x', 'TagX'])
+        test.remove_tags(['TagX'])
+        self.assertEquals(index.select(['tagx'], []), set([test]))
+
+    def test_changing_visibility(self):
+        self.suite.change_visibility(['tag-1'], [], model.ALL_TAGS_VISIBLE)
+        self.assertEquals([t for t in self.tests if t.visible],
+                          [self.suite.suites[0].tests[0]])
+        self.assertEquals([s.visible for s in self.suite.suites],
+                          [True, False, False])
+        self.assertTrue(self.suite.visible)
+        self.suite.change_visibility([], [], model.ALL_TAGS_VISIBLE)
+        self.assertTrue(all(t.visible for t in self.tests))
+
+
+class TestTagCatalogue(unittest.TestCase):
+
+    def setUp(self):
+        data = normcase(join(dirname(__file__), 'data', 'root_suite'))
+        self.suite = IO().load_data(data)
+        self.catalogue = self.suite.get_tag_catalogue()
+        self.test = self.suite.suites[0].tests[0]
+
+    def test_counts_after_loading(self):
+        self.assertEquals(self.catalogue.get_visible_tags(),
+                          ['tag-1', 'tag-2', 'tag-3'])
+        self._counts_should_be('tag-1', 0, 1)
+
+    def test_counts_are_updated_when_status_changes(self):
+        self.test.update_status_and_message('PASS', '')
+        self._counts_should_be('tag-2', 1, 0)
+        self.suite.set_all('FAIL', 'Failed')
+        self._counts_should_be('tag-2', 0, 1)
+
+    def test_counts_are_updated_when_tags_change(self):
+        self.test.add_tags(['new'])
+        self.suite.suites[1].tests[0].add_tags(['new'])
+        self._counts_should_be('new', 0, 2)
+        self.test.remove_tags(['tag-1'])
+        self.assertEquals(self.catalogue.get('tag-1'), None)
+        self.test.set_tags(['other'])
+        self.assertEquals(self.catalogue.get_visible_tags(), ['new', 'other'])
+
+    def test_counts_are_updated_when_visibility_changes(self):
+        self.suite.change_visibility(['nonex'], [], model.ALL_TAGS_VISIBLE)
+        self.assertEquals(self.catalogue.get_visible_tags(), [])
+        self.assertEquals(self.catalogue.get('tag-1').total, 1)
+        self.suite.change_visibility([], [], model.ALL_TAGS_VISIBLE)
+        self._counts_should_be('tag-1', 0, 1)
+
+    def _counts_should_be(self, tag, passed, failed):
+        stat = self.catalogue.get(tag)
+        self.assertEquals((stat.passed, stat.failed), (passed, failed))
+
+
+class TestKeywordTemplates(unittest.TestCase):
+    _data = """*** Test Cases ***
+Test 1
+    Outer
+Test 2
+    Outer
+
+*** Keywords ***
+Outer
+    Inner
+    Inner
+Inner
+    No Operation
+"""
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.txt')
+        os.write(handle, self._data)
+        os.close(handle)
+        self.suite = IO().load_data(self.path)
+        self.calls = [test.keywords[0] for test in self.suite.tests]
+
+    def tearDown(self):
+        os.remove(self.path)
+        model.DATA_MODIFIED.status = False
+
+    def test_templates_are_shared_between_calls(self):
+        first, second = self.calls
+        self.assertTrue(first._templates is second._templates)
+        self.assertEquals(first._keywords, None)
+
+    def test_keywords_are_copied_when_needed(self):
+        first, second = self.calls
+        inner = first.keywords[1]
+        self.assertEquals(inner.parent, first)
+        self.assertEquals([kw.name for kw in inner.keywords], ['No Operation'])
+        inner.keywords[0].update_status_and_message('PASS', 'Done')
+        self.assertEquals(inner.status, 'PASS')
+        self.assertEquals(second._keywords, None)
+        self.assertEquals(second.keywords[1].keywords[0].message, '')
+
+    def test_reading_results_does_not_copy_templates(self):
+        self.suite.get_execution_status()
+        self.suite._save(model.EMPTY_TIME)
+        ResultSnapshot(self.suite)
+        self.assertEquals([kw._keywords for kw in self.calls], [None, None])
+        self.assertEquals(self.calls[0].get_execution_status(), 'NOT_EXECUTED')
+
+
 class TestAbstractManualModel(_TestAddingData):
 
     def test_get_valid_time_with_robots_old_default_time(self):
@@ -519,6 +688,48 @@ new line which will have more information about everything
 new paragraph'''
         self.assertEqual(self.suite.suites[0].tests[0].doc, expected)
 
+    def test_timestamps_are_stored_as_integers(self):
+        self.test.starttime = '20111111 11:11:11.111'
+        self.assertEquals(self.test._starttime, 20111111111111111)
+        self.assertEquals(self.test.starttime, '20111111 11:11:11.111')
+
+    def test_invalid_timestamps_are_stored_as_such(self):
+        for value in ['N/A', None, '20111111 11:11:11.xxx']:
+            self.test.endtime = value
+            self.assertEquals(self.test.endtime, value)
+
+    def test_keywords_do_not_have_instance_dictionaries(self):
+        kw = self.test.keywords[0]
+        self.assertFalse(hasattr(kw, '__dict__'))
+        self.assertEquals(kw.starttime, model.EMPTY_TIME)
+        self.assertTrue(kw.type is intern('kw'))
+
+class TestItemIndex(_TestAddingData):
+
+    def test_getting_test_by_name(self):
+        suite = self.suite.suites[1]
+        self.assertEquals(suite.get_test('TC With Keywords'), suite.tests[0])
+        self.assertEquals(suite.get_test('tc_with_keywords'), suite.tests[0])
+        self.assertEquals(suite.get_test('Non Existing'), None)
+
+    def test_getting_test_by_other_test(self):
+        self.assertEquals(self.suite.suites[1].get_test(self.other_test),
+                          self.test)
+
+    def test_index_is_updated_when_tests_are_added_from_xml(self):
+        test = deepcopy(self.other_suite.suites[0].tests[0])
+        test.name = 'Added Test'
+        self.other_suite.suites[0].tests.append(test)
+        self.suite.add_results(self.other_suite, add_from_xml=True)
+        added = self.suite.suites[0].get_test('added test')
+        self.assertEquals(added.name, 'Added Test')
+        self.assertEquals(added.parent, self.suite.suites[0])
+
+    def test_normalized_name_follows_name_changes(self):
+        self.test.name = 'New Name'
+        self.assertEquals(self.test.normalized_name, 'newname')
+
+
 class TestManualMessage(unittest.TestCase):
 
     def test_manual_message_default_timestamp(self):
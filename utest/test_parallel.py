@@ -0,0 +1,139 @@
+#  Copyright 2008 Nokia Siemens Networks Oyj
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+from os.path import dirname, join
+
+from mabot import utils
+from mabot.utils import robotapi
+from mabot.utils.parallel import parse_test_data, MIN_FILES
+from mabot.utils.progress import Progress
+
+ROOT_SUITE = join(dirname(__file__), 'data', 'root_suite')
+
+
+class _MessageCollector(object):
+
+    def __init__(self):
+        self.messages = []
+        self.levels = []
+
+    def message(self, msg):
+        self.messages.append(msg.message)
+        self.levels.append(msg.level)
+
+
+class TestParallelParsing(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.data = join(self.tempdir, 'data')
+        os.mkdir(self.data)
+        for index in range(MIN_FILES):
+            shutil.copy(join(ROOT_SUITE, 'sub_suite%d.html' % (index % 3 + 1)),
+                        join(self.data, 'suite_%d.html' % index))
+        shutil.copytree(ROOT_SUITE, join(self.data, 'root_suite'))
+        self.settings = robotapi.RobotSettings()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def _parse_sequentially(self):
+        return robotapi.TestSuite([self.data], self.settings)
+
+    def _parse_in_parallel(self):
+        return parse_test_data(self.data, self.settings, processes=2)
+
+    def _flatten(self, suite):
+        items = [(suite.longname, suite.source, suite.doc)]
+        for test in suite.tests:
+            items.append((test.longname, list(test.tags),
+                          [kw.name for kw in test.keywords]))
+        for child in suite.suites:
+            items.extend(self._flatten(child))
+        return items
+
+    def _parse_with_messages(self, parse):
+        collector = _MessageCollector()
+        robotapi.LOGGER.register_logger(collector)
+        # Messages logged earlier are relayed when registering.
+        collector.messages = []
+        collector.levels = []
+        try:
+            parse()
+        finally:
+            robotapi.LOGGER.unregister_logger(collector)
+        return collector
+
+    def _get_parsing_messages(self, parse):
+        return [msg for msg in self._parse_with_messages(parse).messages
+                if msg.startswith('Parsing')]
+
+    def _get_errors_and_warnings(self, parse):
+        collector = self._parse_with_messages(parse)
+        return [(level, msg) for level, msg
+                in zip(collector.levels, collector.messages)
+                if level in ('ERROR', 'WARN')]
+
+    def _write_invalid_file(self, *path):
+        invalid = open(join(self.data, *path), 'w')
+        invalid.write('<table><tr><th>Invalid Table</th></tr></table>')
+        invalid.close()
+
+    def test_parsed_suite_is_same_as_parsed_sequentially(self):
+        self.assertEquals(self._flatten(self._parse_in_parallel()),
+                          self._flatten(self._parse_sequentially()))
+
+    def test_messages_are_relayed_in_order(self):
+        self._write_invalid_file('suite_1.html')
+        self.assertEquals(self._get_parsing_messages(self._parse_in_parallel),
+                          self._get_parsing_messages(self._parse_sequentially))
+
+    def test_invalid_files_are_reported_like_by_robot(self):
+        self._write_invalid_file('suite_1.html')
+        self._write_invalid_file('root_suite', 'sub_suite2.html')
+        self.settings['WarnOnSkipped'] = True
+        errors = self._get_errors_and_warnings(self._parse_in_parallel)
+        self.assertEquals(errors,
+                          self._get_errors_and_warnings(self._parse_sequentially))
+        self.assertEquals(len(errors), 1)
+        self.assertTrue('suite_1.html' in errors[0][1])
+
+    def test_parsed_files_are_reported_to_progress(self):
+        progress = Progress()
+        progress.start('Parsing test data', unit='files')
+        parsing = utils.ParsingProgress(progress)
+        parsing.register()
+        try:
+            self._parse_in_parallel()
+        finally:
+            parsing.unregister()
+        self.assertEquals(progress.state[1], MIN_FILES + 3)
+
+    def test_small_directories_are_parsed_in_this_process(self):
+        suite = parse_test_data(ROOT_SUITE, self.settings, processes=2)
+        self.assertEquals(len(suite.suites), 3)
+
+    def test_directory_without_tests_fails(self):
+        empty = join(self.tempdir, 'empty')
+        os.mkdir(empty)
+        self.assertRaises(robotapi.DataError, parse_test_data, empty,
+                          self.settings, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+#  Copyright 2008 Nokia Siemens Networks Oyj
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from os.path import dirname, join
+
+from mabot.model import io
+from mabot.model.model import DATA_MODIFIED
+from mabot.utils.progress import (BackgroundTask, Cancelled, Progress,
+                                  tasks_running)
+
+DATA = join(dirname(__file__), 'data')
+SUITES = join(DATA, 'suites.xml')
+TESTCASES = join(DATA, 'testcases.html')
+
+
+class RecordingProgress(Progress):
+    """Records started phases and cancels after given amount of phases."""
+
+    def __init__(self, cancel_at=None):
+        Progress.__init__(self)
+        self.phases = []
+        self._cancel_at = cancel_at
+
+    def start(self, message, total=None, unit=''):
+        if len(self.phases) == self._cancel_at:
+            self.cancel()
+        Progress.start(self, message, total, unit)
+        self.phases.append((message, unit))
+
+
+class TestProgress(unittest.TestCase):
+
+    def test_phases(self):
+        progress = Progress()
+        progress.start('Reading', 10, 'bytes')
+        progress.advance(4)
+        progress.advance()
+        self.assertEquals(progress.state, ('Reading', 5, 10, 'bytes'))
+        progress.start('Building')
+        self.assertEquals(progress.state, ('Building', 0, None, ''))
+
+    def test_cancelling_interrupts_when_progress_is_next_reported(self):
+        progress = Progress()
+        progress.start('Reading')
+        progress.cancel()
+        self.assertRaises(Cancelled, progress.advance)
+        self.assertRaises(Cancelled, progress.start, 'Writing')
+
+
+class TestBackgroundTask(unittest.TestCase):
+
+    def _wait(self, task, ask_method=None):
+        while not task.poll(ask_method):
+            time.sleep(0.01)
+        return task.get_result()
+
+    def test_result(self):
+        task = BackgroundTask(lambda a, b, progress: (a, b, progress), 1, 2)
+        self.assertEquals(self._wait(task.start()), (1, 2, task.progress))
+
+    def test_error_is_raised_in_calling_thread(self):
+        def fail(progress):
+            raise ValueError('Failed in task')
+        task = BackgroundTask(fail).start()
+        self.assertRaises(ValueError, self._wait, task)
+
+    def test_questions_are_answered_when_polling(self):
+        questions = []
+        def ask(title, message):
+            questions.append((title, message))
+            return True
+        def function(progress):
+            return task.ask('Title', 'Message?')
+        task = BackgroundTask(function)
+        self.assertTrue(self._wait(task.start(), ask))
+        self.assertEquals(questions, [('Title', 'Message?')])
+
+    def test_tasks_running(self):
+        release = threading.Event()
+        task = BackgroundTask(lambda progress: release.wait()).start()
+        try:
+            self.assertTrue(tasks_running())
+        finally:
+            release.set()
+        self._wait(task)
+        self.assertFalse(tasks_running())
+
+
+class TestLoadingAndSavingWithProgress(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.output = join(self.tempdir, 'output.xml')
+        shutil.copy(SUITES, self.output)
+        self._orig_always_load = io.SETTINGS['always_load_old_data_from_xml']
+        io.SETTINGS['always_load_old_data_from_xml'] = True
+
+    def tearDown(self):
+        io.SETTINGS['always_load_old_data_from_xml'] = self._orig_always_load
+        DATA_MODIFIED.saved()
+        shutil.rmtree(self.tempdir)
+
+    def test_loading_output_reports_read_bytes_and_built_tests(self):
+        progress = RecordingProgress()
+        suite = io.IO().load_data(self.output, progress)
+        self.assertEquals(progress.phases, [("Reading 'output.xml'", 'bytes'),
+                                            ('Building model', 'tests')])
+        self.assertEquals(progress.state[1], io._count_tests(suite))
+
+    def test_loading_test_data_reports_parsed_files(self):
+        progress = RecordingProgress()
+        io.IO().load_data(TESTCASES, progress)
+        self.assertEquals(progress.phases, [("Reading 'testcases.xml'", 'bytes'),
+                                            ('Building model', 'tests'),
+                                            ('Parsing test data', 'files'),
+                                            ('Building model', 'tests'),
+                                            ('Combining results', '')])
+
+    def test_cancelling_loading(self):
+        for cancel_at in range(5):
+            self.assertRaises(Cancelled, io.IO().load_data, TESTCASES,
+                              RecordingProgress(cancel_at))
+
+    def test_cancelled_save_leaves_output_untouched(self):
+        writer = io.IO()
+        writer.load_data(self.output)
+        original = open(self.output, 'rb').read()
+        writer.suite.suites[0].tests[0].set_all('PASS', 'Cancelled')
+        self.assertRaises(Cancelled, writer.save_data, None, None,
+                          RecordingProgress(cancel_at=0))
+        self.assertEquals(open(self.output, 'rb').read(), original)
+        self.assertFalse(os.path.exists(writer._temp_path))
+        self.assertTrue(DATA_MODIFIED.is_modified())
+        self.assertEquals(writer.save_data(None, None), (True, False))
+        saved = io.IO().load_data(self.output)
+        self.assertEquals(saved.suites[0].tests[0].message, 'Cancelled')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+#  Copyright 2008 Nokia Siemens Networks Oyj
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import unittest
+from os.path import dirname, join
+
+from mabot.model import search
+from mabot.model.io import IO
+from mabot.model.model import DATA_MODIFIED
+
+SUITES = join(dirname(__file__), 'data', 'suites.xml')
+
+
+class TestSearchIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.suite = IO().load_data(SUITES)
+        self.index = self.suite.get_search_index()
+
+    def tearDown(self):
+        DATA_MODIFIED.saved()
+
+    def _find(self, query, limit=100):
+        return [item.longname for item in self.index.find(query, limit)]
+
+    def test_substring_of_longname(self):
+        self.assertEquals(self._find('cases 2'),
+                          ['Suites.Testcases 2', 'Suites.Testcases 2.Passing',
+                           'Suites.Testcases 2.Failing',
+                           'Suites.Testcases 2.One More'])
+
+    def test_case_spaces_and_underscores_are_ignored(self):
+        self.assertEquals(self._find('ONE_more'), self._find('onemore'))
+        self.assertEquals(self._find('onemore'), ['Suites.Testcases 2.One More'])
+
+    def test_tags_and_messages_are_searched(self):
+        self.assertEquals(self._find('failure'), ['Suites.Testcases.Failing',
+                                                  'Suites.Testcases 2.Failing'])
+        self.assertEquals(self._find('pass'), ['Suites.Testcases.Passing',
+                                               'Suites.Testcases 2.Passing'])
+
+    def test_prefix_query(self):
+        self.assertEquals(self._find('first*'), ['Suites.Tsv Testcases.First One'])
+        self.assertEquals(self._find('tsv*'), ['Suites.Tsv Testcases'])
+        self.assertEquals(self._find('one*'), ['Suites.Testcases 2.One More'])
+        self.assertEquals(self._find('more*'), [])
+        self.assertEquals(self._find('suites.tsv*'),
+                          ['Suites.Tsv Testcases',
+                           'Suites.Tsv Testcases.First One'])
+
+    def test_limit(self):
+        self.assertEquals(self._find('suites', 3),
+                          ['Suites', 'Suites.Testcases',
+                           'Suites.Testcases.Passing'])
+        self.assertEquals(self._find('', 3), [])
+
+    def test_changed_message_is_found(self):
+        test = self.suite.suites[2].tests[0]
+        test.update_status_and_message('FAIL', 'Crashed badly')
+        self.assertEquals(self._find('crashed'),
+                          ['Suites.Tsv Testcases.First One'])
+        test.update_status_and_message('PASS', '')
+        self.assertEquals(self._find('crashed'), [])
+
+    def test_changed_tags_are_found(self):
+        test = self.suite.suites[1].tests[2]
+        test.add_tags(['smoke'])
+        self.assertEquals(self._find('smoke*'), ['Suites.Testcases 2.One More'])
+        test.remove_tags(['smoke'])
+        self.assertEquals(self._find('smoke'), [])
+
+    def test_index_is_rebuilt_after_many_changes(self):
+        orig_limit = search.REBUILD_LIMIT
+        search.REBUILD_LIMIT = 1
+        try:
+            for test in self.suite.suites[1].tests:
+                test.update_status_and_message('FAIL', 'Rebuilt')
+            self.assertEquals(len(self._find('rebuilt')), 3)
+            self.assertEquals(self.index._changed, {})
+        finally:
+            search.REBUILD_LIMIT = orig_limit
+
+    def test_index_is_reset_when_items_are_added(self):
+        other = IO().load_data(SUITES)
+        self.suite.add_child(other.suites[2])
+        self.assertNotEquals(self.suite.get_search_index(), self.index)
+        self.assertEquals(len(self.suite.get_search_index().find('first one')), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -17,10 +17,13 @@ import os.path
 import unittest
 
 from mabot.model import io
-from mabot.model.model import DATA_MODIFIED
+from mabot.model.model import DATA_MODIFIED, TRANSACTION
+from mabot.settings import SETTINGS
+from mabot.utils import robotapi
 
 
 DATA = os.path.join(os.path.dirname(__file__), 'data', 'testcases.xml')
+SUITES = os.path.join(os.path.dirname(__file__), 'data', 'suites.xml')
 SAVED_XML = DATA.replace('testcases.xml', 'utest.xml')
 
 
@@ -138,6 +141,75 @@ class TestSettingStatusAndMessage(unittest.TestCase):
         self.suite.tests[1].update_status_and_message('FAIL', 'Failure')
         self.assertEqual(self.suite.status, 'FAIL')
 
+    def test_suite_statistics_are_updated_when_test_statuses_are_changed(self):
+        self._stats_should_be(self.suite, 2, 3)
+        self.suite.tests[2].update_status_and_message('PASS', '')
+        self._stats_should_be(self.suite, 3, 2)
+        self.suite.tests[0].update_status_and_message('FAIL', 'Failure')
+        self._stats_should_be(self.suite, 2, 3)
+        self.suite.tests[2].keywords[2].update_status_and_message('FAIL', '')
+        self._stats_should_be(self.suite, 1, 4)
+
+    def test_statistics_are_propagated_to_all_parent_suites(self):
+        suite = self.io.load_data(SUITES)
+        test = suite.suites[0].tests[0]
+        test.update_status_and_message('FAIL', 'Failure')
+        self._stats_should_be(suite.suites[0], 0, 2)
+        self._stats_should_be(suite, 3, 3)
+        test.update_status_and_message('PASS')
+        self._stats_should_be(suite.suites[0], 1, 1)
+        self._stats_should_be(suite, 4, 2)
+
+    def test_changes_in_transaction_are_propagated_when_committed(self):
+        suite = self.io.load_data(SUITES)
+        TRANSACTION.begin()
+        suite.suites[0].tests[0].update_status_and_message('FAIL', 'Failure')
+        suite.suites[1].tests[0].keywords[0].update_status_and_message('FAIL', '')
+        self._stats_should_be(suite, 4, 2)
+        TRANSACTION.commit()
+        self._stats_should_be(suite.suites[0], 0, 2)
+        self._stats_should_be(suite, 2, 4)
+        self.assertEqual(suite.suites[1].tests[0].status, 'FAIL')
+
+    def test_nested_transactions_are_propagated_once(self):
+        suite = self.io.load_data(SUITES)
+        TRANSACTION.begin()
+        suite.set_all('PASS')
+        self._stats_should_be(suite, 4, 2)
+        suite.suites[0].tests[0].set_all('FAIL', 'Failure')
+        TRANSACTION.commit()
+        self._stats_should_be(suite.suites[0], 1, 1)
+        self._stats_should_be(suite, 5, 1)
+        self.assertEqual(suite.status, 'FAIL')
+
+    def test_items_modified_in_same_transaction_have_same_timestamp(self):
+        self.suite.set_all('FAIL', 'Failure')
+        items = self.suite.tests + [kw for test in self.suite.tests
+                                    for kw in test.keywords]
+        starttimes = set(item.starttime for item in items if item.is_modified)
+        self.assertEqual(len(starttimes), 1)
+
+    def test_parents_updated_in_transaction_have_same_timestamp(self):
+        suite = self.io.load_data(SUITES)
+        timestamps = iter('20120101 12:00:%02d.000' % second
+                          for second in range(60))
+        orig_get_timestamp = robotapi.get_timestamp
+        robotapi.get_timestamp = lambda *args: timestamps.next()
+        try:
+            TRANSACTION.begin()
+            for test in suite.suites[0].tests[0], suite.suites[1].tests[0]:
+                test.keywords[0].update_status_and_message('FAIL', 'Failure')
+            TRANSACTION.commit()
+        finally:
+            robotapi.get_timestamp = orig_get_timestamp
+        # Statuses of the tests are updated only when committing.
+        items = [suite.suites[0].tests[0], suite.suites[1].tests[0],
+                 suite.suites[0].tests[0].keywords[0],
+                 suite.suites[1].tests[0].keywords[0]]
+        self.assertEqual([item.status for item in items], ['FAIL'] * 4)
+        self.assertEqual(set(item.starttime for item in items),
+                         set(['20120101 12:00:00.000']))
+
     def test_test_status_is_changed_when_keywords_statuses_are_changed(self):
         test = self.suite.tests[2]
         test.keywords[2].update_status_and_message('PASS', '')
@@ -151,6 +223,10 @@ class TestSettingStatusAndMessage(unittest.TestCase):
         test.update_status_and_message('PASS', '')
         self.assertEqual(test.status, 'FAIL')
 
+    def _stats_should_be(self, suite, passed, failed):
+        for stats in suite.critical_stats, suite.all_stats:
+            self.assertEqual((stats.passed, stats.failed), (passed, failed))
+
     def _should_be_modified(self, item):
         self.assertTrue(item.is_modified)
         self.assertTrue(DATA_MODIFIED.is_modified())
@@ -203,6 +279,34 @@ class TestGetExecutionStatus(unittest.TestCase):
         self.assertEqual(self.suite.get_execution_status(), 'PASS')
 
 
+    def test_cached_execution_status_is_updated_when_keyword_changes(self):
+        self.assertEqual(self.suite.get_execution_status(), 'FAIL')
+        self.suite.tests[3].keywords[2].message = ''
+        self.assertEqual(self.suite.tests[3].get_execution_status(),
+                         'NOT_EXECUTED')
+        self.assertEqual(self.suite.get_execution_status(), 'NOT_EXECUTED')
+        self.suite.tests[3].keywords[2].update_status_and_message('FAIL', 'x')
+        self.assertEqual(self.suite.get_execution_status(), 'FAIL')
+
+    def test_cached_execution_status_is_updated_when_visibility_changes(self):
+        self.assertEqual(self.suite.get_execution_status(), 'FAIL')
+        for test in self.suite.tests[2:]:
+            test.visible = False
+        self.assertEqual(self.suite.get_execution_status(), 'PASS')
+
+    def test_cached_execution_status_is_updated_when_default_message_changes(self):
+        test = self.suite.tests[3]
+        test.keywords[2].message = ''
+        test.message = 'New default'
+        self.assertEqual(test.get_execution_status(), 'FAIL')
+        orig = SETTINGS['default_message']
+        SETTINGS['default_message'] = 'New default'
+        try:
+            self.suite.update_default_message(orig, 'New default')
+            self.assertEqual(test.get_execution_status(), 'NOT_EXECUTED')
+        finally:
+            SETTINGS['default_message'] = orig
+
     def test_get_execution_status_not_executed_with_test(self):
         test = self.suite.tests[3]
         test.keywords[2].message = ''
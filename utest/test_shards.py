@@ -0,0 +1,177 @@
+#  Copyright 2008 Nokia Siemens Networks Oyj
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+from os.path import dirname, join
+
+from mabot.model import io, shards
+from mabot.model.model import DATA_MODIFIED, ManualSuite
+from mabot.model.shards import ShardedOutput
+from mabot.utils import robotapi
+
+SUITES = join(dirname(__file__), 'data', 'suites.xml')
+
+
+class TestShardedOutput(unittest.TestCase):
+
+    def setUp(self):
+        self._orig_settings = dict((name, io.SETTINGS[name]) for name in
+                                   ('sharded_output', 'check_simultaneous_save'))
+        io.SETTINGS['sharded_output'] = True
+        io.SETTINGS['check_simultaneous_save'] = True
+        self.tempdir = tempfile.mkdtemp()
+        self.output = join(self.tempdir, 'output.xml')
+        self.shards = self.output + '.shards'
+        shutil.copy(SUITES, self.output)
+
+    def tearDown(self):
+        for name, value in self._orig_settings.items():
+            io.SETTINGS[name] = value
+        DATA_MODIFIED.saved()
+        shutil.rmtree(self.tempdir)
+
+    def _load(self):
+        DATA_MODIFIED.saved()
+        reader = io.IO()
+        return reader, reader.load_data(self.output)
+
+    def _test(self, suite, suite_index, test_index):
+        return suite.suites[suite_index].tests[test_index]
+
+    def _update(self, suite_index, test_index, message):
+        writer, suite = self._load()
+        self._test(suite, suite_index, test_index).update_status_and_message(
+            'PASS', message)
+        return writer
+
+    def _shard_files(self):
+        return sorted(name for name in os.listdir(self.shards)
+                      if name.endswith('.xml'))
+
+    def test_shards(self):
+        suite = self._load()[1]
+        shards = ShardedOutput(self.output).get_shards(suite)
+        self.assertEquals(shards, suite.suites)
+        self.assertEquals(ShardedOutput(self.output, 2).get_shards(suite),
+                          suite.suites)
+
+    def test_only_modified_shard_is_written(self):
+        original = open(self.output, 'rb').read()
+        writer = self._update(1, 0, 'Sharded')
+        self.assertEquals(writer.save_data(None, None), (True, False))
+        self.assertEquals(open(self.output, 'rb').read(), original)
+        self.assertEquals(len(self._shard_files()), 1)
+        self.assertFalse(DATA_MODIFIED.is_modified())
+        shard = robotapi.XmlTestSuite(join(self.shards, self._shard_files()[0]))
+        self.assertEquals(shard.name, 'Testcases 2')
+        self.assertEquals(shard.tests[0].message, 'Sharded')
+
+    def test_shards_override_output_when_loading(self):
+        self._update(1, 0, 'Sharded').save_data(None, None)
+        suite = self._load()[1]
+        test = self._test(suite, 1, 0)
+        self.assertEquals(test.message, 'Sharded')
+        self.assertEquals(test.longname, 'Suites.Testcases 2.Passing')
+        self.assertEquals(suite.suites[1].parent, suite)
+        self.assertEquals(suite.get_suite('Testcases 2'), suite.suites[1])
+        self.assertEquals(suite.all_stats.passed,
+                          sum(sub.all_stats.passed for sub in suite.suites))
+
+    def test_different_shards_are_saved_independently(self):
+        first = self._update(0, 1, 'First')
+        second = self._update(1, 1, 'Second')
+        first.save_data(None, None)
+        self.assertEquals(second.save_data(None, None), (True, False))
+        suite = self._load()[1]
+        self.assertEquals(self._test(suite, 0, 1).message, 'First')
+        self.assertEquals(self._test(suite, 1, 1).message, 'Second')
+
+    def test_changes_to_same_shard_are_merged(self):
+        first = self._update(1, 0, 'First')
+        second = self._update(1, 2, 'Second')
+        first.save_data(None, None)
+        self.assertEquals(second.save_data(None, None), (True, True))
+        self.assertEquals(self._test(second.suite, 1, 0).message, 'First')
+        suite = self._load()[1]
+        self.assertEquals(self._test(suite, 1, 0).message, 'First')
+        self.assertEquals(self._test(suite, 1, 2).message, 'Second')
+
+    def test_parents_are_updated_once_when_applying_shards(self):
+        self._update(0, 0, 'First').save_data(None, None)
+        self._update(2, 0, 'Second').save_data(None, None)
+        suite = ManualSuite(robotapi.XmlTestSuite(self.output), None, True)
+        updates = []
+        orig_update = suite._update_own_status
+        def update():
+            updates.append(suite)
+            orig_update()
+        suite._update_own_status = update
+        self.assertEquals(ShardedOutput(self.output).apply(suite), 2)
+        self.assertEquals(len(updates), 1)
+        self.assertEquals(self._test(suite, 2, 0).message, 'Second')
+        self.assertEquals(suite.all_stats.passed,
+                          sum(sub.all_stats.passed for sub in suite.suites))
+
+    def test_shard_stays_modified_when_writing_fails(self):
+        writer = self._update(1, 0, 'Failing')
+        sharded = ShardedOutput(self.output)
+        shard = writer.suite.suites[1]
+        os.makedirs(sharded.directory)
+        orig_write_output = shards.write_output
+        def fail(suite, path, progress=None):
+            raise IOError('Writing failed')
+        shards.write_output = fail
+        try:
+            self.assertRaises(IOError, sharded.write, shard)
+        finally:
+            shards.write_output = orig_write_output
+        self.assertTrue(shard.is_modified)
+        self.assertEquals(sharded.get_modified_shards(writer.suite), [shard])
+        sharded.write(shard)
+        self.assertFalse(shard.is_modified)
+        self.assertEquals(sharded.get_modified_shards(writer.suite), [])
+
+    def test_combining_writes_standard_output(self):
+        self._update(0, 0, 'First').save_data(None, None)
+        self._update(2, 0, 'Second').save_data(None, None)
+        reader = self._load()[0]
+        self.assertFalse(reader.combine_shards(None))
+        combined = robotapi.XmlTestSuite(self.output)
+        self.assertEquals(combined.suites[0].tests[0].message, 'First')
+        self.assertEquals(combined.suites[2].tests[0].message, 'Second')
+        self.assertEquals(combined.suites[2].tests[0].longname,
+                          'Suites.Tsv Testcases.First One')
+
+    def test_save_as_writes_whole_output(self):
+        writer = self._update(1, 0, 'Saved as')
+        other = join(self.tempdir, 'other.xml')
+        writer.save_data(other, None)
+        self.assertFalse(os.path.exists(other + '.shards'))
+        self.assertEquals(robotapi.XmlTestSuite(other).suites[1].tests[0].message,
+                          'Saved as')
+        self.assertTrue(writer.is_sharded())
+
+    def test_output_is_not_sharded_when_disabled(self):
+        io.SETTINGS['sharded_output'] = False
+        writer = self._update(1, 0, 'Not sharded')
+        writer.save_data(None, None)
+        self.assertFalse(os.path.exists(self.shards))
+        self.assertFalse(writer.is_sharded())
+
+
+if __name__ == "__main__":
+    unittest.main()
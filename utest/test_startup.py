@@ -0,0 +1,48 @@
+#  Copyright 2008 Nokia Siemens Networks Oyj
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import subprocess
+import sys
+import unittest
+
+
+class TestImportingPackage(unittest.TestCase):
+
+    def _run(self, code):
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        output = open(os.devnull, 'w')
+        try:
+            return subprocess.call([sys.executable, '-c', code], env=env,
+                                   stdout=output)
+        finally:
+            output.close()
+
+    def test_package_does_not_import_robot_or_model(self):
+        code = ("import sys; import mabot, mabot.version; "
+                "sys.exit(any(name == 'robot' or name.startswith("
+                "('mabot.model', 'mabot.settings')) for name in sys.modules))")
+        self.assertEquals(self._run(code), 0)
+
+    def test_version_is_printed_without_loading_model(self):
+        code = ("import sys; import mabot\n"
+                "try:\n"
+                "    mabot.run(['--version'])\n"
+                "except SystemExit, exit:\n"
+                "    sys.exit(exit.code or 'mabot.model' in sys.modules)")
+        self.assertEquals(self._run(code), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -114,6 +114,37 @@ class TestTreeSuite(unittest.TestCase):
         self.assertEquals(len(tree_suite.children), 1)
         self.assertEquals(len(tree_suite.children[0].children), 1)
 
+    def test_children_are_created_only_when_needed(self):
+        test = MockTest('Test')
+        del test.keywords
+        suite = MockSuite('Suite', tests=[test])
+        tree_suite = tree.SuiteTreeItem(suite)
+        self.assertEquals(tree_suite.children[0].label, 'Test')
+        self.assertRaises(AttributeError, getattr,
+                          tree_suite.children[0], 'children')
+
+    def test_path_to_suite_in_collapsed_suites(self):
+        test1 = MockTest('Test1')
+        subsub1 = MockSuite('SubSubSuite1', tests=[test1])
+        sub1 = MockSuite('SubSuite1', suites=[subsub1])
+        suite = MockSuite('Suite1', suites = [sub1])
+        tree_suite = tree.SuiteTreeItem(suite)
+        self.assertEquals(tree_suite.get_path_to(suite), [tree_suite])
+        self.assertEquals(tree_suite.get_path_to(sub1), [tree_suite])
+        path = tree_suite.get_path_to(test1)
+        self.assertEquals([item.label for item in path],
+                          ['Suite1/SubSuite1', 'SubSubSuite1', 'Test1'])
+        self.assertEquals(path[-1].model_item, test1)
+
+    def test_path_to_item_not_shown(self):
+        test1 = MockTest('Test1')
+        test2 = MockTest('Test2', visible=False)
+        sub1 = MockSuite('SubSuite1', tests=[test1, test2])
+        suite = MockSuite('Suite1', suites = [sub1, MockSuite('SubSuite2')])
+        tree_suite = tree.SuiteTreeItem(suite)
+        self.assertEquals(tree_suite.get_path_to(test2), None)
+        self.assertEquals(len(tree_suite.get_path_to(test1)), 3)
+
     def test_get_icon_names_with_file_suite(self):
         test = MockTest('Test')
         suite = MockSuite('Suite', tests=[test])